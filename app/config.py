@@ -41,8 +41,41 @@ class Config:
     TRADING_MODE="spot"
     SYMBOL = "XBTUSD"
     ENVIRONMENT = os.getenv("ENVIRONMENT")
+    WARMUP_MODELS = os.getenv("WARMUP_MODELS", "false").lower() == "true"
+    LLM_PREFIX_CACHE = os.getenv("LLM_PREFIX_CACHE", "true").lower() == "true"
+    LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "120"))
+    PPO_NUM_THREADS = int(os.getenv("PPO_NUM_THREADS", "2"))
+
+    # Planificador de bots (BotScheduler)
+    BOT_SCHEDULER_WORKERS = int(os.getenv("BOT_SCHEDULER_WORKERS", "8"))
+    BOT_SCHEDULER_RISK_WORKERS = int(os.getenv("BOT_SCHEDULER_RISK_WORKERS", "2"))
+    BOT_SCHEDULER_SLOW_WORKERS = int(os.getenv("BOT_SCHEDULER_SLOW_WORKERS", "4"))
+    BOT_CANDLE_CLOSE_DELAY = float(os.getenv("BOT_CANDLE_CLOSE_DELAY", "2"))
+    BOT_SCHEDULER_JITTER = float(os.getenv("BOT_SCHEDULER_JITTER", "10"))
+    BOT_RISK_TICK_SECONDS = float(os.getenv("BOT_RISK_TICK_SECONDS", "5"))
+    BOT_STOP_WAIT_SECONDS = float(os.getenv("BOT_STOP_WAIT_SECONDS", "60"))
+
+    # Feed de mercado por WebSocket (MarketStream)
+    MARKET_STREAM_ENABLED = os.getenv("MARKET_STREAM_ENABLED", "true").lower() == "true"
+    MARKET_STREAM_STALE_SECONDS = float(os.getenv("MARKET_STREAM_STALE_SECONDS", "10"))
+    KRAKEN_WS_URL = os.getenv("KRAKEN_WS_URL", "wss://ws.kraken.com/v2")
+    BINGX_WS_URL = os.getenv("BINGX_WS_URL", "wss://open-api-ws.bingx.com/market")
+    BINGX_SWAP_WS_URL = os.getenv("BINGX_SWAP_WS_URL", "wss://open-api-swap.bingx.com/swap-market")
+
+    # Cliente HTTP compartido (pool keep-alive por host, p.ej. "api.kraken.com=20")
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+    HTTP_POOL_SIZES = os.getenv("HTTP_POOL_SIZES", "api.kraken.com=20")
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+    HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+
+    # Rate limiter compartido: "exchange.clase=capacidad/tokens_por_segundo" (ver rate_limiter.DEFAULT_LIMITS)
+    RATE_LIMITS = os.getenv("RATE_LIMITS", "")
+    RATE_LIMIT_PENALTY_SECONDS = float(os.getenv("RATE_LIMIT_PENALTY_SECONDS", "5"))
+
     KRAKEN_API_KEY = os.getenv("KRAKEN_API_KEY")
     KRAKEN_API_SECRET = os.getenv("KRAKEN_API_SECRET")
+    # Fichero con el maximo nonce emitido por API key (vacio: junto a KrakenExchange)
+    KRAKEN_NONCE_FILE = os.getenv("KRAKEN_NONCE_FILE")
     KRAKEN_FUTURE_API_KEY = os.getenv("KRAKEN_FUTURE_API_KEY")
     KRAKEN_FUTURE_API_SECRET = os.getenv("KRAKEN_FUTURE_API_SECRET")
     KRAKEN_SPOT_API_KEY = os.getenv("KRAKEN_SPOT_API_KEY")
@@ -62,6 +95,11 @@ class Config:
     BINGX_FUTURES_COMISION_BUY = float(os.getenv("BINGX_FUTURES_COMISION_BUY", "0.001"))
     BINGX_FUTURES_COMISION_SELL = float(os.getenv("BINGX_FUTURES_COMISION_SELL", "0.001"))
     
+    CANDLE_STORE_PATH = os.getenv(
+        "CANDLE_STORE_PATH",
+        os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)), "instance", "candles.sqlite3"),
+    )
+
     ADMIN_EMAIL = os.getenv("ADMIN_EMAIL", "admin@admin.com")
     ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin")
     ADMIN_NAME = os.getenv("ADMIN_NAME", "Admin")
@@ -8,6 +8,15 @@ from app.models.performance_aegis import get_balance_aegis
 from app.models.users import get_users_registered
 from app.models.transaction_wallet import get_deposits_pending, get_withdrawals_pending
 from app.viewmodels.wallet.found import WalletAdmin
+from app.viewmodels.services.MarketDataHub import MarketDataHub
+from app.viewmodels.services.BotScheduler import BotScheduler
+from app.viewmodels.services.MarketStream import market_stream
+from app.viewmodels.api.exchange.ExchangeClientPool import ExchangeClientPool
+from app.viewmodels.services.LLMInferenceScheduler import get_scheduler_stats
+from app.lib.utils.decision_cache import decision_cache
+from app.lib.utils.candle_store import candle_store
+from app.lib.utils.http_client import http_client
+from app.lib.utils.rate_limiter import rate_limiter
 
 admin_bp = Blueprint('admin', __name__)
 logger = logging.getLogger(__name__)
@@ -151,3 +160,107 @@ def refresh_real_balances():
             "success": False,
             "error": str(e)
         }), 500
+
+@admin_bp.route("/admin/market-data-stats", methods=["GET"])
+@login_required
+@admin_required
+def get_market_data_stats():
+    """REST calls made and saved by the shared market data hub"""
+    return jsonify({
+        "success": True,
+        "data": MarketDataHub.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    })
+
+@admin_bp.route("/admin/exchange-client-stats", methods=["GET"])
+@login_required
+@admin_required
+def get_exchange_client_stats():
+    """Reuse and market-load counters of the shared ccxt client pool"""
+    return jsonify({
+        "success": True,
+        "data": ExchangeClientPool.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    })
+
+@admin_bp.route("/admin/llm-inference-stats", methods=["GET"])
+@login_required
+@admin_required
+def get_llm_inference_stats():
+    """Queue depth, expired requests and tokens/sec of the LLM inference scheduler"""
+    return jsonify({
+        "success": True,
+        "data": get_scheduler_stats(),
+        "timestamp": datetime.now().isoformat()
+    })
+
+@admin_bp.route("/admin/decision-cache-stats", methods=["GET"])
+@login_required
+@admin_required
+def get_decision_cache_stats():
+    """Hit rate of the strategy bot decision cache"""
+    return jsonify({
+        "success": True,
+        "data": decision_cache.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+@admin_bp.route("/admin/candle-store-stats", methods=["GET"])
+@login_required
+@admin_required
+def get_candle_store_stats():
+    """Historical candle requests served from disk vs fetched from the exchange"""
+    return jsonify({
+        "success": True,
+        "data": candle_store.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+@admin_bp.route("/admin/bot-scheduler-stats", methods=["GET"])
+@login_required
+@admin_required
+def get_bot_scheduler_stats():
+    """Scheduled bot jobs and how late they wake up after their candle close"""
+    return jsonify({
+        "success": True,
+        "data": BotScheduler.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+@admin_bp.route("/admin/market-stream-stats", methods=["GET"])
+@login_required
+@admin_required
+def get_market_stream_stats():
+    """WebSocket feed state and prices/candles served from the stream instead of REST"""
+    return jsonify({
+        "success": True,
+        "data": market_stream.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+@admin_bp.route("/admin/http-client-stats", methods=["GET"])
+@login_required
+@admin_required
+def get_http_client_stats():
+    """Connection reuse per host and latency percentiles per REST endpoint"""
+    return jsonify({
+        "success": True,
+        "data": http_client.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+@admin_bp.route("/admin/rate-limiter-stats", methods=["GET"])
+@login_required
+@admin_required
+def get_rate_limiter_stats():
+    """Shared token buckets per (exchange, key, endpoint class): tokens, waits per lane, 429 pauses"""
+    return jsonify({
+        "success": True,
+        "data": rate_limiter.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    })
@@ -1,9 +1,8 @@
-import time
 from flask import Blueprint, render_template, session, redirect, url_for
 from flask_login import login_required, current_user
 import logging
 
-from app.lib.utils.tx import subscribe, unsubscribe
+from app.lib.utils.tx import HEARTBEAT_SECONDS, subscribe, unsubscribe
 
 
 see_bp = Blueprint('see', __name__)
@@ -23,12 +22,20 @@ def sse(email):
     def event_stream():
         try:
             while True:
-                if queue:
-                    yield f"data: {queue.pop(0)}\n\n"
-                time.sleep(0.5)  # Reduce la carga del CPU
+                # Bloquea sin consumir CPU hasta que llegue un evento o toque el heartbeat
+                messages = queue.wait(HEARTBEAT_SECONDS)
+                for message in messages:
+                    yield f"data: {message}\n\n"
+                if queue.closed:
+                    return
+                if not messages:
+                    # Comentario SSE: mantiene viva la conexion y detecta clientes desconectados
+                    yield ": heartbeat\n\n"
         except GeneratorExit:
+            pass
+        finally:
             unsubscribe(email, queue)
-    
+
     response = Response(
         stream_with_context(event_stream()),
         mimetype='text/event-stream'
@@ -11,7 +11,8 @@ from app.viewmodels.api.exchange.Exchange import ExchangeFactory
 from app.models.trades import get_all_trades_from_user
 from app.viewmodels.wallet.found import Wallet, WalletAdmin
 from app.config import config
-import requests
+from app.lib.utils.candle_store import candle_store, kraken_ohlc_fetcher
+from app.lib.utils.rate_limiter import LOW, rate_limiter
 
 trading_bp = Blueprint('trading', __name__)
 logger = logging.getLogger(__name__)
@@ -188,6 +189,12 @@ def get_cryptos():
 #for single crypto with symbol
 def get_symbol_price():
     """Get available cryptocurrencies"""
+    # Dashboard lookup: lowest lane of the shared rate limiter
+    with rate_limiter.priority(LOW):
+        return _get_symbol_price()
+
+
+def _get_symbol_price():
     try:
         symbol = request.args.get('symbol')
         if not symbol:
@@ -612,27 +619,18 @@ def fetch_historical_data():
     since = int(time.time() - (30 * 24 * 60 * 60))  # Últimos 30 días
 
     try:
-        url = "https://api.kraken.com/0/public/OHLC"
-        params = {
-            "pair": symbol,
-            "interval": interval,
-            "since": since
-        }
-
-        response = requests.get(url, params=params)
-        if response.status_code != 200:
-            return jsonify({"error": f"HTTP error {response.status_code}: {response.text}"}), 400
-
-        data = response.json()
-        if "error" in data and data["error"]:
-            return jsonify({"error": f"Kraken API error: {data['error']}"}), 400
-
-        result = data.get("result", {})
-        if not result:
+        # El historial sale del almacen local; a Kraken solo se le pide lo que falta
+        candles = candle_store.get_candles(
+            "kraken", symbol, f"{interval}m", since, kraken_ohlc_fetcher(symbol, interval)
+        )
+        if not candles:
             return jsonify({"error": "No historical data found"}), 400
 
-        pair_data = next(iter(result.values()))
-        return jsonify(pair_data)
+        # Mismo formato que la respuesta OHLC de Kraken: [time, open, high, low, close, vwap, volume, count]
+        return jsonify([
+            [ts, *(str(v) for v in (o, h, l, c, vwap if vwap is not None else "")), str(volume), count or 0]
+            for ts, o, h, l, c, vwap, volume, count in candles
+        ])
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,409 @@
+"""
+Backtester offline sobre las estrategias de produccion.
+
+Lee velas de un CSV o Parquet local (timestamp, open, high, low, close, volume), calcula
+los indicadores una vez sobre todo el historial con calculate_indicators y evalua en
+bloque, para cada vela, las mismas reglas que strategy_ema_crossover, strategy_rsi,
+strategy_q_learning, strategy_manual_engulfing_threshold y strategy_basic_candlesticks
+sobre la ventana de LIVE_WINDOW velas que ve el TradingBot. verify_signals compara esas
+señales con las funciones reales en una muestra de velas.
+
+La simulacion recorre las velas una vez (O(n)) con la logica de TradingBot:
+_generate_signals (OR de estrategias, conflicto buy/sell resuelto segun haya posiciones),
+_execute_strategy (compra si hay hueco en max_active_trades, SL/TP por porcentaje) y
+_check_risk_management (stop loss antes que take profit, solo posiciones long). El SL/TP
+se evalua con el high/low de cada vela siguiente a la entrada; si la vela abre mas alla
+del nivel se ejecuta al open. Una señal de venta cierra todas las posiciones abiertas,
+como la venta del saldo bloqueado en spot.
+
+Tambien acepta un directorio de candle_archive (memmap) y un rango --start/--end.
+
+Uso: python -m app.lib.utils.backtester velas.csv --timeframe 1m --stop-loss 0.02
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.lib.utils.candle_archive import CandleArchive, is_archive
+from app.lib.utils.indicator_state import timeframe_to_seconds
+from app.lib.utils.trading_strategies import (
+    calculate_indicators,
+    strategy_basic_candlesticks,
+    strategy_ema_crossover,
+    strategy_manual_engulfing_threshold,
+    strategy_q_learning,
+    strategy_rsi,
+)
+from app.viewmodels.services.SimpleQTable import ACTIONS, INITIAL_Q_VALUE, SimpleQTable
+
+logger = logging.getLogger(__name__)
+
+LIVE_WINDOW = 5  # Velas que recibe el TradingBot (fetch_ohlcv_optimized limit=5)
+# Misma regla que IncrementalIndicators: NaN hasta haber visto `span` velas (RSI: 15)
+RSI_MIN_ROWS = 15
+
+STRATEGIES = (
+    "EMA_Crossover",
+    "RSI",
+    "Q_Learning",
+    "Manual_Engulfing_Threshold",
+    "Basic_Candlesticks",
+)
+
+
+@dataclass
+class BacktestConfig:
+    """Mismos nombres que TradingConfig para los campos que comparte con el bot."""
+    timeframe: str = "5m"
+    trade_amount: float = 0.0001
+    max_active_trades: int = 1
+    stop_loss_pct: float = 0.02
+    take_profit_pct: float = 0.04
+    fee_rate: float = 0.0  # Por lado, sobre el nocional
+    strategies: Sequence[str] = STRATEGIES
+    window: int = LIVE_WINDOW
+    # Umbrales fijos en las funciones de estrategia; los valores por defecto son los de produccion
+    ema_fast: int = 12
+    ema_slow: int = 26
+    rsi_buy: float = 30
+    rsi_sell: float = 70
+    engulfing_pct: float = 0.02
+
+
+@dataclass
+class BacktestResult:
+    trades: pd.DataFrame
+    summary: Dict[str, float]
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+# ----------------------------
+# Data
+# ----------------------------
+
+def load_candles(path: str, start=None, end=None) -> pd.DataFrame:
+    """
+    OHLCV desde CSV o Parquet, ordenado por timestamp (ms epoch o fecha). Un directorio de
+    candle_archive se abre con memmap y solo se corta [start, end), sin copiar las columnas.
+    """
+    if is_archive(path):
+        return CandleArchive(path).to_frame(start, end)
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+
+    missing = {"timestamp", "open", "high", "low", "close", "volume"} - set(df.columns)
+    if missing:
+        raise ValueError(f"Candle file {path} is missing columns: {sorted(missing)}")
+
+    if pd.api.types.is_numeric_dtype(df["timestamp"]):
+        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
+    else:
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+    for col in ["open", "high", "low", "close", "volume"]:
+        df[col] = df[col].astype(np.float64)
+    df = df.sort_values("timestamp").drop_duplicates("timestamp", keep="last").reset_index(drop=True)
+    if start is not None:
+        df = df[df["timestamp"] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df["timestamp"] < pd.Timestamp(end)]
+    return df.reset_index(drop=True)
+
+
+def resample_candles(df: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    """Agrega velas a un timeframe mayor (1m -> 5m, 1h...). Sin cambios si ya es ese timeframe."""
+    seconds = timeframe_to_seconds(timeframe)
+    if len(df) > 1 and (df["timestamp"].iloc[1] - df["timestamp"].iloc[0]).total_seconds() >= seconds:
+        return df
+    resampled = df.set_index("timestamp").resample(f"{seconds}s").agg({
+        "open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum",
+    })
+    return resampled.dropna(subset=["close"]).reset_index()
+
+
+def prepare_indicators(df: pd.DataFrame, ema_fast: int = 12, ema_slow: int = 26) -> pd.DataFrame:
+    """
+    calculate_indicators sobre todo el historial, con los NaN iniciales del estado incremental.
+    Con otros periodos las columnas siguen llamandose EMA12/EMA26, que es lo que leen las estrategias.
+    """
+    ind = calculate_indicators(df)
+    for col in ["EMA12", "EMA26", "RSI"]:
+        ind[col] = pd.to_numeric(ind[col], errors="coerce").astype(np.float64)
+    if ema_fast != 12:
+        ind["EMA12"] = ind["close"].ewm(span=ema_fast, adjust=False).mean()
+    if ema_slow != 26:
+        ind["EMA26"] = ind["close"].ewm(span=ema_slow, adjust=False).mean()
+    ind.loc[ind.index[:ema_fast - 1], "EMA12"] = np.nan
+    ind.loc[ind.index[:ema_slow - 1], "EMA26"] = np.nan
+    ind.loc[ind.index[:RSI_MIN_ROWS - 1], "RSI"] = np.nan
+    return ind
+
+
+# ----------------------------
+# Signals
+# ----------------------------
+
+Q_STATES = [f"ema_{cross}_rsi_{level}" for cross in ("down", "up") for level in ("low", "mid", "high")]
+
+
+def _q_action(q_table: Optional[SimpleQTable], state: str) -> str:
+    """
+    SimpleQTable.get_action sin modificar la tabla. Un estado nuevo devuelve "hold" solo la
+    primera vez; despues sus valores iniciales empatan y gana "buy". Se usa ese regimen estable.
+    """
+    values = q_table.q_values.get(state) if q_table is not None else None
+    if values is None:
+        values = {action: INITIAL_Q_VALUE for action in ACTIONS}
+    return max(ACTIONS, key=lambda x: values.get(x, INITIAL_Q_VALUE))
+
+
+def compute_signals(ind: pd.DataFrame, q_table: Optional[SimpleQTable] = None,
+                    window: int = LIVE_WINDOW, rsi_buy: float = 30, rsi_sell: float = 70,
+                    engulfing_pct: float = 0.02) -> pd.DataFrame:
+    """
+    Columnas buy_<estrategia>/sell_<estrategia> por vela: la señal que daria cada estrategia
+    de produccion sobre las `window` velas que terminan en esa fila. Los estados de
+    Q-learning mantienen los cortes 30/70 con los que se construyo la tabla.
+    """
+    n = len(ind)
+    close = ind["close"].to_numpy()
+    ema12 = ind["EMA12"].to_numpy()
+    ema26 = ind["EMA26"].to_numpy()
+    rsi = ind["RSI"].to_numpy()
+    has_prev = np.arange(n) >= 1
+    signals = {}
+
+    with np.errstate(invalid="ignore"):
+        # strategy_ema_crossover. La condicion de venta de produccion compara prev EMA26
+        # consigo misma, asi que vende siempre que EMA12 < EMA26: se reproduce tal cual
+        prev12, prev26 = np.roll(ema12, 1), np.roll(ema26, 1)
+        ema_valid = has_prev & ~np.isnan(ema12) & ~np.isnan(ema26) & ~np.isnan(prev12) & ~np.isnan(prev26)
+        signals["buy_EMA_Crossover"] = ema_valid & (ema12 > ema26) & (prev12 <= prev26)
+        signals["sell_EMA_Crossover"] = ema_valid & (ema12 < ema26)
+
+        # strategy_rsi
+        signals["buy_RSI"] = rsi < rsi_buy
+        signals["sell_RSI"] = rsi > rsi_sell
+
+        # strategy_q_learning: un lookup por estado distinto, no por vela
+        q_valid = ~np.isnan(ema12) & ~np.isnan(ema26) & ~np.isnan(rsi)
+        state_code = (ema12 > ema26).astype(int) * 3 + np.where(rsi < 30, 0, np.where(rsi > 70, 2, 1))
+        q_actions = np.array([_q_action(q_table, state) for state in Q_STATES])[state_code]
+        signals["buy_Q_Learning"] = q_valid & (q_actions == "buy")
+        signals["sell_Q_Learning"] = q_valid & (q_actions == "sell")
+
+        # strategy_manual_engulfing_threshold: referencia = primera vela de la ventana
+        reference = close[np.maximum(np.arange(n) - (window - 1), 0)]
+        signals["buy_Manual_Engulfing_Threshold"] = (
+            has_prev & ind["bullish_engulfing"].to_numpy(dtype=bool) & (close >= reference * (1 + engulfing_pct))
+        )
+        signals["sell_Manual_Engulfing_Threshold"] = (
+            has_prev & ind["bearish_engulfing"].to_numpy(dtype=bool) & (close <= reference * (1 - engulfing_pct))
+        )
+
+        # strategy_basic_candlesticks
+        signals["buy_Basic_Candlesticks"] = ind["martillo"].to_numpy(dtype=bool)
+        signals["sell_Basic_Candlesticks"] = ind["estrella_fugaz"].to_numpy(dtype=bool)
+
+    return pd.DataFrame(signals, index=ind.index)
+
+
+def verify_signals(ind: pd.DataFrame, signals: pd.DataFrame, q_table: Optional[SimpleQTable] = None,
+                   window: int = LIVE_WINDOW, sample: int = 1000, seed: int = 0) -> List[int]:
+    """Runs the real strategy functions on `sample` random windows; returns the mismatching rows."""
+    # Copia de la tabla en un directorio temporal, con todos los estados ya vistos (regimen estable)
+    live_table = SimpleQTable(os.path.join(tempfile.mkdtemp(), "q_table.csv"))
+    if q_table is not None:
+        live_table.q_values.update({state: dict(values) for state, values in q_table.q_values.items()})
+    for state in Q_STATES:
+        live_table.get_action(state)
+
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(np.arange(1, len(ind)), size=min(sample, len(ind) - 1), replace=False)
+    mismatches = []
+    for i in sorted(rows):
+        df = ind.iloc[max(0, i - window + 1): i + 1]
+        expected = {
+            "EMA_Crossover": strategy_ema_crossover(df),
+            "RSI": strategy_rsi(df),
+            "Q_Learning": strategy_q_learning(df, live_table)[0],
+            "Manual_Engulfing_Threshold": strategy_manual_engulfing_threshold(df),
+            "Basic_Candlesticks": strategy_basic_candlesticks(df),
+        }
+        for name, sig in expected.items():
+            if bool(sig["buy"]) != bool(signals.at[i, f"buy_{name}"]) or bool(sig["sell"]) != bool(signals.at[i, f"sell_{name}"]):
+                mismatches.append(int(i))
+                break
+    return mismatches
+
+
+# ----------------------------
+# Simulation
+# ----------------------------
+
+def simulate(ind: pd.DataFrame, signals: pd.DataFrame, config: BacktestConfig) -> pd.DataFrame:
+    """Recorre las velas una vez aplicando ejecucion y SL/TP del TradingBot; devuelve los trades."""
+    buy_cols = [f"buy_{name}" for name in config.strategies]
+    sell_cols = [f"sell_{name}" for name in config.strategies]
+    buy = signals[buy_cols].to_numpy().any(axis=1)
+    sell = signals[sell_cols].to_numpy().any(axis=1)
+
+    open_ = ind["open"].tolist()
+    high = ind["high"].tolist()
+    low = ind["low"].tolist()
+    close = ind["close"].tolist()
+    timestamps = ind["timestamp"].tolist() if "timestamp" in ind.columns else list(ind.index)
+    buy_rows = np.flatnonzero(buy)
+    buy_l, sell_l = buy.tolist(), sell.tolist()
+
+    amount = config.trade_amount
+    fee = config.fee_rate
+    open_trades = []  # [entry_row, entry_price, stop_loss, take_profit]
+    trades = []
+
+    def close_trade(trade, row, price, reason):
+        entry_row, entry_price = trade[0], trade[1]
+        pnl = (price - entry_price) * amount - fee * (entry_price + price) * amount
+        trades.append((
+            timestamps[entry_row], timestamps[row], entry_price, price, reason, pnl,
+            (price - entry_price) / entry_price * 100 if entry_price else 0.0,
+        ))
+
+    n = len(close)
+    i = 0
+    while i < n:
+        if not open_trades:
+            # Sin posiciones solo importa la siguiente compra: saltar directamente a ella
+            k = np.searchsorted(buy_rows, i)
+            if k == len(buy_rows):
+                break
+            i = int(buy_rows[k])
+        else:
+            # _check_risk_management con el recorrido de la vela (SL antes que TP)
+            still_open = []
+            for trade in open_trades:
+                if trade[0] >= i:
+                    still_open.append(trade)
+                elif low[i] <= trade[2]:
+                    close_trade(trade, i, min(open_[i], trade[2]), "stop_loss")
+                elif high[i] >= trade[3]:
+                    close_trade(trade, i, max(open_[i], trade[3]), "take_profit")
+                else:
+                    still_open.append(trade)
+            open_trades = still_open
+
+        # _generate_signals: conflicto resuelto a favor de comprar si no hay posiciones
+        want_buy, want_sell = buy_l[i], sell_l[i]
+        if want_buy and want_sell:
+            if open_trades:
+                want_buy = False
+            else:
+                want_sell = False
+
+        # _execute_strategy
+        if want_buy and len(open_trades) < config.max_active_trades:
+            price = close[i]
+            open_trades.append([i, price, price * (1 - config.stop_loss_pct), price * (1 + config.take_profit_pct)])
+        elif want_sell and open_trades:
+            for trade in open_trades:
+                close_trade(trade, i, close[i], "signal")
+            open_trades = []
+        i += 1
+
+    return pd.DataFrame(
+        trades, columns=["entry_time", "exit_time", "entry_price", "exit_price", "reason", "pnl", "roi"]
+    )
+
+
+def summarize(trades: pd.DataFrame) -> Dict[str, float]:
+    pnl = trades["pnl"].to_numpy() if not trades.empty else np.zeros(0)
+    equity = np.concatenate([[0.0], np.cumsum(pnl)])
+    drawdown = np.maximum.accumulate(equity) - equity
+    return {
+        "total_pnl": float(pnl.sum()),
+        "trades": int(len(pnl)),
+        "win_rate": float((pnl > 0).mean()) if len(pnl) else 0.0,
+        "avg_roi": float(trades["roi"].mean()) if len(pnl) else 0.0,
+        "max_drawdown": float(drawdown.max()),
+        "stop_losses": int((trades["reason"] == "stop_loss").sum()) if len(pnl) else 0,
+        "take_profits": int((trades["reason"] == "take_profit").sum()) if len(pnl) else 0,
+    }
+
+
+def run_backtest(candles: pd.DataFrame, config: Optional[BacktestConfig] = None,
+                 q_table: Optional[SimpleQTable] = None) -> BacktestResult:
+    config = config or BacktestConfig()
+    unknown = set(config.strategies) - set(STRATEGIES)
+    if unknown:
+        raise ValueError(f"Unknown strategies: {sorted(unknown)}")
+
+    timings = {}
+    start = time.perf_counter()
+    ind = prepare_indicators(resample_candles(candles, config.timeframe), config.ema_fast, config.ema_slow)
+    timings["indicators"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    signals = compute_signals(
+        ind, q_table, config.window, config.rsi_buy, config.rsi_sell, config.engulfing_pct
+    )
+    timings["signals"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    trades = simulate(ind, signals, config)
+    timings["simulation"] = time.perf_counter() - start
+
+    return BacktestResult(trades=trades, summary=summarize(trades), timings=timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline backtest of the TradingBot strategies")
+    parser.add_argument("path", help="CSV, Parquet or candle_archive directory with timestamp, open, high, low, close, volume")
+    parser.add_argument("--start", default=None, help="First candle date (inclusive)")
+    parser.add_argument("--end", default=None, help="Last candle date (exclusive)")
+    parser.add_argument("--timeframe", default="5m")
+    parser.add_argument("--trade-amount", type=float, default=0.0001)
+    parser.add_argument("--max-active-trades", type=int, default=1)
+    parser.add_argument("--stop-loss", type=float, default=0.02)
+    parser.add_argument("--take-profit", type=float, default=0.04)
+    parser.add_argument("--fee-rate", type=float, default=0.0)
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--q-table", default=None, help="Q-table CSV for the Q_Learning strategy")
+    parser.add_argument("--trades-out", default=None, help="Write the trade list to this CSV")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    candles = load_candles(args.path, args.start, args.end)
+    load_seconds = time.perf_counter() - start
+
+    q_table = SimpleQTable(args.q_table) if args.q_table and os.path.exists(args.q_table) else None
+    config = BacktestConfig(
+        timeframe=args.timeframe,
+        trade_amount=args.trade_amount,
+        max_active_trades=args.max_active_trades,
+        stop_loss_pct=args.stop_loss,
+        take_profit_pct=args.take_profit,
+        fee_rate=args.fee_rate,
+        strategies=tuple(s for s in args.strategies.split(",") if s),
+    )
+    result = run_backtest(candles, config, q_table)
+    result.timings["load"] = load_seconds
+
+    print(f"Candles: {len(candles)} | Config: {asdict(config)}")
+    for key, value in result.summary.items():
+        print(f"{key:>14}: {value}")
+    print("Timings: " + ", ".join(f"{k} {v:.3f}s" for k, v in result.timings.items()))
+    if args.trades_out:
+        result.trades.to_csv(args.trades_out, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Archivo columnar de velas en disco para backtests y entrenamiento.
+
+Cada serie (p. ej. kraken/XBTUSD/1m) es un directorio con un fichero binario contiguo
+por columna (timestamp int64 en ms epoch; open, high, low, close y volume float64) y un
+meta.json con el numero de filas validas. Las columnas se abren con numpy.memmap, asi que
+un rango de años se corta por busqueda binaria sobre los timestamps y se devuelve como
+vistas del fichero, sin cargarlo en RAM.
+
+append() añade al final (un solo escritor por archivo). Si llega la misma vela que la
+ultima guardada se sobrescribe en su sitio; si llegan velas anteriores el archivo queda
+marcado como desordenado hasta ejecutar compact(), que ordena, elimina duplicados (gana
+la ultima escritura) y publica una nueva generacion de ficheros cambiando meta.json de
+forma atomica. Los lectores que ya tenian abierta la generacion anterior siguen leyendola.
+
+Uso:
+    python -m app.lib.utils.candle_archive append archivo/ velas.csv
+    python -m app.lib.utils.candle_archive import-store archivo/ --exchange kraken --symbol XBTUSD --timeframe 15m
+    python -m app.lib.utils.candle_archive compact archivo/
+    python -m app.lib.utils.candle_archive info archivo/
+"""
+
+import argparse
+import json
+import logging
+import os
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from app.lib.utils.indicator_state import timeframe_to_seconds
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = {
+    "timestamp": np.dtype("<i8"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+COMPACT_CHUNK_ROWS = 1_000_000  # Filas copiadas por bloque al reescribir una columna
+
+TimeLike = Union[int, str, pd.Timestamp, np.datetime64, None]
+
+
+def is_archive(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+def to_ms(value: TimeLike) -> Optional[int]:
+    """ms epoch a partir de ms, fecha en texto, Timestamp o datetime64 (naive = UTC)."""
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return int(pd.Timestamp(value).value // 1_000_000)
+
+
+class CandleArchive:
+    def __init__(self, path: str, timeframe: Optional[str] = None, create: bool = False):
+        self.path = path
+        self._lock = Lock()
+        self._maps: Dict[str, np.ndarray] = {}
+        if not is_archive(path):
+            if not create:
+                raise FileNotFoundError(f"No candle archive at {path}")
+            os.makedirs(path, exist_ok=True)
+            self._meta = {"version": FORMAT_VERSION, "rows": 0, "generation": 0, "sorted": True, "timeframe": timeframe}
+            for name in COLUMNS:
+                open(self._file(name), "wb").close()
+            self._write_meta()
+        else:
+            self._read_meta()
+
+    # ----------------------------
+    # Metadatos y ficheros
+    # ----------------------------
+
+    def _file(self, name: str, generation: Optional[int] = None) -> str:
+        generation = self._meta["generation"] if generation is None else generation
+        return os.path.join(self.path, f"{name}.{generation}.bin")
+
+    def _read_meta(self):
+        with open(os.path.join(self.path, META_FILE)) as f:
+            self._meta = json.load(f)
+        if self._meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported candle archive version {self._meta.get('version')} at {self.path}")
+        self._maps = {}
+
+    def _write_meta(self):
+        tmp = os.path.join(self.path, META_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self._meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, META_FILE))
+        self._maps = {}
+
+    def refresh(self):
+        """Re-lee meta.json para ver lo que otro proceso haya añadido o compactado."""
+        with self._lock:
+            self._read_meta()
+
+    def __len__(self) -> int:
+        return self._meta["rows"]
+
+    @property
+    def timeframe(self) -> Optional[str]:
+        return self._meta.get("timeframe")
+
+    @property
+    def is_sorted(self) -> bool:
+        return self._meta["sorted"]
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only memmap of the valid rows of a column."""
+        if name not in COLUMNS:
+            raise KeyError(f"Unknown candle column: {name}")
+        array = self._maps.get(name)
+        if array is None:
+            rows = self._meta["rows"]
+            if rows == 0:
+                array = np.empty(0, dtype=COLUMNS[name])
+            else:
+                array = np.memmap(self._file(name), dtype=COLUMNS[name], mode="r", shape=(rows,))
+            self._maps[name] = array
+        return array
+
+    # ----------------------------
+    # Lectura
+    # ----------------------------
+
+    def index_range(self, start: TimeLike = None, end: TimeLike = None) -> Tuple[int, int]:
+        """Filas [i, j) con start <= timestamp < end, por busqueda binaria."""
+        if not self.is_sorted:
+            raise ValueError(f"Candle archive {self.path} has out-of-order appends, run compact() first")
+        timestamps = self.column("timestamp")
+        start_ms, end_ms = to_ms(start), to_ms(end)
+        i = 0 if start_ms is None else int(np.searchsorted(timestamps, start_ms, side="left"))
+        j = len(timestamps) if end_ms is None else int(np.searchsorted(timestamps, end_ms, side="left"))
+        return i, max(i, j)
+
+    def slice(self, start: TimeLike = None, end: TimeLike = None) -> Dict[str, np.ndarray]:
+        """Zero-copy views of every column for start <= timestamp < end."""
+        i, j = self.index_range(start, end)
+        return {name: self.column(name)[i:j] for name in COLUMNS}
+
+    def to_frame(self, start: TimeLike = None, end: TimeLike = None) -> pd.DataFrame:
+        """
+        DataFrame in the backtester format. The OHLCV columns are memmap views and the
+        timestamp column is the same int64 buffer seen as datetime64[ms].
+        """
+        data = self.slice(start, end)
+        columns = {"timestamp": pd.to_datetime(np.asarray(data.pop("timestamp")).view("datetime64[ms]"))}
+        columns.update(data)
+        return pd.DataFrame(columns, copy=False)
+
+    # ----------------------------
+    # Escritura
+    # ----------------------------
+
+    def append(self, candles: Union[pd.DataFrame, Dict[str, Any]]) -> int:
+        """
+        Appends candles (DataFrame or dict of columns; timestamp in ms or dates).
+        Returns the number of new rows written.
+        """
+        batch = _normalize(candles)
+        if not len(batch["timestamp"]):
+            return 0
+
+        with self._lock:
+            self._read_meta()
+            rows = self._meta["rows"]
+            if rows:
+                last = int(self.column("timestamp")[-1])
+                same = batch["timestamp"] == last
+                if same.any():
+                    # Revision de la ultima vela (la que estaba en formacion): se sobrescribe en su sitio
+                    k = np.flatnonzero(same)[-1]
+                    for name, dtype in COLUMNS.items():
+                        with open(self._file(name), "r+b") as f:
+                            f.seek((rows - 1) * dtype.itemsize)
+                            f.write(batch[name][k:k + 1].tobytes())
+                    batch = {name: values[~same] for name, values in batch.items()}
+                if len(batch["timestamp"]) and batch["timestamp"][0] < last:
+                    self._meta["sorted"] = False
+
+            n = len(batch["timestamp"])
+            if n:
+                for name, dtype in COLUMNS.items():
+                    with open(self._file(name), "r+b") as f:
+                        # Descarta restos de un append interrumpido antes de actualizar meta.json
+                        f.truncate(rows * dtype.itemsize)
+                        f.seek(0, os.SEEK_END)
+                        f.write(batch[name].tobytes())
+                        f.flush()
+                        os.fsync(f.fileno())
+                self._meta["rows"] = rows + n
+            self._write_meta()
+            return n
+
+    def compact(self) -> Dict[str, int]:
+        """Sorts by timestamp and drops duplicates (last write wins) into a new file generation."""
+        with self._lock:
+            self._read_meta()
+            rows = self._meta["rows"]
+            timestamps = np.asarray(self.column("timestamp"))
+            if self._meta["sorted"] and (rows < 2 or bool(np.all(np.diff(timestamps) > 0))):
+                return {"rows": rows, "removed": 0}
+
+            order = np.argsort(timestamps, kind="stable")
+            ordered = timestamps[order]
+            keep = np.ones(rows, dtype=bool)
+            keep[:-1] = ordered[:-1] != ordered[1:]  # Ultima escritura de cada timestamp
+            order = order[keep]
+
+            old_generation = self._meta["generation"]
+            new_generation = old_generation + 1
+            for name, dtype in COLUMNS.items():
+                source = self.column(name)
+                with open(self._file(name, new_generation), "wb") as f:
+                    # Por bloques para no cargar la columna entera en memoria
+                    for offset in range(0, len(order), COMPACT_CHUNK_ROWS):
+                        f.write(np.asarray(source[order[offset:offset + COMPACT_CHUNK_ROWS]], dtype=dtype).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            self._meta.update(rows=len(order), generation=new_generation, sorted=True)
+            self._write_meta()
+            for name in COLUMNS:
+                try:
+                    os.remove(self._file(name, old_generation))
+                except OSError:
+                    pass
+            removed = rows - len(order)
+            logger.info("Compacted candle archive %s: %s rows, %s duplicates removed", self.path, len(order), removed)
+            return {"rows": len(order), "removed": removed}
+
+    def get_info(self) -> Dict[str, Any]:
+        timestamps = self.column("timestamp")
+        info = {
+            "path": self.path,
+            "rows": len(self),
+            "timeframe": self.timeframe,
+            "sorted": self.is_sorted,
+            "bytes": sum(len(self) * dtype.itemsize for dtype in COLUMNS.values()),
+        }
+        if len(timestamps):
+            info["first"] = str(pd.Timestamp(int(timestamps[0]), unit="ms"))
+            info["last"] = str(pd.Timestamp(int(timestamps[-1]), unit="ms"))
+            if self.timeframe and self.is_sorted:
+                step_ms = timeframe_to_seconds(self.timeframe) * 1000
+                info["gaps"] = int(np.count_nonzero(np.diff(timestamps) > step_ms))
+        return info
+
+
+def _normalize(candles: Union[pd.DataFrame, Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Columnas del archivo como arrays contiguos, ordenadas por timestamp y sin duplicados."""
+    df = candles if isinstance(candles, pd.DataFrame) else pd.DataFrame(candles)
+    missing = set(COLUMNS) - set(df.columns)
+    if missing:
+        raise ValueError(f"Candles are missing columns: {sorted(missing)}")
+
+    timestamps = df["timestamp"]
+    if pd.api.types.is_numeric_dtype(timestamps):
+        ms = timestamps.to_numpy(dtype=np.int64)
+    else:
+        ms = pd.to_datetime(timestamps).to_numpy(dtype="datetime64[ms]").view(np.int64)
+
+    batch = {"timestamp": ms}
+    for name in list(COLUMNS)[1:]:
+        batch[name] = df[name].to_numpy(dtype=np.float64)
+
+    order = np.argsort(ms, kind="stable")
+    ordered = ms[order]
+    keep = np.ones(len(order), dtype=bool)
+    keep[:-1] = ordered[:-1] != ordered[1:]
+    order = order[keep]
+    return {name: np.ascontiguousarray(values[order], dtype=COLUMNS[name]) for name, values in batch.items()}
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar memmap candle archive tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    append = sub.add_parser("append", help="Append a CSV or Parquet file")
+    append.add_argument("archive")
+    append.add_argument("path")
+    append.add_argument("--timeframe", default=None, help="Timeframe stored when the archive is created")
+    append.add_argument("--compact", action="store_true", help="Compact afterwards if needed")
+
+    store = sub.add_parser("import-store", help="Append the candles of the local SQLite candle store")
+    store.add_argument("archive")
+    store.add_argument("--exchange", required=True)
+    store.add_argument("--symbol", required=True)
+    store.add_argument("--timeframe", required=True)
+
+    compact = sub.add_parser("compact", help="Sort and deduplicate")
+    compact.add_argument("archive")
+
+    info = sub.add_parser("info", help="Rows, range and gaps")
+    info.add_argument("archive")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "append":
+        from app.lib.utils.backtester import load_candles
+
+        archive = CandleArchive(args.archive, timeframe=args.timeframe, create=True)
+        print(f"Appended {archive.append(load_candles(args.path))} candles")
+        if args.compact and not archive.is_sorted:
+            print(archive.compact())
+    elif args.command == "import-store":
+        from app.lib.utils.candle_store import candle_store
+
+        archive = CandleArchive(args.archive, timeframe=args.timeframe, create=True)
+        after = int(archive.column("timestamp")[-1]) // 1000 if len(archive) and archive.is_sorted else 0
+        candles = candle_store.get_range(args.exchange, args.symbol, args.timeframe, after, 2 ** 62)
+        df = pd.DataFrame(
+            [(ts * 1000, o, h, l, c, v) for ts, o, h, l, c, _, v, _ in candles],
+            columns=list(COLUMNS),
+        )
+        print(f"Appended {archive.append(df)} candles")
+    elif args.command == "compact":
+        print(CandleArchive(args.archive).compact())
+    else:
+        print(json.dumps(CandleArchive(args.archive).get_info(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
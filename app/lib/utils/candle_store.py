@@ -0,0 +1,263 @@
+"""
+Almacen local de velas OHLCV en SQLite por (exchange, symbol, timeframe).
+
+Ademas de las velas se guarda la cobertura: los rangos de tiempo ya descargados cuyas
+velas estan cerradas. get_candles sirve el historial desde disco y solo pide al exchange
+los huecos que faltan (normalmente la cola desde la ultima vela cerrada). La vela en
+formacion nunca se marca como cubierta, asi que se vuelve a pedir y se sobrescribe.
+
+MarketDataHub guarda aqui las velas que ya descarga para los bots, con la clave del bot
+(source, p. ej. "kraken_spot", y su simbolo); con ese historial el TradingBot calienta su
+estado de indicadores al arrancar y se calculan las features PPO. El chart
+(/fetch_historical_data) usa su propia clave ("kraken" y el par de Kraken).
+"""
+
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import Config
+from app.lib.utils.http_client import http_client
+from app.lib.utils.indicator_state import timeframe_to_seconds
+
+logger = logging.getLogger(__name__)
+
+# (ts apertura en segundos, open, high, low, close, vwap, volume, count); vwap/count pueden ser None
+Candle = Tuple[int, float, float, float, float, Optional[float], float, Optional[int]]
+Fetcher = Callable[[int, int], Sequence[Candle]]
+
+KRAKEN_OHLC_URL = "https://api.kraken.com/0/public/OHLC"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candles (
+    exchange TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    open REAL NOT NULL,
+    high REAL NOT NULL,
+    low REAL NOT NULL,
+    close REAL NOT NULL,
+    vwap REAL,
+    volume REAL NOT NULL,
+    count INTEGER,
+    PRIMARY KEY (exchange, symbol, timeframe, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS coverage (
+    exchange TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    start_ts INTEGER NOT NULL,
+    end_ts INTEGER NOT NULL,
+    PRIMARY KEY (exchange, symbol, timeframe, start_ts)
+) WITHOUT ROWID;
+"""
+
+
+class CandleStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = Lock()
+        self._stats = {"requests": 0, "candles_served": 0, "fetches": 0, "fetch_errors": 0, "candles_fetched": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    # ----------------------------
+    # Lectura / escritura
+    # ----------------------------
+
+    def upsert(self, exchange: str, symbol: str, timeframe: str, candles: Iterable[Candle]) -> int:
+        rows = [(exchange, symbol, timeframe, *candle) for candle in candles]
+        if not rows:
+            return 0
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO candles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def get_range(self, exchange: str, symbol: str, timeframe: str, start: int, end: int) -> List[Candle]:
+        with self._lock:
+            cursor = self._connection().execute(
+                "SELECT ts, open, high, low, close, vwap, volume, count FROM candles "
+                "WHERE exchange = ? AND symbol = ? AND timeframe = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+                (exchange, symbol, timeframe, start, end),
+            )
+            return cursor.fetchall()
+
+    def get_recent(self, exchange: str, symbol: str, timeframe: str, limit: int, before: Optional[int] = None) -> List[Candle]:
+        """Last `limit` stored candles (opened before `before` if given), oldest first."""
+        with self._lock:
+            cursor = self._connection().execute(
+                "SELECT ts, open, high, low, close, vwap, volume, count FROM candles "
+                "WHERE exchange = ? AND symbol = ? AND timeframe = ? AND ts < ? ORDER BY ts DESC LIMIT ?",
+                (exchange, symbol, timeframe, before if before is not None else 2 ** 62, limit),
+            )
+            return cursor.fetchall()[::-1]
+
+    def mark_covered(self, exchange: str, symbol: str, timeframe: str, start: int, end: int) -> None:
+        """Registra [start, end] como descargado, fusionando con rangos solapados o contiguos."""
+        if end < start:
+            return
+        step = timeframe_to_seconds(timeframe)
+        key = (exchange, symbol, timeframe)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                overlapping = conn.execute(
+                    "SELECT start_ts, end_ts FROM coverage WHERE exchange = ? AND symbol = ? AND timeframe = ? "
+                    "AND start_ts <= ? AND end_ts >= ?",
+                    (*key, end + step, start - step),
+                ).fetchall()
+                for s, e in overlapping:
+                    start, end = min(start, s), max(end, e)
+                conn.execute(
+                    "DELETE FROM coverage WHERE exchange = ? AND symbol = ? AND timeframe = ? "
+                    "AND start_ts <= ? AND end_ts >= ?",
+                    (*key, end + step, start - step),
+                )
+                conn.execute("INSERT INTO coverage VALUES (?, ?, ?, ?, ?)", (*key, start, end))
+
+    def missing_ranges(self, exchange: str, symbol: str, timeframe: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """Subrangos de [start, end] (aperturas de vela) que aun no se han descargado."""
+        step = timeframe_to_seconds(timeframe)
+        with self._lock:
+            covered = self._connection().execute(
+                "SELECT start_ts, end_ts FROM coverage WHERE exchange = ? AND symbol = ? AND timeframe = ? "
+                "AND start_ts <= ? AND end_ts >= ? ORDER BY start_ts",
+                (exchange, symbol, timeframe, end, start),
+            ).fetchall()
+        missing, cursor = [], start
+        for s, e in covered:
+            if s > cursor:
+                missing.append((cursor, s - step))
+            cursor = max(cursor, e + step)
+        if cursor <= end:
+            missing.append((cursor, end))
+        return missing
+
+    # ----------------------------
+    # Historial con relleno de huecos
+    # ----------------------------
+
+    def get_candles(self, exchange: str, symbol: str, timeframe: str, start: int, fetch: Fetcher,
+                    end: Optional[int] = None) -> List[Candle]:
+        """
+        Candles opened in [start, end] (default: up to the forming candle). Only the ranges
+        not covered yet are requested with fetch(since, until); if the exchange fails the
+        stored candles are served as they are.
+        """
+        step = timeframe_to_seconds(timeframe)
+        forming = int(time.time() // step * step)
+        start = int(start // step * step)
+        end = forming if end is None else min(int(end // step * step), forming)
+
+        error = None
+        missing = self.missing_ranges(exchange, symbol, timeframe, start, end)
+        for since, until in missing:
+            try:
+                candles = list(fetch(since, until))
+            except Exception as e:
+                error = e
+                self._count("fetch_errors")
+                logger.warning("[CandleStore] Could not fetch %s %s %s from %s: %s", exchange, symbol, timeframe, since, e)
+                continue
+            if not candles:
+                continue  # Respuesta vacia: no se marca cobertura, se reintentara
+            self.upsert(exchange, symbol, timeframe, candles)
+            # Lo que el exchange ya no devuelve (historial demasiado antiguo) tambien cuenta
+            # como descargado; la vela en formacion no
+            self.mark_covered(exchange, symbol, timeframe, since, min(until, forming - step))
+            with self._lock:
+                self._stats["fetches"] += 1
+                self._stats["candles_fetched"] += len(candles)
+
+        candles = self.get_range(exchange, symbol, timeframe, start, end)
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["candles_served"] += len(candles)
+        if not candles and error is not None:
+            raise error
+        return candles
+
+    def save_records(self, exchange: str, symbol: str, timeframe: str, records: List[Dict[str, Any]]) -> None:
+        """Guarda velas en el formato de fetch_ohlcv_optimized (sin marcar cobertura)."""
+        try:
+            self.upsert(exchange, symbol, timeframe, [record_to_candle(r) for r in records])
+        except Exception as e:
+            logger.warning("[CandleStore] Could not save %s %s %s candles: %s", exchange, symbol, timeframe, e)
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+
+# ----------------------------
+# Conversiones y fetchers
+# ----------------------------
+
+def record_to_candle(record: Dict[str, Any]) -> Candle:
+    """fetch_ohlcv_optimized usa 'YYYY-mm-dd HH:MM:SS' en hora local (o ms epoch)."""
+    ts = record["timestamp"]
+    if isinstance(ts, (int, float)):
+        ts = int(ts / 1000) if ts > 1e11 else int(ts)
+    else:
+        ts = int(datetime.strptime(str(ts), "%Y-%m-%d %H:%M:%S").timestamp())
+    return (ts, float(record["open"]), float(record["high"]), float(record["low"]),
+            float(record["close"]), None, float(record["volume"]), None)
+
+
+def candle_to_record(candle: Candle) -> Dict[str, Any]:
+    return {
+        "timestamp": datetime.fromtimestamp(candle[0]).strftime("%Y-%m-%d %H:%M:%S"),
+        "open": candle[1],
+        "high": candle[2],
+        "low": candle[3],
+        "close": candle[4],
+        "volume": candle[6],
+    }
+
+
+def kraken_ohlc_fetcher(pair: str, interval_minutes: int) -> Fetcher:
+    """Fetcher sobre el endpoint publico OHLC de Kraken (devuelve como maximo las ultimas 720 velas)."""
+    def fetch(since: int, until: int) -> List[Candle]:
+        response = http_client.get(
+            KRAKEN_OHLC_URL,
+            params={"pair": pair, "interval": interval_minutes, "since": since - 1},
+            timeout=10,
+            rate_limit=("kraken", None, "public"),
+        )
+        if response.status_code != 200:
+            raise Exception(f"HTTP error {response.status_code}: {response.text}")
+        data = response.json()
+        if data.get("error"):
+            raise Exception(f"Kraken API error: {data['error']}")
+        result = {k: v for k, v in data.get("result", {}).items() if k != "last"}
+        if not result:
+            return []
+        return [
+            (int(t), float(o), float(h), float(l), float(c), float(vwap), float(vol), int(count))
+            for t, o, h, l, c, vwap, vol, count in next(iter(result.values()))
+            if since <= int(t) <= until
+        ]
+    return fetch
+
+
+candle_store = CandleStore(Config.CANDLE_STORE_PATH)
@@ -0,0 +1,77 @@
+"""
+Cache de decisiones del StrategyTradingBot.
+
+El bot decide una vez tras cada cierre de vela (BotScheduler, carril SLOW) y sus entradas
+solo cambian cuando cierra una vela o cambia la posicion. La clave es (strategy id, hash
+de las velas cerradas mas la apertura de la vela en curso, estado de la orden), asi que
+si vuelve a preguntar dentro de la misma vela (la decision al arrancar, un reinicio del
+bot, un reintento) se devuelve la accion guardada sin ejecutar inferencia. El TTL es un
+timeframe para no arrastrar una decision si los datos dejan de llegar.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.lib.utils.indicator_state import timeframe_to_seconds
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = 2048
+
+
+def candle_snapshot_hash(symbol: str, timeframe: str, candles: List[Dict[str, Any]]) -> str:
+    """
+    Hash of the closed candles plus the open time of the last (still forming) one:
+    ticks inside the same candle map to the same hash.
+    """
+    if not candles:
+        return ""
+    closed = [[c.get(k) for k in ("timestamp", "open", "high", "low", "close", "volume")] for c in candles[:-1]]
+    payload = json.dumps([symbol, timeframe, closed, candles[-1].get("timestamp")], default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class DecisionCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self._entries: "OrderedDict[Tuple, Tuple[str, float]]" = OrderedDict()  # key -> (action, expires_at)
+        self._max_entries = max_entries
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Tuple) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def put(self, key: Tuple, action: str, timeframe: str):
+        with self._lock:
+            self._entries[key] = (action, time.time() + timeframe_to_seconds(timeframe))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+decision_cache = DecisionCache()
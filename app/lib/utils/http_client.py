@@ -0,0 +1,206 @@
+"""
+Cliente HTTP compartido para las llamadas REST directas (Kraken, OHLC publico...).
+
+Las llamadas con requests.get/post abrian una conexion TCP+TLS nueva cada vez. Aqui hay
+una requests.Session por host con su pool de conexiones keep-alive (tamaño configurable
+por host), timeout por defecto, gzip y reintentos con backoff exponencial y jitter
+completo ante errores de red y respuestas 429/5xx. Por defecto solo se reintentan los
+metodos idempotentes: un POST privado de Kraken lleva un nonce que no puede repetirse.
+Con rate_limit=(exchange, api_key, clase) cada intento pasa antes por el rate_limiter
+compartido y un 429 pausa ese bucket.
+
+Por endpoint (metodo + host + ruta) se guardan las ultimas latencias para dar
+percentiles, y por host las conexiones abiertas frente a peticiones servidas (reuso).
+"""
+
+import logging
+import random
+import time
+from collections import deque
+from threading import Lock
+from typing import Any, Deque, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import Config
+from app.lib.utils.rate_limiter import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+LATENCY_WINDOW = 1000  # Latencias guardadas por endpoint
+
+
+def parse_pool_sizes(value: Optional[str]) -> Dict[str, int]:
+    """'api.kraken.com=20,open-api.bingx.com=10' -> {host: tamaño}."""
+    sizes = {}
+    for item in (value or "").split(","):
+        host, _, size = item.strip().partition("=")
+        if host and size:
+            sizes[host.strip()] = int(size)
+    return sizes
+
+
+def _percentile(sorted_values, q: float) -> float:
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+class _EndpointStats:
+    __slots__ = ("requests", "errors", "retries", "latencies")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+
+class HttpClient:
+    def __init__(self, pool_size: int = 10, pool_sizes: Optional[Dict[str, int]] = None, timeout: float = 10,
+                 retries: int = 3, backoff: float = 0.5, max_backoff: float = 8.0):
+        self.pool_size = pool_size
+        self.pool_sizes = pool_sizes or {}
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._sessions: Dict[str, requests.Session] = {}
+        self._adapters: Dict[str, HTTPAdapter] = {}
+        self._endpoints: Dict[str, _EndpointStats] = {}
+        self._lock = Lock()
+
+    def _session(self, scheme: str, host: str) -> requests.Session:
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    size = self.pool_sizes.get(host, self.pool_size)
+                    # Los reintentos los hace request() con jitter; el adapter no reintenta
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size, max_retries=0)
+                    session = requests.Session()
+                    session.headers["Accept-Encoding"] = "gzip, deflate"
+                    session.mount(f"{scheme}://{host}", adapter)
+                    self._adapters[host] = adapter
+                    self._sessions[host] = session
+        return session
+
+    def _stats_for(self, endpoint: str) -> _EndpointStats:
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            with self._lock:
+                stats = self._endpoints.setdefault(endpoint, _EndpointStats())
+        return stats
+
+    def _sleep_before_retry(self, attempt: int, response: Optional[requests.Response]) -> None:
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.max_backoff))
+        time.sleep(delay)
+
+    # ----------------------------
+    # Peticiones
+    # ----------------------------
+
+    def request(self, method: str, url: str, retries: Optional[int] = None,
+                rate_limit: Optional[Tuple[str, Optional[str], str]] = None, **kwargs: Any) -> requests.Response:
+        """
+        Same arguments as requests.request. Non idempotent methods are not retried unless
+        `retries` is given; after the last attempt the response (or the error) is returned
+        to the caller as is. `rate_limit` is the (exchange, api_key, endpoint class) bucket.
+        """
+        method = method.upper()
+        parts = urlsplit(url)
+        session = self._session(parts.scheme, parts.netloc)
+        stats = self._stats_for(f"{method} {parts.netloc}{parts.path}")
+        if retries is None:
+            retries = self.retries if method in IDEMPOTENT_METHODS else 0
+        kwargs.setdefault("timeout", self.timeout)
+
+        attempt = 0
+        while True:
+            if rate_limit is not None:
+                rate_limiter.acquire(*rate_limit, cost=rate_limiter.weight(rate_limit[0], parts.path))
+            started = time.perf_counter()
+            response = None
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                with self._lock:
+                    stats.requests += 1
+                    stats.errors += 1
+                if attempt >= retries:
+                    raise
+                logger.warning("[HttpClient] %s %s failed (%s), retrying", method, url, e)
+            else:
+                with self._lock:
+                    stats.requests += 1
+                    stats.latencies.append(time.perf_counter() - started)
+                    if response.status_code >= 400:
+                        stats.errors += 1
+                if response.status_code == 429 and rate_limit is not None:
+                    rate_limiter.penalize(*rate_limit)
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    return response
+                logger.warning("[HttpClient] %s %s returned %s, retrying", method, url, response.status_code)
+                response.close()
+            with self._lock:
+                stats.retries += 1
+            self._sleep_before_retry(attempt, response)
+            attempt += 1
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    # ----------------------------
+    # Estadisticas
+    # ----------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Connection reuse per host and latency percentiles (ms) per endpoint."""
+        hosts = {}
+        with self._lock:
+            adapters = dict(self._adapters)
+            endpoints = {name: (s.requests, s.errors, s.retries, sorted(s.latencies))
+                         for name, s in self._endpoints.items()}
+        for host, adapter in adapters.items():
+            opened = served = 0
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    opened += pool.num_connections
+                    served += pool.num_requests
+            hosts[host] = {
+                "pool_size": self.pool_sizes.get(host, self.pool_size),
+                "connections_opened": opened,
+                "requests": served,
+                "reuse_ratio": 1 - opened / served if served else 0.0,
+            }
+
+        endpoint_stats = {}
+        for name, (count, errors, retries, latencies) in endpoints.items():
+            endpoint_stats[name] = {
+                "requests": count,
+                "errors": errors,
+                "retries": retries,
+                "p50_ms": _percentile(latencies, 0.50) * 1000 if latencies else None,
+                "p95_ms": _percentile(latencies, 0.95) * 1000 if latencies else None,
+                "p99_ms": _percentile(latencies, 0.99) * 1000 if latencies else None,
+            }
+        return {"hosts": hosts, "endpoints": endpoint_stats}
+
+
+http_client = HttpClient(
+    pool_size=Config.HTTP_POOL_SIZE,
+    pool_sizes=parse_pool_sizes(Config.HTTP_POOL_SIZES),
+    timeout=Config.HTTP_TIMEOUT,
+    retries=Config.HTTP_RETRIES,
+)
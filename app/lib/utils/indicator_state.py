@@ -0,0 +1,227 @@
+"""
+Estado incremental (streaming) de indicadores por (exchange, symbol, timeframe).
+
+En lugar de recalcular EMA12, EMA26 y RSI sobre toda la ventana OHLCV en cada
+iteracion del bot, se guarda el estado de la recursion y cada vela cerrada nueva
+se procesa en O(1). La ultima vela de la ventana (todavia en formacion) se evalua
+de forma provisional sin modificar el estado, por lo que puede revisarse en cada tick.
+
+Los valores son los mismos que produce calculate_indicators sobre el historial
+completo visto por el estado (ewm adjust=False y RSI con media movil simple).
+"""
+
+import logging
+import math
+from collections import OrderedDict, deque
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from app.lib.utils.trading_strategies import (
+    CANDLESTICK_PATTERN_COLUMNS,
+    calculate_candlestick_patterns,
+    calculate_indicators,
+)
+
+logger = logging.getLogger(__name__)
+
+EMA_FAST_SPAN = 12
+EMA_SLOW_SPAN = 26
+RSI_PERIOD = 14
+MAX_HISTORY = 1000  # Velas cerradas recordadas para reconstruir la ventana
+
+OUTPUT_COLUMNS = [
+    "timestamp",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "EMA12",
+    "EMA26",
+    "RSI",
+] + CANDLESTICK_PATTERN_COLUMNS
+
+
+def timeframe_to_seconds(timeframe: str) -> int:
+    """Converts timeframe string (1m, 5m, 1h, 1d, 1w, 1M) to seconds."""
+    units = {"m": 60, "h": 3600, "d": 86400, "w": 604800, "M": 2592000}
+    try:
+        return int(timeframe[:-1]) * units[timeframe[-1]]
+    except (KeyError, ValueError, IndexError):
+        logger.warning("Unknown timeframe format: %s. Assuming 60 seconds.", timeframe)
+        return 60
+
+
+def _rsi_from_window(gains: deque, losses: deque) -> float:
+    """Mismo calculo que calculate_rsi_series para la ultima fila de la ventana."""
+    avg_gain = sum(gains) / len(gains)
+    avg_loss = sum(losses) / len(losses)
+    if avg_loss == 0:
+        # calculate_rsi_series: inf -> RS 100, 0/0 -> RS 0
+        rs = 100 if avg_gain > 0 else 0
+    else:
+        rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+
+class IncrementalIndicators:
+    """
+    Thread-safe streaming EMA12/EMA26/RSI state for one candle series.
+    update() receives the OHLCV window the bot just fetched and returns the same
+    columns as calculate_indicators, doing O(1) work per new closed candle.
+    """
+
+    def __init__(self, timeframe: str = "5m"):
+        self.timeframe = timeframe
+        self._candle_delta = pd.Timedelta(seconds=timeframe_to_seconds(timeframe))
+        self._lock = Lock()
+        self._reset()
+
+    def _reset(self):
+        self._closed_ts: Optional[pd.Timestamp] = None
+        self._count = 0
+        self._ema_fast: Optional[float] = None
+        self._ema_slow: Optional[float] = None
+        self._prev_close: Optional[float] = None
+        self._gains: deque = deque(maxlen=RSI_PERIOD)
+        self._losses: deque = deque(maxlen=RSI_PERIOD)
+        # ts -> (ema12, ema26, rsi) sin aplicar el minimo de datos
+        self._history: "OrderedDict[pd.Timestamp, Tuple[float, float, float]]" = OrderedDict()
+
+    # ----------------------------
+    # Recursion
+    # ----------------------------
+
+    def _step(self, close: float):
+        """Returns the next recursion state for close without mutating self."""
+        alpha_fast = 2 / (EMA_FAST_SPAN + 1)
+        alpha_slow = 2 / (EMA_SLOW_SPAN + 1)
+
+        if self._ema_fast is None:
+            ema_fast, ema_slow = close, close
+        else:
+            ema_fast = alpha_fast * close + (1 - alpha_fast) * self._ema_fast
+            ema_slow = alpha_slow * close + (1 - alpha_slow) * self._ema_slow
+
+        # The first candle contributes a zero delta, like series.diff() + where(...)
+        delta = 0.0 if self._prev_close is None else close - self._prev_close
+        gains = deque(self._gains, maxlen=RSI_PERIOD)
+        losses = deque(self._losses, maxlen=RSI_PERIOD)
+        gains.append(delta if delta > 0 else 0.0)
+        losses.append(-delta if delta < 0 else 0.0)
+
+        return ema_fast, ema_slow, gains, losses
+
+    def _commit(self, ts: pd.Timestamp, close: float):
+        ema_fast, ema_slow, gains, losses = self._step(close)
+        self._ema_fast, self._ema_slow = ema_fast, ema_slow
+        self._gains, self._losses = gains, losses
+        self._prev_close = close
+        self._closed_ts = ts
+        self._count += 1
+
+        self._history[ts] = (ema_fast, ema_slow, _rsi_from_window(gains, losses))
+        if len(self._history) > MAX_HISTORY:
+            self._history.popitem(last=False)
+
+    def _advance(self, timestamps: list, closes: list):
+        """Commits every closed candle of the window not yet seen by the state."""
+        closed = list(zip(timestamps[:-1], closes[:-1]))
+        pending = [(ts, c) for ts, c in closed if self._closed_ts is None or ts > self._closed_ts]
+
+        if self._closed_ts is not None and pending and pending[0][0] > self._closed_ts + self._candle_delta:
+            # Hay velas que nunca vimos (bot pausado, caida de red...): se reconstruye con la ventana
+            logger.info("Gap detected after %s, rebuilding indicator state from the window", self._closed_ts)
+            self._reset()
+            pending = closed
+
+        for ts, close in pending:
+            if math.isnan(close):
+                continue
+            self._commit(ts, close)
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+
+    def warm_up(self, history: pd.DataFrame) -> bool:
+        """
+        Commits stored closed candles (e.g. from the candle store) into an empty state.
+        If they do not connect with the next live window, update() detects the gap and rebuilds.
+        """
+        if history.empty:
+            return False
+        with self._lock:
+            if self._closed_ts is not None:
+                return False
+            for ts, close in zip(pd.to_datetime(history["timestamp"]), history["close"].astype(float)):
+                if not math.isnan(close):
+                    self._commit(ts, close)
+            return True
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Feeds the latest OHLCV window (last row = forming candle) and returns it
+        with EMA12, EMA26, RSI and candlestick pattern columns.
+        """
+        if df.empty or not all(col in df.columns for col in OUTPUT_COLUMNS[:6]):
+            return calculate_indicators(df)
+
+        timestamps = list(pd.to_datetime(df["timestamp"]))
+        closes = df["close"].astype(float).tolist()
+
+        with self._lock:
+            self._advance(timestamps, closes)
+
+            values: Dict[pd.Timestamp, Tuple[float, float, float]] = {
+                ts: self._history[ts] for ts in timestamps if ts in self._history
+            }
+            seen = self._count
+
+            last_ts, last_close = timestamps[-1], closes[-1]
+            if last_ts not in values and not math.isnan(last_close) and (
+                self._closed_ts is None or last_ts > self._closed_ts
+            ):
+                # Forming candle: evaluated on a copy of the state so it can be revised next tick
+                ema_fast, ema_slow, gains, losses = self._step(last_close)
+                values[last_ts] = (ema_fast, ema_slow, _rsi_from_window(gains, losses))
+                seen += 1
+
+        # Same minimum-data rules as calculate_indicators (all NA until enough candles)
+        nan = float("nan")
+        ema_fast_col, ema_slow_col, rsi_col = [], [], []
+        for ts in timestamps:
+            ema_fast, ema_slow, rsi = values.get(ts, (nan, nan, nan))
+            ema_fast_col.append(ema_fast if seen >= EMA_FAST_SPAN else nan)
+            ema_slow_col.append(ema_slow if seen >= EMA_SLOW_SPAN else nan)
+            rsi_col.append(rsi if seen >= RSI_PERIOD + 1 else nan)
+
+        df_copy = df.copy()
+        df_copy["EMA12"] = ema_fast_col
+        df_copy["EMA26"] = ema_slow_col
+        df_copy["RSI"] = rsi_col
+
+        patterns = calculate_candlestick_patterns(df_copy)
+        for col in CANDLESTICK_PATTERN_COLUMNS:
+            df_copy[col] = patterns[col]
+
+        return df_copy[OUTPUT_COLUMNS]
+
+
+# ----------------------------
+# Process-wide registry
+# ----------------------------
+
+_states: Dict[Tuple[str, str, str], IncrementalIndicators] = {}
+_states_lock = Lock()
+
+
+def get_indicator_state(symbol: str, timeframe: str, source: str = "") -> IncrementalIndicators:
+    """Returns the shared IncrementalIndicators for (source, symbol, timeframe)."""
+    key = (source, symbol, timeframe)
+    with _states_lock:
+        if key not in _states:
+            _states[key] = IncrementalIndicators(timeframe)
+        return _states[key]
@@ -0,0 +1,134 @@
+"""
+Asignador de nonces en memoria para las llamadas privadas de Kraken.
+
+KrakenExchange.get_nonce tomaba un lock de clase y leia y reescribia un fichero en cada
+llamada privada. Ahora cada API key tiene un contador monotono en memoria (lock propio,
+sin I/O): el siguiente nonce es max(tiempo en microsegundos, ultimo + 1). El maximo
+emitido (high-water mark) se guarda en disco como mucho cada PERSIST_INTERVAL segundos y
+al cerrar el proceso; al arrancar se continua desde ese valor mas SAFETY_MARGIN, por si
+el reloj retrocedio o se perdieron los nonces emitidos desde la ultima escritura.
+
+El fichero es JSON {hash de la API key: nonce}; un entero suelto (formato anterior) se
+usa como minimo para todas las keys.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import time
+from threading import Lock
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PERSIST_INTERVAL = 5.0  # segundos
+SAFETY_MARGIN = int((PERSIST_INTERVAL + 60) * 1_000_000)  # microsegundos
+
+
+class _KeyCounter:
+    __slots__ = ("lock", "last")
+
+    def __init__(self, start: int):
+        self.lock = Lock()
+        self.last = start
+
+
+class NonceAllocator:
+    def __init__(self, path: str, persist_interval: float = PERSIST_INTERVAL, safety_margin: int = SAFETY_MARGIN):
+        self.path = path
+        self.persist_interval = persist_interval
+        self.safety_margin = safety_margin
+        self._counters: Dict[str, _KeyCounter] = {}
+        self._counters_lock = Lock()
+        self._persist_lock = Lock()
+        self._last_persist = time.monotonic()
+        self._persisted, self._legacy_floor = self._load()
+        self._stats = {"allocated": 0, "persists": 0, "persist_errors": 0}
+
+    @staticmethod
+    def key_id(api_key: Optional[str]) -> str:
+        """La API key no se guarda en claro en el fichero."""
+        return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                content = f.read().strip()
+        except FileNotFoundError:
+            return {}, 0
+        except OSError as e:
+            logger.error("Could not read nonce file '%s': %s", self.path, e)
+            return {}, 0
+        try:
+            data = json.loads(content) if content else {}
+        except ValueError:
+            logger.error("Invalid content in nonce file '%s', starting from the current time", self.path)
+            return {}, 0
+        if isinstance(data, int):
+            return {}, data
+        return {k: int(v) for k, v in data.items()}, 0
+
+    def _counter(self, key: str) -> _KeyCounter:
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._counters_lock:
+                counter = self._counters.get(key)
+                if counter is None:
+                    persisted = max(self._persisted.get(key, 0), self._legacy_floor)
+                    # Continua por encima de lo que pudo emitirse desde la ultima escritura
+                    start = persisted + self.safety_margin if persisted else 0
+                    counter = _KeyCounter(start)
+                    self._counters[key] = counter
+        return counter
+
+    def next_nonce(self, api_key: Optional[str]) -> int:
+        """Strictly increasing nonce for api_key (microsecond based)."""
+        counter = self._counter(self.key_id(api_key))
+        with counter.lock:
+            nonce = max(time.time_ns() // 1000, counter.last + 1)
+            counter.last = nonce
+        self._stats["allocated"] += 1
+        if time.monotonic() - self._last_persist >= self.persist_interval:
+            self.persist()
+        return nonce
+
+    def persist(self) -> None:
+        """Writes every key's high-water mark (atomic replace)."""
+        if not self._persist_lock.acquire(blocking=False):
+            return  # Otro hilo ya esta escribiendo
+        try:
+            self._last_persist = time.monotonic()
+            with self._counters_lock:
+                marks = dict(self._persisted)
+                marks.update({key: counter.last for key, counter in self._counters.items() if counter.last})
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(marks, f)
+            os.replace(tmp, self.path)
+            self._persisted = marks
+            self._stats["persists"] += 1
+        except OSError as e:
+            self._stats["persist_errors"] += 1
+            logger.error("Error writing nonce high-water marks to '%s': %s", self.path, e)
+        finally:
+            self._persist_lock.release()
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self._stats, keys=len(self._counters))
+
+
+_allocators: Dict[str, NonceAllocator] = {}
+_allocators_lock = Lock()
+
+
+def get_nonce_allocator(path: str) -> NonceAllocator:
+    """One allocator per file for the whole process; persisted again at exit."""
+    with _allocators_lock:
+        allocator = _allocators.get(path)
+        if allocator is None:
+            allocator = NonceAllocator(path)
+            _allocators[path] = allocator
+            atexit.register(allocator.persist)
+        return allocator
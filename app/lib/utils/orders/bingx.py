@@ -4,6 +4,9 @@ import flask
 from app.viewmodels.api.exchange.Exchange import ExchangeFactory
 from app.iu.routes.tradings.trading_routes import get_current_price, validate_master_account_balance
 from app.viewmodels.wallet.found import Wallet, WalletAdmin
+from app.lib.utils.reconciliation import ReconciliationJob, enqueue_reconciliation
+from app.models.blocked_balance import adjust_blocked_quantity
+from app.models.trades import set_trade_fill
 
 logger = logging.getLogger(__name__)
 
@@ -114,13 +117,14 @@ def process_order(user_id: int, data: dict, trading_mode: str, type_bot: str) ->
 	if status_code != 200:
 		return False, 0.00
 
+	blocked_id = None
 	try:
 		amount_traded = amount * leverage
 		cost_in_usdt = float(cost_in_usdt)
 		fees = float(fees)
 
 		if data.get('orderDirection') == 'buy':
-			wallet.add_blocked_balance(
+			blocked_id = wallet.add_blocked_balance(
 				amount_usdt=-(cost_in_usdt - fees),
 				amount_crypto=amount_traded,
 				currency="BTC/USDT",
@@ -129,7 +133,7 @@ def process_order(user_id: int, data: dict, trading_mode: str, type_bot: str) ->
 				market_type=params['trading_mode']
 			)
 		elif data.get('orderDirection') == 'sell':
-			wallet.add_blocked_balance(
+			blocked_id = wallet.add_blocked_balance(
 				amount_usdt=(cost_in_usdt - fees),
 				amount_crypto=-amount_traded,
 				currency="BTC/USDT",
@@ -156,4 +160,42 @@ def process_order(user_id: int, data: dict, trading_mode: str, type_bot: str) ->
 		logger.error(f'Wallet transaction error: {e}')
 		return False, 0.00
 
+	# Lo reservado sale del ack; fills y comisiones reales se concilian en segundo plano
+	order_id = order.get("order_id") if isinstance(order, dict) else None
+	if order_id and not blocked_id:
+		# Sin registro reservado no hay nada que conciliar (ni un id fiable al que aplicarlo)
+		logger.error(f'Blocked balance for order {order_id} was not booked, skipping reconciliation')
+	elif order_id:
+		_queue_fill_reconciliation(exchange, user_id, blocked_id, order_id, data, cost_in_usdt, fees)
+
 	return True, amount_traded
+
+def _queue_fill_reconciliation(exchange, user_id, blocked_id: str, order_id: str, data: dict, booked_cost: float, booked_fees: float):
+	"""
+	Encola la conciliacion de una orden de BingX: cuando se conoce el fill real se
+	corrige el USDT del registro blocked_id (el que reservo la orden) y el
+	volumen/precio del Trade.
+	"""
+	direction = data.get('orderDirection')
+	by_bot = data["order_made_by"]
+
+	def apply(fill: dict):
+		booked = booked_cost - booked_fees
+		settled = fill["cost"] - fill["fee"]
+		# Compra reserva -(cost - fees) y venta +(cost - fees), igual que process_order
+		delta_usdt = (booked - settled) if direction == 'buy' else (settled - booked)
+		if abs(delta_usdt) > 1e-12:
+			adjust_blocked_quantity(blocked_id, amount_usdt=delta_usdt, amount_crypto=0.0)
+
+		volume = fill["filled"]
+		if direction == 'buy' and fill["price"]:
+			volume -= fill["fee"] / fill["price"]
+		set_trade_fill(order_id, volume=volume, price=fill["price"] or None)
+
+	enqueue_reconciliation(ReconciliationJob(
+		order_id=order_id,
+		user_id=user_id,
+		fetch=lambda: exchange.get_order_fill(order_id, data.get('symbol')),
+		apply=apply,
+		by_bot=by_bot,
+	))
@@ -3,6 +3,9 @@ import flask
 from app.viewmodels.api.exchange.Exchange import ExchangeFactory
 from app.iu.routes.tradings.trading_routes import validate_master_account_balance
 from app.viewmodels.wallet.found import Wallet
+from app.lib.utils.reconciliation import ReconciliationJob, enqueue_reconciliation
+from app.models.blocked_balance import adjust_blocked_quantity
+from app.models.trades import set_trade_fill
 
 logger = logging.getLogger(__name__)
 
@@ -80,45 +83,79 @@ def process_order(user_id: int, data: dict) -> tuple[bool, float]:
     if response[0] is None and "Insufficient funds" in response[1]:
         return False, 0.00
 
-    order_id = response[0]["id"]
-    data_for_order = exchange.get_kraken_order_details(order_id)
-    filled = data_for_order["filled"]
-    cost = data_for_order["cost"]
-    fee = data_for_order["fee"]
-
     if isinstance(response, tuple):
         order, error = response
         if error:
             return False, 0.00
     else:
         order = response
-        error = None
-
-    if error is None:
-        try:
-            symbol_base = symbol.split("/")[0]
-            symbol_base_1 = symbol.split("/")[1]
-            # amount_obtained_from_the_order_crypto = filled - fee[symbol_base]
-
-            if order_direction == "buy":
-                wallet.add_blocked_balance(
-                    amount_usdt=-(cost - fee[symbol_base_1]),
-                    amount_crypto=filled,
-                    currency="BTC/USDT",
-                    by_bot=data["order_made_by"]
-                )
-                # handle_user_balance[user_id]["usd"] += -(cost - fee[symbol_base_1])
-                # handle_user_balance[user_id]["cripto"] += filled
-            elif order_direction == "sell":
-                wallet.add_blocked_balance(
-                    amount_usdt=(cost - fee[symbol_base_1]),
-                    amount_crypto=filled,
-                    currency="BTC/USDT",
-                    by_bot=data["order_made_by"]
-                )
-                # handle_user_balance[user_id]["usd"] += (cost - fee[symbol_base_1])
-                # handle_user_balance[user_id]["cripto"] += filled
-        except Exception as wallet_error:
-            return False, 0.00
+
+    # Reserva provisional con lo solicitado (data["price"] es precio unitario, como en
+    # add_order del exchange); fill y comision reales los aplica la cola de conciliacion
+    order_price = price["price"] if isinstance(price, dict) else price
+    booked_cost = float(order_price) * volume
+    blocked_id = None
+    try:
+        if order_direction == "buy":
+            blocked_id = wallet.add_blocked_balance(
+                amount_usdt=-booked_cost,
+                amount_crypto=volume,
+                currency="BTC/USDT",
+                by_bot=data["order_made_by"],
+                order="buy"
+            )
+        elif order_direction == "sell":
+            blocked_id = wallet.add_blocked_balance(
+                amount_usdt=booked_cost,
+                amount_crypto=-volume,
+                currency="BTC/USDT",
+                by_bot=data["order_made_by"],
+                order="sell"
+            )
+    except Exception as wallet_error:
+        logger.error(f'Wallet transaction error: {wallet_error}')
+        return False, 0.00
+
+    if not blocked_id:
+        # Sin registro reservado no hay nada que conciliar (ni un id fiable al que aplicarlo)
+        logger.error(f'Blocked balance for order {order["id"]} was not booked, skipping reconciliation')
+        return True, 0.00
+
+    _queue_fill_reconciliation(exchange, user_id, blocked_id, order["id"], order_direction, symbol, data["order_made_by"], booked_cost, volume)
 
     return True, 0.00
+
+def _queue_fill_reconciliation(exchange, user_id, blocked_id: str, order_id: str, order_direction: str, symbol: str, by_bot: str, booked_cost: float, booked_volume: float):
+    """
+    Encola la conciliacion de una orden de Kraken spot: cuando la orden esta cerrada
+    se corrigen USDT y cripto del registro blocked_id (el que reservo la orden) y el
+    volumen/precio del Trade.
+    """
+    quote = symbol.split("/")[1]
+
+    def fetch():
+        details = exchange.get_kraken_order_details(order_id)
+        if details["error"] or details["status"] != "closed":
+            return None
+        return details
+
+    def apply(fill: dict):
+        settled_usdt = fill["cost"] - (fill["fee"] or {}).get(quote, 0.0)
+        if order_direction == "buy":
+            delta_usdt = -settled_usdt + booked_cost
+            delta_crypto = fill["filled"] - booked_volume
+        else:
+            delta_usdt = settled_usdt - booked_cost
+            delta_crypto = booked_volume - fill["filled"]
+        adjust_blocked_quantity(blocked_id, amount_usdt=delta_usdt, amount_crypto=delta_crypto)
+
+        price = fill["cost"] / fill["filled"] if fill["filled"] else None
+        set_trade_fill(order_id, volume=fill["filled"], price=price)
+
+    enqueue_reconciliation(ReconciliationJob(
+        order_id=order_id,
+        user_id=user_id,
+        fetch=fetch,
+        apply=apply,
+        by_bot=by_bot,
+    ))
@@ -0,0 +1,236 @@
+"""
+Barrido de parametros en paralelo sobre el backtester.
+
+Cada combinacion de la rejilla es un BacktestConfig (stop_loss_pct, take_profit_pct,
+timeframe, max_active_trades, ema_fast/ema_slow, rsi_buy/rsi_sell, engulfing_pct...) y se
+ejecuta en un pool de procesos. Las velas no se envian con cada tarea: el proceso principal
+las escribe una vez como arrays .npy y los workers las abren con np.load(mmap_mode="r"),
+de modo que todos leen las mismas paginas del page cache. Si las velas vienen de un
+candle_archive no se escribe nada: cada worker abre directamente el mismo archivo. Cada
+worker guarda los indicadores por (timeframe, ema_fast, ema_slow) y las tareas se ordenan
+para reutilizarlos.
+
+Uso: python -m app.lib.utils.parameter_sweep velas.csv --stop-loss 0.01,0.02 --rsi-buy 25,30
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, fields, replace
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from app.lib.utils.backtester import (
+    BacktestConfig,
+    compute_signals,
+    load_candles,
+    prepare_indicators,
+    resample_candles,
+    simulate,
+    summarize,
+)
+from app.lib.utils.candle_archive import CandleArchive, is_archive, to_ms
+from app.viewmodels.services.SimpleQTable import SimpleQTable
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+INDICATOR_CACHE_SIZE = 8  # Combinaciones (timeframe, ema_fast, ema_slow) por worker
+
+
+def build_grid(base: BacktestConfig, grid: Dict[str, Sequence[Any]]) -> List[BacktestConfig]:
+    """Producto cartesiano de la rejilla sobre base; las claves son campos de BacktestConfig."""
+    valid = {f.name for f in fields(BacktestConfig)}
+    unknown = set(grid) - valid
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    keys = list(grid)
+    configs = [replace(base, **dict(zip(keys, values))) for values in itertools.product(*grid.values())]
+    return [c for c in configs if c.ema_fast < c.ema_slow and c.rsi_buy < c.rsi_sell]
+
+
+# ----------------------------
+# Datos compartidos (memmap)
+# ----------------------------
+
+def write_shared_candles(candles: pd.DataFrame, directory: str) -> Dict[str, str]:
+    """Escribe timestamps (int64 ns) y OHLCV (float64, n x 5) como .npy para abrirlos con mmap."""
+    paths = {
+        "timestamps": os.path.join(directory, "timestamps.npy"),
+        "ohlcv": os.path.join(directory, "ohlcv.npy"),
+    }
+    np.save(paths["timestamps"], candles["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64))
+    np.save(paths["ohlcv"], np.ascontiguousarray(candles[OHLCV_COLUMNS].to_numpy(dtype=np.float64)))
+    return paths
+
+
+_worker_candles: Optional[pd.DataFrame] = None
+_worker_q_table: Optional[SimpleQTable] = None
+_worker_indicators: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+
+
+def _init_worker(paths: Dict[str, Any], q_table_path: Optional[str]):
+    global _worker_candles, _worker_q_table
+    _worker_q_table = SimpleQTable(q_table_path) if q_table_path else None
+    if "archive" in paths:
+        _worker_candles = CandleArchive(paths["archive"]).to_frame(paths["start"], paths["end"])
+        return
+    timestamps = np.load(paths["timestamps"], mmap_mode="r")
+    ohlcv = np.load(paths["ohlcv"], mmap_mode="r")
+    # Las columnas son vistas del memmap: no se copian al construir el DataFrame
+    columns = {"timestamp": pd.to_datetime(timestamps.view("datetime64[ns]"))}
+    columns.update({col: ohlcv[:, i] for i, col in enumerate(OHLCV_COLUMNS)})
+    _worker_candles = pd.DataFrame(columns, copy=False)
+
+
+def _indicators_for(config: BacktestConfig) -> pd.DataFrame:
+    key = (config.timeframe, config.ema_fast, config.ema_slow)
+    ind = _worker_indicators.get(key)
+    if ind is None:
+        ind = prepare_indicators(resample_candles(_worker_candles, config.timeframe), config.ema_fast, config.ema_slow)
+        _worker_indicators[key] = ind
+        while len(_worker_indicators) > INDICATOR_CACHE_SIZE:
+            _worker_indicators.popitem(last=False)
+    else:
+        _worker_indicators.move_to_end(key)
+    return ind
+
+
+def _run_one(config: BacktestConfig) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        ind = _indicators_for(config)
+        signals = compute_signals(
+            ind, _worker_q_table, config.window, config.rsi_buy, config.rsi_sell, config.engulfing_pct
+        )
+        summary = summarize(simulate(ind, signals, config))
+        error = None
+    except Exception as e:
+        summary, error = {}, str(e)
+    row = {k: v for k, v in asdict(config).items() if k != "strategies"}
+    row["strategies"] = ",".join(config.strategies)
+    row.update(summary)
+    row["error"] = error
+    row["seconds"] = time.perf_counter() - start
+    return row
+
+
+# ----------------------------
+# Runner
+# ----------------------------
+
+def rank_results(results: pd.DataFrame) -> pd.DataFrame:
+    """Rango por PnL (desc) y por drawdown (asc); ordena por su media (rank) y desempata por PnL."""
+    ok = results[results["error"].isna()].copy() if "error" in results else results.copy()
+    if ok.empty:
+        return ok.reset_index(drop=True)
+    ok["pnl_rank"] = ok["total_pnl"].rank(ascending=False, method="min")
+    ok["drawdown_rank"] = ok["max_drawdown"].rank(ascending=True, method="min")
+    ok["rank"] = (ok["pnl_rank"] + ok["drawdown_rank"]) / 2
+    return ok.sort_values(["rank", "total_pnl"], ascending=[True, False]).reset_index(drop=True)
+
+
+def run_sweep(candles: Union[pd.DataFrame, str], grid: Dict[str, Sequence[Any]], base: Optional[BacktestConfig] = None,
+              q_table_path: Optional[str] = None, processes: Optional[int] = None,
+              start=None, end=None) -> pd.DataFrame:
+    """
+    Runs every grid combination over a process pool and returns the ranked results.
+    candles can also be a candle_archive directory, sliced to [start, end) by each worker.
+    """
+    configs = build_grid(base or BacktestConfig(), grid)
+    # Tareas con los mismos indicadores juntas para aprovechar la cache de cada worker
+    configs.sort(key=lambda c: (c.timeframe, c.ema_fast, c.ema_slow))
+    processes = processes or os.cpu_count() or 1
+    chunksize = max(1, len(configs) // (processes * 4))
+
+    directory = None
+    try:
+        if isinstance(candles, str):
+            paths = {"archive": candles, "start": to_ms(start), "end": to_ms(end)}
+        else:
+            directory = tempfile.mkdtemp(prefix="sweep_candles_")
+            paths = write_shared_candles(candles, directory)
+        start = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=processes, initializer=_init_worker, initargs=(paths, q_table_path)
+        ) as pool:
+            rows = list(pool.map(_run_one, configs, chunksize=chunksize))
+        logger.info("Sweep of %s configs on %s processes took %.1fs", len(configs), processes, time.perf_counter() - start)
+    finally:
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    results = pd.DataFrame(rows)
+    if results.empty:
+        return results
+    failed = results["error"].notna().sum()
+    if failed == len(results):
+        raise RuntimeError(f"All {failed} sweep configs failed, first error: {results['error'].dropna().iloc[0]}")
+    if failed:
+        logger.warning("%s sweep configs failed, first error: %s", failed, results["error"].dropna().iloc[0])
+    return rank_results(results)
+
+
+def _floats(value: str) -> List[float]:
+    return [float(v) for v in value.split(",") if v]
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep of the TradingBot strategies")
+    parser.add_argument("path", help="CSV, Parquet or candle_archive directory with timestamp, open, high, low, close, volume")
+    parser.add_argument("--start", default=None, help="First candle date (inclusive)")
+    parser.add_argument("--end", default=None, help="Last candle date (exclusive)")
+    parser.add_argument("--timeframe", type=lambda v: v.split(","), default=["5m"])
+    parser.add_argument("--stop-loss", type=_floats, default=[0.02])
+    parser.add_argument("--take-profit", type=_floats, default=[0.04])
+    parser.add_argument("--max-active-trades", type=_ints, default=[1])
+    parser.add_argument("--ema-fast", type=_ints, default=[12])
+    parser.add_argument("--ema-slow", type=_ints, default=[26])
+    parser.add_argument("--rsi-buy", type=_floats, default=[30])
+    parser.add_argument("--rsi-sell", type=_floats, default=[70])
+    parser.add_argument("--engulfing-pct", type=_floats, default=[0.02])
+    parser.add_argument("--fee-rate", type=float, default=0.0)
+    parser.add_argument("--q-table", default=None)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", default=None, help="Write the ranked results to this CSV")
+    args = parser.parse_args(argv)
+
+    grid = {
+        "timeframe": args.timeframe,
+        "stop_loss_pct": args.stop_loss,
+        "take_profit_pct": args.take_profit,
+        "max_active_trades": args.max_active_trades,
+        "ema_fast": args.ema_fast,
+        "ema_slow": args.ema_slow,
+        "rsi_buy": args.rsi_buy,
+        "rsi_sell": args.rsi_sell,
+        "engulfing_pct": args.engulfing_pct,
+    }
+    start = time.perf_counter()
+    candles = args.path if is_archive(args.path) else load_candles(args.path, args.start, args.end)
+    results = run_sweep(
+        candles, grid, BacktestConfig(fee_rate=args.fee_rate),
+        q_table_path=args.q_table, processes=args.processes, start=args.start, end=args.end,
+    )
+    print(f"{len(results)} configs in {time.perf_counter() - start:.1f}s")
+    with pd.option_context("display.width", 200, "display.max_columns", 30):
+        print(results.head(args.top))
+    if args.out:
+        results.to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Vector de estado (30 dimensiones) para el agente PPO del StrategyTradingBot.
+
+Las 27 features de mercado salen de calculate_indicators sobre las ultimas
+FEATURE_WINDOW velas cerradas: retornos, spreads de EMA, RSI, flags de patrones de velas,
+forma de la vela y volumen. La ventana del hub solo trae unas pocas velas, asi que se
+completa con el historial de candle_store (y si aun faltan, se descargan del exchange una
+vez) para que EMA26, RSI y la volatilidad de 20 velas esten definidas. Se calculan una
+sola vez por (source, symbol, timeframe) y vela cerrada y todos los bots del mismo par las
+comparten. Se normalizan con media y desviacion de la ventana, recalculadas cada
+NORM_REFRESH_CANDLES velas. Las 3 ultimas features son de la posicion del bot
+(get_blocked_balance) y se añaden por bot.
+"""
+
+import logging
+import warnings
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.lib.utils.candle_store import candle_store, candle_to_record, record_to_candle
+from app.lib.utils.trading_strategies import CANDLESTICK_PATTERN_COLUMNS, calculate_indicators
+
+logger = logging.getLogger(__name__)
+
+FEATURE_DIM = 30
+RETURN_LAGS = 10
+MARKET_FEATURE_NAMES = (
+    [f"return_{lag}" for lag in range(RETURN_LAGS)]
+    + ["ema_spread", "close_ema12", "close_ema26", "rsi", "rsi_change"]
+    + list(CANDLESTICK_PATTERN_COLUMNS)
+    + ["body", "range", "upper_wick", "lower_wick", "volume_ratio", "return_5", "volatility_20"]
+)
+POSITION_FEATURE_NAMES = ["position_side", "unrealized_pnl", "position_size"]
+NORM_REFRESH_CANDLES = 50
+FEATURE_WINDOW = 120  # Velas cerradas usadas para las features y la normalizacion
+MIN_FEATURE_CANDLES = 26 + 20  # EMA26 + ventana de volatilidad_20
+CLIP = 5.0
+
+# Los flags de patrones ya son 0/1: no se normalizan
+_BINARY = np.isin(MARKET_FEATURE_NAMES, CANDLESTICK_PATTERN_COLUMNS)
+
+
+def market_feature_matrix(df: pd.DataFrame) -> np.ndarray:
+    """Features de mercado de todas las filas de la ventana (n x 27), sin normalizar."""
+    ind = calculate_indicators(df)
+    close = ind["close"].to_numpy(dtype=float)
+    open_ = ind["open"].to_numpy(dtype=float)
+    high = ind["high"].to_numpy(dtype=float)
+    low = ind["low"].to_numpy(dtype=float)
+    volume = ind["volume"].to_numpy(dtype=float)
+    ema12 = pd.to_numeric(ind["EMA12"], errors="coerce").to_numpy(dtype=float)
+    ema26 = pd.to_numeric(ind["EMA26"], errors="coerce").to_numpy(dtype=float)
+    rsi = pd.to_numeric(ind["RSI"], errors="coerce").to_numpy(dtype=float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_close = np.log(close)
+        returns = np.diff(log_close, prepend=np.nan)
+        # Columna k = retorno de hace k velas, alineado con cada fila
+        lagged = np.column_stack([np.roll(returns, lag) for lag in range(RETURN_LAGS)])
+        for lag in range(1, RETURN_LAGS):
+            lagged[:lag, lag] = np.nan
+
+        return_5 = log_close - np.roll(log_close, 5)
+        return_5[:5] = np.nan
+        volatility_20 = pd.Series(returns).rolling(20, min_periods=5).std().to_numpy()
+        volume_ratio = np.log(volume / pd.Series(volume).rolling(20, min_periods=1).mean().to_numpy())
+
+        matrix = np.column_stack([
+            lagged,
+            (ema12 - ema26) / close,
+            (close - ema12) / close,
+            (close - ema26) / close,
+            rsi / 100.0,
+            np.diff(rsi, prepend=np.nan) / 100.0,
+            ind[CANDLESTICK_PATTERN_COLUMNS].to_numpy(dtype=float),
+            (close - open_) / open_,
+            (high - low) / open_,
+            (high - np.maximum(open_, close)) / open_,
+            (np.minimum(open_, close) - low) / open_,
+            volume_ratio,
+            return_5,
+            volatility_20,
+        ])
+    matrix[~np.isfinite(matrix)] = np.nan
+    return matrix
+
+
+@dataclass
+class _Normalization:
+    mean: np.ndarray
+    std: np.ndarray
+    candles_seen: int = 0
+
+
+@dataclass
+class _MarketFeatures:
+    candle_key: Any
+    features: np.ndarray
+
+
+_norms: Dict[Tuple[str, str, str], _Normalization] = {}
+_features: Dict[Tuple[str, str, str], _MarketFeatures] = {}
+_lock = Lock()
+
+
+def _normalization_for(key: Tuple[str, str, str], matrix: np.ndarray) -> _Normalization:
+    norm = _norms.get(key)
+    if norm is None or norm.candles_seen >= NORM_REFRESH_CANDLES:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # Columnas todo NaN (ventana corta)
+            mean = np.nan_to_num(np.nanmean(matrix, axis=0))
+            std = np.nan_to_num(np.nanstd(matrix, axis=0))
+        std[std == 0] = 1.0
+        mean[_BINARY] = 0.0
+        std[_BINARY] = 1.0
+        norm = _Normalization(mean=mean, std=std)
+        _norms[key] = norm
+    norm.candles_seen += 1
+    return norm
+
+
+def feature_window(source: str, symbol: str, timeframe: str, closed: List[Dict[str, Any]],
+                   exchange: Any = None) -> List[Dict[str, Any]]:
+    """
+    Closed live candles preceded by the stored history, up to FEATURE_WINDOW candles.
+    If the store has fewer than MIN_FEATURE_CANDLES, they are fetched from `exchange`.
+    """
+    first_live = record_to_candle(closed[0])[0]
+    last_closed = record_to_candle(closed[-1])[0]
+    history = candle_store.get_recent(source, symbol, timeframe, max(FEATURE_WINDOW - len(closed), 0), before=first_live)
+    window = [candle_to_record(c) for c in history] + list(closed)
+    if len(window) >= MIN_FEATURE_CANDLES or exchange is None:
+        return window[-FEATURE_WINDOW:]
+
+    try:
+        records = exchange.fetch_ohlcv_optimized(symbol, timeframe, limit=FEATURE_WINDOW + 1)
+    except Exception as e:
+        logger.warning("Could not backfill PPO features for %s %s %s: %s", source, symbol, timeframe, e)
+        return window
+    # Sin la vela en formacion
+    records = [r for r in records or [] if record_to_candle(r)[0] <= last_closed]
+    if len(records) <= len(window):
+        return window
+    candle_store.save_records(source, symbol, timeframe, records)
+    return records[-FEATURE_WINDOW:]
+
+
+def get_market_features(source: str, symbol: str, timeframe: str, candles: List[Dict[str, Any]],
+                        exchange: Any = None) -> Optional[np.ndarray]:
+    """
+    Normalized market features of the last closed candle, shared by every bot on
+    (source, symbol, timeframe). The last candle of the window is still forming and is ignored.
+    """
+    closed = candles[:-1]
+    if not closed:
+        return None
+    key = (source, symbol, timeframe)
+    candle_key = closed[-1].get("timestamp")
+
+    with _lock:
+        cached = _features.get(key)
+        if cached is not None and cached.candle_key == candle_key:
+            return cached.features
+
+    # Fuera del lock: puede leer disco o llamar al exchange
+    window = feature_window(source, symbol, timeframe, closed, exchange)
+    if len(window) < MIN_FEATURE_CANDLES:
+        logger.debug("Only %d closed candles for PPO features of %s %s %s", len(window), source, symbol, timeframe)
+    matrix = market_feature_matrix(pd.DataFrame(window))
+
+    with _lock:
+        cached = _features.get(key)
+        if cached is not None and cached.candle_key == candle_key:
+            return cached.features
+        norm = _normalization_for(key, matrix)
+        features = np.clip(np.nan_to_num((matrix[-1] - norm.mean) / norm.std), -CLIP, CLIP)
+        features.setflags(write=False)
+        _features[key] = _MarketFeatures(candle_key=candle_key, features=features)
+        logger.debug("PPO features computed for %s %s %s at %s", source, symbol, timeframe, candle_key)
+        return features
+
+
+def position_features(blocked: Dict[str, Any], price: float) -> np.ndarray:
+    """Lado de la posicion, PnL no realizado y tamaño (log) a partir de get_blocked_balance."""
+    side = {"buy": 1.0, "sell": -1.0}.get(blocked.get("start_with"), 0.0)
+    amount_usdt = abs(float(blocked.get("amount_usdt") or 0.0))
+    amount_crypto = abs(float(blocked.get("amount_crypto") or 0.0))
+    unrealized = 0.0
+    if side and amount_usdt > 0 and price > 0:
+        unrealized = side * (amount_crypto * price / amount_usdt - 1.0)
+    return np.array([side, np.clip(unrealized, -CLIP, CLIP), np.log1p(amount_usdt)])
+
+
+def build_ppo_state(source: str, symbol: str, timeframe: str, candles: List[Dict[str, Any]],
+                    blocked: Dict[str, Any], exchange: Any = None) -> List[float]:
+    """30-dim state for DeepSeekPPOAgent; neutral market features if there are no candles."""
+    market = get_market_features(source, symbol, timeframe, candles, exchange) if candles else None
+    if market is None:
+        market = np.zeros(len(MARKET_FEATURE_NAMES))
+    price = float(candles[-1]["close"]) if candles else 0.0
+    return np.concatenate([market, position_features(blocked, price)]).tolist()
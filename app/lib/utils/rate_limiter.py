@@ -0,0 +1,224 @@
+"""
+Rate limiter del lado cliente compartido por todo el proceso.
+
+Cada cliente ccxt tenia su propio limitador (enableRateLimit) y los bots dormian
+rateLimit * 3 tras un RateLimitExceeded: clientes distintos con la misma API key (spot y
+futures, rutas, valoracion de wallets, llamadas REST directas) no se coordinaban y
+acababan en 429. Ahora todas las llamadas pasan por un token bucket por
+(exchange, API key, clase de endpoint):
+
+- Clases: "public" (limite por IP, sin key), "private" (contador de la cuenta) y
+  "orders" (alta/cancelacion de ordenes, con su propio limite en los exchanges).
+- Coste ponderado por endpoint (en Kraken el historial de trades/ledgers cuenta doble).
+- Carriles de prioridad: HIGH (ordenes, salidas SL/TP), NORMAL (bots) y LOW (precios del
+  dashboard). Un carril no toma tokens mientras espera uno mas prioritario, y LOW deja
+  siempre una reserva del bucket libre para los demas.
+- Un 429 vacia el bucket y lo pausa PENALTY segundos para todos los que lo comparten,
+  en lugar de que cada bot duerma por su cuenta.
+"""
+
+import hashlib
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Condition, Lock
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+HIGH, NORMAL, LOW = 0, 1, 2
+LANE_NAMES = ("high", "normal", "low")
+LANE_RESERVE = (0.0, 0.0, 0.25)  # Fraccion del bucket que el carril no puede consumir
+
+# (capacidad, tokens por segundo) por exchange y clase de endpoint
+DEFAULT_LIMITS: Dict[Tuple[str, str], Tuple[float, float]] = {
+    ("kraken", "public"): (5, 1.0),
+    ("kraken", "private"): (15, 0.33),  # Contador de la cuenta: max 15, decae 0.33/s
+    ("kraken", "orders"): (15, 1.0),
+    ("krakenfutures", "public"): (20, 5.0),
+    ("krakenfutures", "private"): (20, 5.0),
+    ("krakenfutures", "orders"): (20, 5.0),
+    ("bingx", "public"): (20, 10.0),
+    ("bingx", "private"): (10, 5.0),
+    ("bingx", "orders"): (10, 5.0),
+}
+FALLBACK_LIMIT = (10, 2.0)
+
+# Endpoints con coste distinto de 1 (subcadena de la ruta)
+WEIGHTS: Dict[str, Dict[str, float]] = {
+    "kraken": {"TradesHistory": 2, "QueryTrades": 2, "Ledgers": 2, "QueryLedgers": 2},
+}
+
+_ORDER_PATH = re.compile(r"(add|cancel|edit|amend|batch|send)orders?|cancelall|trade/(order|cancel|batch|close)", re.I)
+
+_lane: ContextVar[int] = ContextVar("rate_limit_lane", default=NORMAL)
+
+
+def parse_limits(value: Optional[str]) -> Dict[Tuple[str, str], Tuple[float, float]]:
+    """'kraken.private=15/0.33,bingx.public=20/10' -> {(exchange, clase): (capacidad, tasa)}."""
+    limits = {}
+    for item in (value or "").split(","):
+        name, _, limit = item.strip().partition("=")
+        exchange, _, endpoint_class = name.partition(".")
+        capacity, _, rate = limit.partition("/")
+        if exchange and endpoint_class and capacity and rate:
+            limits[(exchange.strip(), endpoint_class.strip())] = (float(capacity), float(rate))
+    return limits
+
+
+def endpoint_class(api: Any, method: str, path: str) -> str:
+    """Classifies a request as public, private or orders (ccxt api section or REST path)."""
+    section = "/".join(api) if isinstance(api, (list, tuple)) else str(api)
+    if "private" not in section and "history" not in section:
+        return "public"
+    if method.upper() != "GET" and _ORDER_PATH.search(path):
+        return "orders"
+    return "private"
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._cond = Condition()
+        self._waiting = [0, 0, 0]
+        self._stats = {
+            "acquired": [0, 0, 0],
+            "waits": [0, 0, 0],
+            "wait_seconds": [0.0, 0.0, 0.0],
+            "max_wait_seconds": 0.0,
+            "penalties": 0,
+        }
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, cost: float = 1.0, lane: int = NORMAL) -> float:
+        """Blocks until `cost` tokens are available for `lane`; returns the seconds waited."""
+        floor = self.capacity * LANE_RESERVE[lane]
+        cost = min(cost, self.capacity - floor)
+        started = time.monotonic()
+        with self._cond:
+            self._waiting[lane] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if any(self._waiting[:lane]):
+                        self._cond.wait(1.0)  # notify_all cuando el carril superior obtiene su turno
+                        continue
+                    if now >= self.blocked_until and self.tokens - cost >= floor:
+                        self.tokens -= cost
+                        break
+                    self._cond.wait(max(self.blocked_until - now, (cost + floor - self.tokens) / self.rate, 0.001))
+            finally:
+                self._waiting[lane] -= 1
+                # Los carriles inferiores pueden estar esperando a que este termine
+                self._cond.notify_all()
+
+            waited = time.monotonic() - started
+            self._stats["acquired"][lane] += 1
+            if waited > 0.001:
+                self._stats["waits"][lane] += 1
+                self._stats["wait_seconds"][lane] += waited
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+        return waited
+
+    def penalize(self, seconds: float) -> None:
+        """The exchange answered 429: empty the bucket and pause it for everybody."""
+        with self._cond:
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+            self.blocked_until = max(self.blocked_until, self.updated + seconds)
+            self._stats["penalties"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refill(time.monotonic())
+            stats = {
+                "capacity": self.capacity,
+                "rate": self.rate,
+                "tokens": round(self.tokens, 3),
+                "waiting": sum(self._waiting),
+                "penalties": self._stats["penalties"],
+                "max_wait_seconds": self._stats["max_wait_seconds"],
+            }
+            for lane, name in enumerate(LANE_NAMES):
+                stats[name] = {
+                    "acquired": self._stats["acquired"][lane],
+                    "waits": self._stats["waits"][lane],
+                    "wait_seconds": self._stats["wait_seconds"][lane],
+                }
+        return stats
+
+
+class RateLimiter:
+    def __init__(self, limits: Optional[Dict[Tuple[str, str], Tuple[float, float]]] = None, penalty: float = 5.0):
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.penalty = penalty
+        self._buckets: Dict[Tuple[str, str, str], TokenBucket] = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def _key_id(api_key: Optional[str]) -> str:
+        return hashlib.sha256(api_key.encode()).hexdigest()[:16] if api_key else "-"
+
+    def bucket(self, exchange: str, api_key: Optional[str], endpoint_class: str) -> TokenBucket:
+        # Los limites publicos son por IP: todas las keys comparten bucket
+        key = (exchange, "-" if endpoint_class == "public" else self._key_id(api_key), endpoint_class)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    capacity, rate = self.limits.get((exchange, endpoint_class), FALLBACK_LIMIT)
+                    bucket = TokenBucket(capacity, rate)
+                    self._buckets[key] = bucket
+        return bucket
+
+    @staticmethod
+    def weight(exchange: str, path: str) -> float:
+        for fragment, cost in WEIGHTS.get(exchange, {}).items():
+            if fragment in path:
+                return cost
+        return 1.0
+
+    def acquire(self, exchange: str, api_key: Optional[str], endpoint_class: str, cost: float = 1.0,
+                lane: Optional[int] = None) -> float:
+        """
+        Waits for a slot in the shared bucket. Order endpoints always use the HIGH lane;
+        otherwise the lane set with priority() (NORMAL by default).
+        """
+        if lane is None:
+            lane = HIGH if endpoint_class == "orders" else _lane.get()
+        return self.bucket(exchange, api_key, endpoint_class).acquire(cost, lane)
+
+    def penalize(self, exchange: str, api_key: Optional[str], endpoint_class: str) -> None:
+        logger.warning("[RateLimiter] %s %s rate limited, pausing the bucket %ss", exchange, endpoint_class, self.penalty)
+        self.bucket(exchange, api_key, endpoint_class).penalize(self.penalty)
+
+    @staticmethod
+    @contextmanager
+    def priority(lane: int) -> Iterator[None]:
+        """Lane for the calls made inside the block (same thread)."""
+        token = _lane.set(lane)
+        try:
+            yield
+        finally:
+            _lane.reset(token)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {f"{exchange}:{key}:{cls}": bucket.get_stats() for (exchange, key, cls), bucket in buckets.items()}
+
+
+rate_limiter = RateLimiter(parse_limits(Config.RATE_LIMITS), penalty=Config.RATE_LIMIT_PENALTY_SECONDS)
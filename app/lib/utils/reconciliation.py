@@ -0,0 +1,104 @@
+"""
+Cola de conciliacion de fills y comisiones en segundo plano.
+
+Al enviar una orden, process_order reserva el saldo con los datos del ack del
+exchange y devuelve el control al bot de inmediato. La cola consulta la orden con
+backoff exponencial hasta que el exchange informa fills y comisiones; entonces
+aplica la correccion (Trade y BlockedBalanceDB) y avisa al usuario por SSE.
+"""
+
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from threading import Condition, Thread
+from typing import Callable, Optional
+
+from app.lib.utils.tx import emit
+from app.models.users import get_user_email
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 10
+BACKOFF_BASE = 1.0  # segundos, se duplica en cada intento
+BACKOFF_MAX = 30.0
+
+
+@dataclass
+class ReconciliationJob:
+    """
+    fetch() returns the settled fill (dict) or None while the order is still pending.
+    apply(fill) books the correction; it runs once per job and is never retried.
+    """
+    order_id: str
+    user_id: str
+    fetch: Callable[[], Optional[dict]]
+    apply: Callable[[dict], None]
+    by_bot: str = "user"
+    attempts: int = 0
+
+
+_pending = []  # heap de (next_attempt, seq, job)
+_sequence = itertools.count()
+_condition = Condition()
+_worker: Optional[Thread] = None
+
+
+def enqueue_reconciliation(job: ReconciliationJob, delay: float = BACKOFF_BASE):
+    """Schedules job to be polled after delay seconds and starts the worker if needed."""
+    global _worker
+    with _condition:
+        heapq.heappush(_pending, (time.time() + delay, next(_sequence), job))
+        if _worker is None or not _worker.is_alive():
+            _worker = Thread(target=_worker_loop, name="reconciliation-worker", daemon=True)
+            _worker.start()
+        _condition.notify()
+    logger.debug("Order %s queued for fee/fill reconciliation", job.order_id)
+
+
+def pending_reconciliations() -> int:
+    with _condition:
+        return len(_pending)
+
+
+def _worker_loop():
+    while True:
+        with _condition:
+            while not _pending or _pending[0][0] > time.time():
+                timeout = _pending[0][0] - time.time() if _pending else None
+                _condition.wait(timeout)
+            _, _, job = heapq.heappop(_pending)
+
+        try:
+            _run(job)
+        except Exception as e:
+            logger.error("Unexpected error reconciling order %s: %s", job.order_id, e)
+
+
+def _run(job: ReconciliationJob):
+    try:
+        fill = job.fetch()
+    except Exception as e:
+        logger.warning("Could not fetch order %s: %s", job.order_id, e)
+        fill = None
+
+    if fill is None:
+        job.attempts += 1
+        if job.attempts >= MAX_ATTEMPTS:
+            logger.error(
+                "Order %s not settled after %s attempts, keeping the provisional booking",
+                job.order_id, job.attempts,
+            )
+            return
+        enqueue_reconciliation(job, min(BACKOFF_BASE * 2 ** job.attempts, BACKOFF_MAX))
+        return
+
+    job.apply(fill)
+    logger.info("Order %s reconciled: %s", job.order_id, fill)
+
+    email = get_user_email(job.user_id)
+    if email:
+        emit(email=email, event="bot", data={"id": "refresh-balance"})
+        if job.by_bot in ["basic-bot", "strategy-bot"]:
+            emit(email=email, event="bot", data={"id": f"refresh-history-{job.by_bot}"})
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from typing import Dict
 import logging
@@ -114,6 +115,80 @@ def is_doji(candle: pd.Series) -> bool:
     return cuerpo < (rango_total * 0.1)
 
 
+# ----------------------------
+# Vectorized candlestick pattern engine
+# ----------------------------
+
+CANDLESTICK_PATTERN_COLUMNS = [
+    "bullish_engulfing",
+    "bearish_engulfing",
+    "martillo",
+    "estrella_fugaz",
+    "doji",
+]
+
+
+def calculate_candlestick_patterns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes every candlestick pattern flag for the whole window in one pass.
+    Column-wise NumPy equivalent of calling is_martillo, is_estrella_fugaz, is_doji,
+    is_bullish_engulfing_pattern and is_bearish_engulfing_pattern row by row.
+    Returns a boolean DataFrame (same index as df) with CANDLESTICK_PATTERN_COLUMNS.
+    """
+    open_ = df["open"].to_numpy(dtype=np.float64)
+    high = df["high"].to_numpy(dtype=np.float64)
+    low = df["low"].to_numpy(dtype=np.float64)
+    close = df["close"].to_numpy(dtype=np.float64)
+
+    cuerpo = np.abs(close - open_)
+    cuerpo_max = np.maximum(open_, close)
+    cuerpo_min = np.minimum(open_, close)
+    sombra_superior = high - cuerpo_max
+    sombra_inferior = cuerpo_min - low
+    rango_total = high - low
+
+    # NaN comparisons evaluate to False, matching the scalar helpers
+    with np.errstate(invalid="ignore"):
+        has_body = cuerpo >= 1e-9
+        martillo = has_body & (sombra_inferior > 2 * cuerpo) & (sombra_superior < cuerpo)
+        estrella_fugaz = has_body & (sombra_superior > 2 * cuerpo) & (sombra_inferior < cuerpo)
+        # A flat candle is essentially a Doji
+        doji = (rango_total < 1e-9) | (cuerpo < rango_total * 0.1)
+
+        is_bullish = close > open_
+        is_bearish = close < open_
+
+        # Two-candle patterns compare each candle with the previous one (first row is always False)
+        bullish_engulfing = np.zeros(len(df), dtype=bool)
+        bearish_engulfing = np.zeros(len(df), dtype=bool)
+        if len(df) > 1:
+            prev_open, prev_close = open_[:-1], close[:-1]
+            cur_open, cur_close = open_[1:], close[1:]
+            bullish_engulfing[1:] = (
+                is_bearish[:-1]
+                & is_bullish[1:]
+                & (cur_open < prev_close)
+                & (cur_close > prev_open)
+            )
+            bearish_engulfing[1:] = (
+                is_bullish[:-1]
+                & is_bearish[1:]
+                & (cur_open > prev_close)
+                & (cur_close < prev_open)
+            )
+
+    return pd.DataFrame(
+        {
+            "bullish_engulfing": bullish_engulfing,
+            "bearish_engulfing": bearish_engulfing,
+            "martillo": martillo,
+            "estrella_fugaz": estrella_fugaz,
+            "doji": doji,
+        },
+        index=df.index,
+    )
+
+
 # ----------------------------
 # Indicator Calculation Function
 # ----------------------------
@@ -169,34 +244,10 @@ def calculate_indicators(df: pd.DataFrame) -> pd.DataFrame:
     # --- RSI Calculation (Using manual helper) ---
     df_copy["RSI"] = calculate_rsi_series(df_copy["close"], 14)
 
-    # --- Manual Candlestick Pattern Calculation ---
-    df_copy["bullish_engulfing"] = False
-    df_copy["bearish_engulfing"] = False
-    df_copy["martillo"] = False
-    df_copy["estrella_fugaz"] = False
-    df_copy["doji"] = False
-
-    # Iterate through candles to calculate patterns
-    # Engulfing requires looking at the previous candle (start from index 1)
-    # Martillo, Estrella Fugaz, Doji only need the current candle (can start from index 0)
-    for i in range(len(df_copy)):
-        current_candle = df_copy.iloc[i]
-
-        # Calculate single-candle patterns
-        if is_martillo(current_candle):
-            df_copy.loc[df_copy.index[i], "martillo"] = True
-        if is_estrella_fugaz(current_candle):
-            df_copy.loc[df_copy.index[i], "estrella_fugaz"] = True
-        if is_doji(current_candle):
-            df_copy.loc[df_copy.index[i], "doji"] = True
-
-        # Calculate two-candle patterns (Engulfing)
-        if i > 0:  # Need a previous candle
-            prev_candle = df_copy.iloc[i - 1]
-            if is_bullish_engulfing_pattern(prev_candle, current_candle):
-                df_copy.loc[df_copy.index[i], "bullish_engulfing"] = True
-            if is_bearish_engulfing_pattern(prev_candle, current_candle):
-                df_copy.loc[df_copy.index[i], "bearish_engulfing"] = True
+    # --- Candlestick Pattern Calculation (vectorized, same rules as the is_* helpers) ---
+    patterns = calculate_candlestick_patterns(df_copy)
+    for col in CANDLESTICK_PATTERN_COLUMNS:
+        df_copy[col] = patterns[col]
 
     # Drop rows where primary indicators (like EMA26 or RSI) are NaN due to insufficient data
     # Keep original columns + calculated indicators
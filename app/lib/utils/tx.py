@@ -1,15 +1,112 @@
-from flask import current_app
-import time
 import json
-from collections import defaultdict
-from threading import Lock
+import logging
+import time
+from collections import OrderedDict, defaultdict, deque
+from threading import Condition, Lock, Timer
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_QUEUED_MESSAGES = 100  # Por suscriptor; si el navegador no consume se descartan los mas viejos
+HEARTBEAT_SECONDS = 15
+RATE_LIMIT_PER_SECOND = 10  # Eventos nuevos por usuario; los que reemplazan uno en cola no cuentan
+RATE_LIMIT_BURST = 30
+
+
+class Subscription:
+    """Cola acotada de mensajes SSE de una pestaña, con espera bloqueante sin polling"""
+
+    def __init__(self, email):
+        self.email = email
+        self.messages = deque(maxlen=MAX_QUEUED_MESSAGES)
+        self.condition = Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def replace(self, key: str, message: str) -> bool:
+        """Sustituye el mensaje en cola con la misma clave (el nuevo pasa al final)"""
+        with self.condition:
+            for i, (queued_key, _) in enumerate(self.messages):
+                if queued_key == key:
+                    del self.messages[i]
+                    self.messages.append((key, message))
+                    self.condition.notify()
+                    return True
+            return False
+
+    def push(self, message: str, key: Optional[str] = None):
+        if key and self.replace(key, message):
+            return
+        with self.condition:
+            if len(self.messages) == self.messages.maxlen:
+                self.dropped += 1
+            self.messages.append((key, message))
+            self.condition.notify()
+
+    def wait(self, timeout: float = HEARTBEAT_SECONDS) -> List[str]:
+        """Bloquea hasta que haya mensajes o pase timeout; devuelve y vacia los pendientes"""
+        with self.condition:
+            if not self.messages and not self.closed:
+                self.condition.wait(timeout)
+            pending = [message for _, message in self.messages]
+            self.messages.clear()
+            return pending
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def __len__(self):
+        return len(self.messages)
+
+
+class _RateLimiter:
+    """
+    Token bucket por usuario. Los mensajes con clave que superan el limite no se pierden:
+    se retiene el ultimo de cada clave y se envia en cuanto hay cupo (deferred)
+    """
+
+    def __init__(self):
+        self.tokens = float(RATE_LIMIT_BURST)
+        self.updated = time.monotonic()
+        self.limited = 0
+        self.deferred: "OrderedDict[str, str]" = OrderedDict()
+        self.timer: Optional[Timer] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(RATE_LIMIT_BURST, self.tokens + (now - self.updated) * RATE_LIMIT_PER_SECOND)
+        self.updated = now
+
+    def allow(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        self.limited += 1
+        return False
+
+    def take_deferred(self) -> List[tuple]:
+        """Mensajes retenidos que ya caben en el cupo, del mas antiguo al mas nuevo"""
+        self._refill()
+        ready = []
+        while self.deferred and self.tokens >= 1:
+            self.tokens -= 1
+            ready.append(self.deferred.popitem(last=False))
+        return ready
+
+    def seconds_to_next_token(self) -> float:
+        return max(1 - self.tokens, 0) / RATE_LIMIT_PER_SECOND
+
 
 subscriptions = defaultdict(list)
 subscription_lock = Lock()
+rate_limiters = {}
 
 def subscribe(email):
     """Crea una cola de mensajes para un usuario"""
-    queue = []
+    queue = Subscription(email)
     with subscription_lock:
         subscriptions[email].append(queue)
     return queue
@@ -19,18 +116,84 @@ def unsubscribe(email, queue):
     with subscription_lock:
         if email in subscriptions and queue in subscriptions[email]:
             subscriptions[email].remove(queue)
+            if not subscriptions[email]:
+                del subscriptions[email]
+                limiter = rate_limiters.pop(email, None)
+                if limiter is not None and limiter.timer is not None:
+                    limiter.timer.cancel()
+    queue.close()
+    if queue.dropped:
+        logger.info(f"SSE stream for {email} closed, {queue.dropped} messages dropped")
+
+def coalesce_key_for(event, data) -> Optional[str]:
+    """Clave por defecto: el ultimo evento de cada id (estado de un bot, refresh-balance...) reemplaza a los anteriores"""
+    if isinstance(data, dict) and data.get("id"):
+        return f"{event}:{data['id']}"
+    return None
+
+def _schedule_deferred(email, limiter):
+    """Programa el envio de los mensajes retenidos (con subscription_lock tomado)"""
+    if limiter.timer is None and limiter.deferred:
+        limiter.timer = Timer(limiter.seconds_to_next_token(), _flush_deferred, args=(email, limiter))
+        limiter.timer.daemon = True
+        limiter.timer.start()
 
-def emit(email, event, data):
-    """Envía un evento a un usuario específico con formato SSE correcto"""
+def _flush_deferred(email, limiter):
+    with subscription_lock:
+        limiter.timer = None
+        if rate_limiters.get(email) is not limiter:
+            return  # El usuario cerro todas sus pestañas
+        queues = list(subscriptions.get(email, ()))
+        ready = limiter.take_deferred()
+        _schedule_deferred(email, limiter)
+
+    for key, message in ready:
+        for queue in queues:
+            queue.push(message, key)
+    if ready:
+        logger.debug(f"Sent {len(ready)} SSE events deferred by the rate limit to {email}")
+
+def emit(email, event, data, coalesce_key: Optional[str] = None):
+    """
+    Envía un evento a un usuario específico con formato SSE correcto.
+    coalesce_key: un mensaje aun en cola con la misma clave se reemplaza por este;
+    por defecto coalesce_key_for(event, data), "" para no coalescer nunca.
+    Por encima del limite por usuario los mensajes sin clave se descartan y los que tienen
+    clave se retienen (el ultimo de cada clave) hasta que haya cupo.
+    """
     # Formato completo con event y data
     message = f"event: {event}\ndata: {json.dumps(data)}\n\n"
-    
+    key = coalesce_key_for(event, data) if coalesce_key is None else coalesce_key
+
+    # El lock global solo protege el diccionario; cada cola tiene su propia condicion
     with subscription_lock:
-        if email in subscriptions:
-            for queue in subscriptions[email][:]:
-                try:
-                    queue.append(message)
-                    current_app.logger.debug(f"📤 Evento '{event}' enviado a {email}")
-                except Exception as e:
-                    # unsubscribe(email, queue)
-                    pass
\ No newline at end of file
+        queues = list(subscriptions.get(email, ()))
+        if not queues:
+            return
+        limiter = rate_limiters.setdefault(email, _RateLimiter())
+        if key:
+            # Este mensaje sustituye al retenido con la misma clave
+            limiter.deferred.pop(key, None)
+
+    # Reemplazar un mensaje en cola no añade trafico: solo los mensajes nuevos gastan cupo
+    pending = [queue for queue in queues if not (key and queue.replace(key, message))]
+    if not pending:
+        return
+    with subscription_lock:
+        allowed = limiter.allow()
+        if not allowed and key:
+            limiter.deferred[key] = message
+            _schedule_deferred(email, limiter)
+    if not allowed:
+        if key:
+            logger.debug(f"Rate limit reached for {email}, deferring SSE event '{event}'")
+        else:
+            logger.debug(f"Rate limit reached for {email}, dropping SSE event '{event}'")
+        return
+
+    for queue in pending:
+        try:
+            queue.push(message, key)
+            logger.debug(f"📤 Evento '{event}' enviado a {email}")
+        except Exception as e:
+            logger.warning(f"Could not queue SSE event '{event}' for {email}: {e}")
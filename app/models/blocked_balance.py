@@ -1,5 +1,6 @@
 import uuid
 from datetime import datetime, timedelta
+from typing import Optional
 
 from app.models.user_performance import update_user_performance
 from .create_db import db
@@ -39,9 +40,10 @@ def add_quantity_to_block(
 	order: str,
 	exchange: str = "general",
 	market_type: str = "swap"
-) -> bool:
+) -> Optional[str]:
 	"""
-	Añade o actualiza un balance bloqueado
+	Añade o actualiza un balance bloqueado. Devuelve el id del registro creado o
+	actualizado, o None si no se pudo guardar
 	"""
 	from main import app_instance
 	app = app_instance
@@ -58,6 +60,7 @@ def add_quantity_to_block(
 					finished=False
 				).first()
 
+				blocked = existing_blocked
 				if existing_blocked:
 					# Actualizar montos existentes
 					existing_blocked.amount_usdt += amount_usdt
@@ -71,7 +74,7 @@ def add_quantity_to_block(
 						existing_blocked.finished = True
 				else:
 					# Crear nuevo registro
-					new_blocked = BlockedBalanceDB(
+					blocked = BlockedBalanceDB(
 						user_id=user_id,
 						amount_usdt=amount_usdt,
 						amount_crypto=amount_crypto,
@@ -81,13 +84,66 @@ def add_quantity_to_block(
 						market_type=market_type,
 						start_with=order
 					)
-					db.session.add(new_blocked)
-				
+					db.session.add(blocked)
+
+				db.session.flush()  # Asigna el id del registro nuevo
+				blocked_id = blocked.id
 				db.session.commit()
-				return True
+				return blocked_id
 			except Exception as e:
 				db.session.rollback()
 				print(f"Error añadiendo cantidad bloqueada: {e}")
+				return None
+	return None
+
+def get_latest_blocked_id(user_id: str, currency: str, by_bot: str, exchange: str = "general") -> Optional[str]:
+	"""
+	Id del registro bloqueado mas reciente (este terminado o no): cambia con cada
+	orden del bot
+	"""
+	from main import app_instance
+	app = app_instance
+
+	if app and hasattr(app, 'app_context'):
+		with app.app_context():
+			try:
+				blocked = BlockedBalanceDB.query.filter_by(
+					user_id=user_id,
+					currency=currency,
+					by_bot=by_bot,
+					exchange=exchange
+				).order_by(BlockedBalanceDB.fecha.desc()).first()
+				return blocked.id if blocked else None
+			except Exception as e:
+				print(f"Error obteniendo el ultimo balance bloqueado: {e}")
+	return None
+
+def adjust_blocked_quantity(blocked_id: str, amount_usdt: float, amount_crypto: float) -> bool:
+	"""
+	Corrige un registro bloqueado con la diferencia entre lo reservado al enviar la
+	orden y lo que realmente se lleno (comisiones incluidas). Si el registro ya esta
+	terminado, la diferencia tambien se refleja en el rendimiento del usuario.
+	"""
+	from main import app_instance
+	app = app_instance
+
+	if app and hasattr(app, 'app_context'):
+		with app.app_context():
+			try:
+				blocked = BlockedBalanceDB.query.get(blocked_id)
+				if not blocked:
+					return False
+
+				blocked.amount_usdt += amount_usdt
+				blocked.amount_crypto += amount_crypto
+				if blocked.finished and amount_usdt:
+					update_user_performance(blocked.user_id, amount_usdt)
+
+				db.session.commit()
+				return True
+			except Exception as e:
+				db.session.rollback()
+				print(f"Error ajustando cantidad bloqueada {blocked_id}: {e}")
 				return False
 	return False
 
@@ -117,6 +117,32 @@ def update_trade_status(trade_id: str, new_status: str, app_context=None) -> boo
                 return False
     return False
 
+def set_trade_fill(order_id: str, volume: Optional[float] = None, price: Optional[float] = None) -> bool:
+    """
+    Updates volume and/or price of the trade placed with the given exchange order id
+    once its fills and fees are known.
+    """
+    from main import app_instance
+    app = app_instance
+
+    if app and hasattr(app, 'app_context'):
+        with app.app_context():
+            try:
+                trade = Trade.query.filter_by(order_id=str(order_id)).order_by(Trade.created_at.desc()).first()
+                if trade:
+                    if volume is not None:
+                        trade.volume = volume
+                    if price is not None:
+                        trade.price = price
+                    db.session.commit()
+                    return True
+                return False
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error setting fill for order {order_id}: {e}")
+                return False
+    return False
+
 def set_trade_actual_profit_in_usd(trade_id: str, profit_in_usd: Optional[float], user_id: Optional[str] = None, by: Optional[str] = None, type_order: str = "sell") -> bool:
     """
     Sets the actual_profit_in_usd for a specific trade.
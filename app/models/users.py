@@ -102,6 +102,22 @@ def get_users_registered() -> float:
         print(f"Error getting users count: {e}")
         return 0.0
 
+def get_user_email(user_id: str) -> str:
+    """Email of a user (used as SSE channel), empty string if not found"""
+    try:
+        from main import app_instance
+        app = app_instance
+
+        if app and hasattr(app, 'app_context'):
+            with app.app_context():
+                user = User.query.filter_by(id=user_id).first()
+                return user.email if user else ""
+        user = User.query.filter_by(id=user_id).first()
+        return user.email if user else ""
+    except Exception as e:
+        print(f"Error getting email for user {user_id}: {e}")
+        return ""
+
 def get_user_referrals(user_id: str):
     """Get all users referred by a specific user"""
     try:
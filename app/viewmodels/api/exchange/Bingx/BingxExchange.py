@@ -2,15 +2,15 @@
 
 import json
 import threading
-from time import sleep
 import traceback
 from datetime import datetime
 
-import ccxt
 from ccxt.bingx import Position
 from app.config import config
 
 from app.viewmodels.api.exchange.FatherExchange import Exchange
+from app.viewmodels.api.exchange.ExchangeClientPool import ExchangeClientPool
+from app.viewmodels.services.MarketStream import market_stream
 from ccxt.base.errors import BadSymbol
 
 # Este es el equivalente al BingxExchange que se tenia anteriormente
@@ -18,7 +18,9 @@ class BingxExchange(Exchange):
     """
     Class BingxExchange
     """
-    _lock = threading.Lock()
+    # Locks por cuenta y simbolo (ver _order_lock) en lugar de un lock global
+    _order_locks = {}
+    _order_locks_guard = threading.Lock()
 
     def __init__(self, trading_mode = "spot", user_id = None) -> None:
         """
@@ -42,7 +44,8 @@ class BingxExchange(Exchange):
             api_key = config.BINGX_API_KEY or ""
             api_secret = config.BINGX_API_SECRET or ""
 
-        self.exchange = ccxt.bingx(
+        self.exchange = ExchangeClientPool.get_client(
+            "bingx",
             {
                 "apiKey": api_key,
                 "secret": api_secret,
@@ -69,6 +72,10 @@ class BingxExchange(Exchange):
     def identification(self):
         return "Bingx"
 
+    @property
+    def _stream_feed(self):
+        return "bingx_swap" if self.trading_mode == "swap" else "bingx"
+
     # Implementación específica de Bingx
     def get_creds_from_user(self):
         raise NotImplementedError("Método no disponible para este exchange")     
@@ -107,7 +114,7 @@ class BingxExchange(Exchange):
         take_profit=0,
         leverage=1,
     ):
-        with BingxExchange._lock:
+        with self._order_lock(symbol):
             volume = float(volume)
             print(
                 f"🤑 [{self.trading_mode}] Placing market {order_direction} order for {volume} {symbol}..."
@@ -159,58 +166,57 @@ class BingxExchange(Exchange):
             else:
                 order = self.exchange.create_market_sell_order(symbol, volume, params=params)
 
-            # Save the order to the database
-            order_to_save = {
-                "order_type": order_type,
-                "order_direction": order_direction,
-                "volume": float(order.get("amount")),
-                "symbol": symbol,
-                "price": order.get("price"),
-                "by": order_made_by,
-                "order_close_condition": order.get("stopLossPrice"),
-                "order_description": None,
-                "order_id": order.get("id"),
-                "user_id": self.user_id,
-                "stop_loss": order.get("stopLossPrice") or 0,
-                "take_profit": order.get("takeProfitPrice") or 0,
-                "status": ("close" if position_cancel else "open"),
-                "leverage": leverage,
-                "exchange": (
-                    "bingx-spot" if self.trading_mode == "spot" else "bingx-futures"
-                ),
-                "trading_mode": self.trading_mode,
-            }
-
-            fees = 0.0
-            fees_currency = ""
-
-            price = float(order.get("price"))
-
-            while True:
-                fees, fees_currency = self.get_fees(order.get("id"), order.get("symbol"))
-                if fees is not None:
-                    break
-                sleep(5)
-
-            cost = order["cost"]
-
-            if order_direction == "buy":
-                order_to_save["volume"] -= fees / price
-
-            order_saved = self.add_order_to_db(order_to_save)
-            if not order_saved:
-                return {"error": "Error saving order to database"}, 500
-
-            print(
-                f":white_check_mark: Order saved to database: {json.dumps(order, indent=4)}"
-            )
+        # Save the order to the database
+        order_to_save = {
+            "order_type": order_type,
+            "order_direction": order_direction,
+            "volume": float(order.get("amount")),
+            "symbol": symbol,
+            "price": order.get("price"),
+            "by": order_made_by,
+            "order_close_condition": order.get("stopLossPrice"),
+            "order_description": None,
+            "order_id": order.get("id"),
+            "user_id": self.user_id,
+            "stop_loss": order.get("stopLossPrice") or 0,
+            "take_profit": order.get("takeProfitPrice") or 0,
+            "status": ("close" if position_cancel else "open"),
+            "leverage": leverage,
+            "exchange": (
+                "bingx-spot" if self.trading_mode == "spot" else "bingx-futures"
+            ),
+            "trading_mode": self.trading_mode,
+        }
+
+        price = float(order.get("price"))
+
+        # Valores provisionales del ack: la cola de conciliacion corrige fills y comisiones
+        fees, fees_currency = self._fees_from_ack(order)
+
+        cost = order["cost"]
+
+        if order_direction == "buy":
+            order_to_save["volume"] -= fees / price
+
+        order_saved = self.add_order_to_db(order_to_save)
+        if not order_saved:
+            return {"error": "Error saving order to database"}, 500
+
+        print(
+            f":white_check_mark: Order saved to database: {json.dumps(order, indent=4)}"
+        )
 
-            return order_saved, fees, price, cost, fees_currency, 200
+        return order_saved, fees, price, cost, fees_currency, 200
 
     def get_symbol_price(self, symbol):
         # Validate symbol before making API call
         if not symbol or symbol.lower() == "null":
             return None, "Invalid symbol provided"
+        # Precio del stream WebSocket si esta al dia; si no, REST y se suscribe para la proxima
+        price = market_stream.get_price(self._stream_feed, symbol)
+        if price is not None:
+            return price, None
+        market_stream.subscribe_ticker(self._stream_feed, symbol)
         try:
             price = self.exchange.fetch_ticker(symbol)["last"]
             return price, None
@@ -228,7 +234,12 @@ class BingxExchange(Exchange):
         """
         try:
             # ccxt devuelve una lista de listas: [[timestamp, open, high, low, close, volume], ...]
-            ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+            # Primero el libro del stream WebSocket; REST solo si esta incompleto o desactualizado
+            ohlcv = market_stream.get_candles(self._stream_feed, symbol, timeframe, limit)
+            if ohlcv is None:
+                ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+                market_stream.seed_candles(self._stream_feed, symbol, timeframe, ohlcv)
+                market_stream.subscribe_candles(self._stream_feed, symbol, timeframe)
             
             # Formatear las velas para el LLM
             formatted_candles = []
@@ -369,6 +380,56 @@ class BingxExchange(Exchange):
         except Exception as e:
             print(f"❌ Error cerrando {pos_symbol}: {e}")
 
+    def _order_lock(self, symbol) -> threading.Lock:
+        """
+        Lock that serializes orders on the same account and symbol.
+        In swap the open positions belong to the shared BingX futures account, so the
+        position check and the order must not interleave across users; in spot each
+        user only needs their own orders on a symbol to stay ordered.
+        """
+        if self.trading_mode == "swap":
+            key = ("swap", symbol)
+        else:
+            key = (self.trading_mode, self.user_id, symbol)
+
+        with BingxExchange._order_locks_guard:
+            if key not in BingxExchange._order_locks:
+                BingxExchange._order_locks[key] = threading.Lock()
+            return BingxExchange._order_locks[key]
+
+    def _fees_from_ack(self, order):
+        """
+        Fees reported in the order ack, only when the order is already filled.
+        Returns (0.0, "") otherwise; the real values arrive later through get_order_fill.
+        """
+        ack_fees = order.get("fees") or ([order["fee"]] if order.get("fee") else [])
+        if order.get("status") == "closed" and ack_fees and all(fee.get("cost") is not None for fee in ack_fees):
+            return sum(float(fee["cost"]) for fee in ack_fees), ack_fees[-1].get("currency", "UNKNOWN")
+        return 0.0, ""
+
+    def get_order_fill(self, order_id, symbol):
+        """
+        Settled fill of an order for the reconciliation queue:
+        {"filled", "cost", "price", "fee", "fee_currency"}, or None while it is not closed.
+        """
+        order = self.exchange.fetch_order(order_id, symbol)
+        if order.get("status") != "closed":
+            return None
+
+        fee_amount = 0.0
+        fee_currency = "UNKNOWN"
+        for fee in order.get("fees") or ([order["fee"]] if order.get("fee") else []):
+            fee_amount += float(fee["cost"]) if fee.get("cost") is not None else 0.0
+            fee_currency = fee.get("currency", fee_currency)
+
+        return {
+            "filled": float(order.get("filled") or 0.0),
+            "cost": float(order.get("cost") or 0.0),
+            "price": float(order.get("average") or order.get("price") or 0.0),
+            "fee": fee_amount,
+            "fee_currency": fee_currency,
+        }
+
     def get_fees(self, order_id, symbol):
         """
         args: order_id, symbol
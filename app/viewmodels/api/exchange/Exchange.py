@@ -7,7 +7,9 @@ from app.viewmodels.api.exchange.Bingx.BingxExchange import BingxExchange
 class ExchangeFactory:
     """
     Clase principal para poder acceder a cualquier exchange usando la mismas funciones
-    (usando la arquitectura factory)
+    (usando la arquitectura factory).
+    Los wrappers son baratos: el cliente ccxt que usan viene de ExchangeClientPool
+    y se reutiliza entre llamadas.
     """
     @staticmethod
     def create_exchange(name: str, user_id=None, trading_mode="spot") -> Exchange:
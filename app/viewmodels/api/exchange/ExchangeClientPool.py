@@ -0,0 +1,134 @@
+"""
+Pool de clientes ccxt de larga vida compartidos por todo el proceso.
+
+ExchangeFactory.create_exchange y los constructores de BingxExchange,
+KrakenSpotExchange y KrakenFuturesExchange se llaman en cada orden, consulta de
+precio o request. Antes cada llamada construia un cliente ccxt nuevo y perdia los
+mercados cargados, la sesion HTTP keep-alive y el estado del rate limiter. Ahora
+los wrappers piden el cliente al pool, que lo reutiliza por
+(exchange, trading_mode, credenciales) y recarga los mercados cada MARKETS_TTL.
+
+Las peticiones de cada cliente pasan por el rate_limiter compartido en lugar del
+limitador propio de ccxt, que no se coordinaba entre clientes de la misma key.
+"""
+
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+import ccxt
+
+from app.lib.utils.rate_limiter import endpoint_class, rate_limiter
+
+logger = logging.getLogger(__name__)
+
+MARKETS_TTL = 3600  # segundos entre recargas de mercados
+MARKETS_RETRY = 60  # espera tras un fallo de load_markets
+
+
+@dataclass
+class _PooledClient:
+    client: Any
+    lock: Lock = field(default_factory=Lock)
+    markets_loaded_at: Optional[float] = None
+    next_markets_attempt: float = 0.0
+
+
+class ExchangeClientPool:
+    _clients: Dict[Tuple[str, str, str], _PooledClient] = {}
+    _lock = Lock()
+    _stats = {
+        "clients_created": 0,
+        "clients_reused": 0,
+        "markets_loads": 0,
+        "markets_load_errors": 0,
+    }
+
+    @staticmethod
+    def _key(exchange_id: str, params: dict) -> Tuple[str, str, str]:
+        trading_mode = (params.get("options") or {}).get("defaultType", "")
+        # Las credenciales forman parte de la clave, pero no se guardan en claro
+        creds = f"{params.get('apiKey') or ''}:{params.get('secret') or ''}"
+        return exchange_id, trading_mode, hashlib.sha256(creds.encode()).hexdigest()
+
+    @classmethod
+    def get_client(cls, exchange_id: str, params: dict):
+        """
+        Returns the shared ccxt client for (exchange_id, defaultType, credentials),
+        creating it on first use and (re)loading its markets when stale.
+        """
+        key = cls._key(exchange_id, params)
+        with cls._lock:
+            pooled = cls._clients.get(key)
+            if pooled is None:
+                client = getattr(ccxt, exchange_id)(params)
+                cls._install_rate_limiter(client, exchange_id, params.get("apiKey"))
+                pooled = _PooledClient(client=client)
+                cls._clients[key] = pooled
+                cls._stats["clients_created"] += 1
+                logger.info("[ExchangeClientPool] Created %s client (%s)", exchange_id, key[1] or "default")
+            else:
+                cls._stats["clients_reused"] += 1
+
+        cls._ensure_markets(exchange_id, pooled)
+        return pooled.client
+
+    @staticmethod
+    def _install_rate_limiter(client, exchange_id: str, api_key: Optional[str]) -> None:
+        """Routes every ccxt request (fetch2) through the shared token buckets."""
+        original_fetch2 = client.fetch2
+
+        def fetch2(path, api="public", method="GET", *args, **kwargs):
+            kind = endpoint_class(api, method, path)
+            rate_limiter.acquire(exchange_id, api_key, kind, rate_limiter.weight(exchange_id, path))
+            try:
+                return original_fetch2(path, api, method, *args, **kwargs)
+            except (ccxt.RateLimitExceeded, ccxt.DDoSProtection):
+                rate_limiter.penalize(exchange_id, api_key, kind)
+                raise
+
+        client.fetch2 = fetch2
+        client.enableRateLimit = False  # El bucket compartido sustituye al throttle por instancia
+
+    @classmethod
+    def _ensure_markets(cls, exchange_id: str, pooled: _PooledClient) -> None:
+        now = time.time()
+        if pooled.markets_loaded_at is not None and now - pooled.markets_loaded_at < MARKETS_TTL:
+            return
+        if now < pooled.next_markets_attempt:
+            return
+
+        # La primera carga bloquea; en las recargas un solo hilo recarga y los demas
+        # siguen usando los mercados anteriores
+        if not pooled.lock.acquire(blocking=pooled.markets_loaded_at is None):
+            return
+        try:
+            if pooled.markets_loaded_at is not None and time.time() - pooled.markets_loaded_at < MARKETS_TTL:
+                return  # Otro hilo los cargo mientras esperabamos
+            if time.time() < pooled.next_markets_attempt:
+                return
+            reload = pooled.markets_loaded_at is not None
+            pooled.client.load_markets(reload=reload)
+            pooled.markets_loaded_at = time.time()
+            with cls._lock:
+                cls._stats["markets_loads"] += 1
+            logger.info("[ExchangeClientPool] %s markets %s", exchange_id, "reloaded" if reload else "loaded")
+        except Exception as e:
+            # ccxt volvera a intentarlo de forma perezosa en la siguiente llamada que los necesite
+            pooled.next_markets_attempt = time.time() + MARKETS_RETRY
+            with cls._lock:
+                cls._stats["markets_load_errors"] += 1
+            logger.warning("[ExchangeClientPool] Could not load %s markets: %s", exchange_id, e)
+        finally:
+            pooled.lock.release()
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        """Client reuse and market-load counters since the process started."""
+        with cls._lock:
+            stats = dict(cls._stats)
+            stats["pooled_clients"] = len(cls._clients)
+        return stats
@@ -3,10 +3,10 @@ import logging
 import traceback
 from datetime import datetime
 
-import ccxt
 from app.config import config
 
 from app.viewmodels.api.exchange.Kraken.KrakenExchange import KrakenExchange
+from app.viewmodels.api.exchange.ExchangeClientPool import ExchangeClientPool
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +17,7 @@ class KrakenFuturesExchange(KrakenExchange):
     def __init__(self, user_id = 0):
         super().__init__(user_id, "futures", "https://futures.kraken.com")
         
-        self.exchange = ccxt.krakenfutures({
+        self.exchange = ExchangeClientPool.get_client("krakenfutures", {
             'apiKey': config.KRAKEN_FUTURE_API_KEY,
             'secret': config.KRAKEN_FUTURE_API_SECRET,
         })
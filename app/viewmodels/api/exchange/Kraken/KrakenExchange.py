@@ -5,18 +5,18 @@ import hashlib
 import hmac
 import logging
 import os
-import threading
-import time
 import traceback
 
-import requests
 from pydantic import BaseModel
 
 from flask import current_app
 from app.config import config
+from app.lib.utils.http_client import http_client
+from app.lib.utils.nonce_allocator import get_nonce_allocator
 from app.models.create_db import db
 from app.models.trades import Trade
 from app.viewmodels.api.exchange.FatherExchange import Exchange
+from app.viewmodels.services.MarketStream import market_stream
 
 logger = logging.getLogger(__name__)
 
@@ -36,19 +36,17 @@ class KrakenExchange(Exchange):
     Implementación concreta de la API de Kraken que hereda de Exchange.
 
     Attributes:
-        _nonce_lock (threading.Lock): Lock para seguridad en hilos.
-        _nonce_file_path (str): Ruta al archivo de almacenamiento de nonce.
+        _nonce_file_path (str): Ruta al archivo donde se persiste el maximo nonce emitido.
+        _nonce_allocator (NonceAllocator): Contadores de nonce en memoria por API key.
         _base_url (str): URL base de la API de Kraken.
         _api_key (str): Clave API de Kraken.
         _api_secret (str): Secreto API de Kraken.
         _add_order_endpoint (str): Endpoint para añadir órdenes.
-        _nonce_file (str): Ruta completa al archivo de nonce.
     """
-    # Lock for thread safety when accessing the nonce file
-    _nonce_lock = threading.Lock()
-    # Path to the file that stores the last used nonce for this base class instance
-    # Using a different file name to avoid conflict with the specific spot implementation's file
-    _nonce_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kraken_base_nonce.txt')
+    # File where the allocator persists the highest nonce issued per API key
+    # (the old plain-integer format is still accepted as a starting floor)
+    _nonce_file_path = config.KRAKEN_NONCE_FILE or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kraken_base_nonce.txt')
+    _nonce_allocator = get_nonce_allocator(_nonce_file_path)
 
     def __init__(self, user_id = 0, trading_mode = "spot", base_url = "https://api.kraken.com"):
         super().__init__(user_id, trading_mode)
@@ -58,10 +56,6 @@ class KrakenExchange(Exchange):
         self._api_secret = config.KRAKEN_API_SECRET
         self.trading_mode = trading_mode
         self._add_order_endpoint = f"{self._base_url}/0/private/AddOrder"
-        # Ensure nonce file path is instance-specific if needed, or manage centrally
-        # For simplicity here, we use a single file defined at class level.
-        # Consider if different instances (e.g., different users) need separate nonce files.
-        self._nonce_file = KrakenExchange._nonce_file_path 
 
     def identification(self):
         return "Kraken"
@@ -100,16 +94,20 @@ class KrakenExchange(Exchange):
         raise NotImplementedError("Method not implemented")
 
     def get_symbol_price(self, symbol):
+        # Precio del stream WebSocket si esta al dia; si no, REST y se suscribe para la proxima
+        price = market_stream.get_price("kraken", symbol)
+        if price is not None:
+            return {"price": price}, 200
+        market_stream.subscribe_ticker("kraken", symbol)
         try:
             # Use the provided symbol parameter in the URL
             url = f"https://api.kraken.com/0/public/Ticker?pair={symbol}"
             
-            payload = {}
             headers = {
                 'Accept': 'application/json'
             }
 
-            response = requests.request("GET", url, headers=headers, data=payload, timeout=60)
+            response = http_client.get(url, headers=headers, timeout=60, rate_limit=("kraken", None, "public"))
             
             data = response.json()
             if data.get("error") and data["error"]:
@@ -139,63 +137,10 @@ class KrakenExchange(Exchange):
             return {"error": str(e)}, 400
 
     def get_nonce(self) -> str:
-        """Reads the last nonce, calculates the next one, writes it back, and returns it."""
-        # Use the instance's nonce file path
-        nonce_file = self._nonce_file 
-        with KrakenExchange._nonce_lock: # Use the class-level lock
-            last_nonce = 0
-            current_time_nonce = int(time.time() * 1_000_000) # Get current time early
-
-            try:
-                # Ensure file exists before reading
-                if not os.path.exists(nonce_file):
-                    # logger.info(f"Nonce file not found. Creating '{nonce_file}' with initial nonce.")
-                    # Initialize file with a nonce slightly less than current time to ensure the first generated nonce is valid
-                    initial_nonce = current_time_nonce - 1 
-                    with open(nonce_file, encoding="utf-8", mode="w") as f:
-                        f.write(str(initial_nonce))
-                    last_nonce = initial_nonce
-                else:
-                    # Read the last nonce from the existing file
-                    with open(nonce_file, encoding="utf-8", mode="r") as f:
-                        content = f.read().strip()
-                        if content:
-                            try:
-                                last_nonce = int(content)
-                                logger.debug("Read last_nonce %s from file '%s'.", last_nonce, nonce_file)
-                            except ValueError:
-                                logger.error("Invalid content in nonce file '%s': '%s'. Using current time as fallback.", nonce_file, content)
-                                last_nonce = current_time_nonce # Fallback if content is invalid
-                        else:
-                            # Handle empty file case - should ideally not happen with the creation logic above
-                            logger.warning("Nonce file '%s' was empty. Initializing with current time.", nonce_file)
-                            last_nonce = current_time_nonce # Fallback if file is empty
-            except IOError as e:
-                logger.error("IOError accessing nonce file '%s': %s", nonce_file, e)
-                # Fallback to current time in microseconds if file access fails
-                last_nonce = current_time_nonce
-            except Exception as e:
-                logger.error("Unexpected error handling nonce file '%s': %s", nonce_file, e)
-                # Generic fallback
-                last_nonce = current_time_nonce
-
-            # Generate potential new nonce based on current time in microseconds
-            # (current_time_nonce was already calculated)
-
-            # Ensure the new nonce is strictly greater than the last one, increment by 2 for extra safety
-            next_nonce = max(current_time_nonce, last_nonce + 2)
-
-            # Write the new nonce back to the file
-            try:
-                with open(nonce_file, encoding="utf-8", mode="w") as f:
-                    f.write(str(next_nonce))
-            except Exception as e:
-                logger.error("Error writing nonce %s to file '%s': %s", next_nonce, nonce_file, e)
-                # If write fails, we still proceed with the calculated nonce,
-                # but log the error. The next call might recover.
-
-            logger.info("Generated nonce: %s (file: '%s', based on last: %s, current_time: %s)", next_nonce, nonce_file, last_nonce, current_time_nonce)
-            return str(next_nonce) # Return as string for the API
+        """Next nonce for this API key from the in-memory allocator (no file I/O per call)."""
+        nonce = KrakenExchange._nonce_allocator.next_nonce(self._api_key)
+        logger.debug("Generated nonce: %s", nonce)
+        return str(nonce) # Return as string for the API
 
     def sign(self, data: bytes) -> str:
         return base64.b64encode(
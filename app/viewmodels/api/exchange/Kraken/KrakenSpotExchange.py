@@ -3,11 +3,11 @@ import logging
 import traceback
 from datetime import datetime
 
-import ccxt
-import requests
-
 from app.config import config
+from app.lib.utils.http_client import http_client
 from app.viewmodels.api.exchange.Kraken.KrakenExchange import KrakenExchange
+from app.viewmodels.api.exchange.ExchangeClientPool import ExchangeClientPool
+from app.viewmodels.services.MarketStream import market_stream
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +15,7 @@ class KrakenSpotExchange(KrakenExchange):
     def __init__(self, user_id=0):
         super().__init__(user_id, "spot", "https://api.kraken.com")
         self._add_order_endpoint = f"{self._base_url}/0/private/AddOrder"
-        self.exchange = ccxt.kraken({
+        self.exchange = ExchangeClientPool.get_client("kraken", {
             'apiKey': config.KRAKEN_SPOT_API_KEY,
             'secret': config.KRAKEN_SPOT_API_SECRET,
             'enableRateLimit': True,
@@ -178,7 +178,8 @@ class KrakenSpotExchange(KrakenExchange):
                 'API-Sign': self.get_signature(payload, nonce, "/0/private/TradesHistory")
             }
 
-            response = requests.post(url, headers=headers, data=payload)
+            response = http_client.post(url, headers=headers, data=payload,
+                                        rate_limit=("kraken", self._api_key, "private"))
             data = response.json()
 
             if data["error"]:
@@ -192,7 +193,12 @@ class KrakenSpotExchange(KrakenExchange):
 
     def fetch_ohlcv_optimized(self, symbol, timeframe, limit=5):
         try:
-            ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+            # Velas del stream WebSocket; REST solo si el libro esta incompleto o desactualizado
+            ohlcv = market_stream.get_candles("kraken", symbol, timeframe, limit)
+            if ohlcv is None:
+                ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+                market_stream.seed_candles("kraken", symbol, timeframe, ohlcv)
+                market_stream.subscribe_candles("kraken", symbol, timeframe)
             formatted_candles = []
             
             for candle in ohlcv:
@@ -233,6 +239,7 @@ class KrakenSpotExchange(KrakenExchange):
             "cost": 0,
             "fee": None,
             "fee_currency": None,
+            "status": None,
             "error": None
         }
 
@@ -259,6 +266,7 @@ class KrakenSpotExchange(KrakenExchange):
                 "filled": filled,
                 "cost": cost,
                 "fee": fee,
+                "status": order.get("status"),
             }
 
         except Exception as e:
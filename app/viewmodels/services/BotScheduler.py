@@ -0,0 +1,230 @@
+"""
+Planificador central de los bots, alineado con el cierre de vela.
+
+Cada bot tenia su propio hilo que dormia max(rateLimit * 2, timeframe / 4, 10)s: se
+despertaba en cualquier fase de la vela, repetia trabajo dentro de la misma vela y
+reaccionaba tarde tras el cierre. Ahora un unico hilo mantiene un heap con la proxima
+ejecucion de cada tarea:
+
+- Tareas de vela: justo despues del cierre de la vela de su timeframe (CANDLE_CLOSE_DELAY
+  para que el exchange publique la vela cerrada) mas un jitter fijo por tarea, de modo que
+  los bots no llaman al exchange todos en el mismo segundo.
+- Tareas de intervalo: ticks mas rapidos, como la revision de SL/TP.
+
+El hilo del planificador solo decide cuando toca cada tarea; las ejecutan pools de workers
+separados por carril, para que una tarea lenta no retrase a las demas:
+
+- RISK: ticks de SL/TP (tareas de intervalo por defecto), pool propio pequeño.
+- CANDLE: iteraciones de vela de los bots.
+- SLOW: tareas que pueden bloquear minutos (el StrategyTradingBot espera al LLM y al PPO).
+
+Una tarea esta como mucho una vez en el heap y se replanifica al terminar,
+asi que nunca se solapa consigo misma. Si devuelve un numero, se reintenta en esos
+segundos en lugar de esperar al siguiente cierre (errores de red, datos incompletos...).
+"""
+
+import heapq
+import itertools
+import logging
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from threading import Condition, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import Config
+from app.lib.utils.indicator_state import timeframe_to_seconds
+
+logger = logging.getLogger(__name__)
+
+CANDLE_CLOSE_DELAY = Config.BOT_CANDLE_CLOSE_DELAY
+MAX_JITTER = Config.BOT_SCHEDULER_JITTER
+MAX_JITTER_FRACTION = 0.2  # El jitter nunca pasa de un 20% de la vela
+
+# Una tarea devuelve None (siguiente turno normal) o los segundos hasta reintentar
+JobFn = Callable[[], Optional[float]]
+
+RISK, CANDLE, SLOW = "risk", "candle", "slow"
+LANE_WORKERS = {
+    RISK: Config.BOT_SCHEDULER_RISK_WORKERS,
+    CANDLE: Config.BOT_SCHEDULER_WORKERS,
+    SLOW: Config.BOT_SCHEDULER_SLOW_WORKERS,
+}
+
+
+@dataclass
+class _Job:
+    key: str
+    fn: JobFn
+    lane: str = CANDLE
+    timeframe: Optional[str] = None
+    interval: Optional[float] = None
+    jitter: float = 0.0
+    running: bool = False
+    cancelled: bool = False
+    runs: int = 0
+    missed: int = 0
+    lag_total: float = 0.0
+    lag_max: float = 0.0
+
+
+def _jitter_for(key: str, spread: float) -> float:
+    """Jitter estable por tarea en [0, spread): el mismo bot cae siempre en la misma fase."""
+    return zlib.crc32(key.encode()) / 2 ** 32 * spread
+
+
+class BotScheduler:
+    _cond = Condition()
+    _heap: List[Tuple[float, int, _Job]] = []
+    _jobs: Dict[str, _Job] = {}
+    _seq = itertools.count()
+    _thread: Optional[Thread] = None
+    _executors: Dict[str, ThreadPoolExecutor] = {}
+
+    # ----------------------------
+    # Planificacion
+    # ----------------------------
+
+    @classmethod
+    def schedule_candle(cls, key: str, timeframe: str, fn: JobFn, run_now: bool = True, lane: str = CANDLE) -> None:
+        """
+        Runs fn after every `timeframe` candle close (plus jitter); also right away if run_now.
+        Jobs that block for long (LLM calls) go in the SLOW lane.
+        """
+        step = timeframe_to_seconds(timeframe)
+        jitter = _jitter_for(key, min(MAX_JITTER, step * MAX_JITTER_FRACTION))
+        job = _Job(key=key, fn=fn, lane=lane, timeframe=timeframe, jitter=jitter)
+        now = time.time()
+        cls._add(job, now if run_now else cls._next_due(job, now))
+
+    @classmethod
+    def schedule_interval(cls, key: str, interval: float, fn: JobFn, run_now: bool = False, lane: str = RISK) -> None:
+        """Runs fn every `interval` seconds; the first run is spread with jitter over one interval."""
+        job = _Job(key=key, fn=fn, lane=lane, interval=interval, jitter=_jitter_for(key, interval))
+        now = time.time()
+        cls._add(job, now if run_now else now + job.jitter)
+
+    @classmethod
+    def cancel(cls, *keys: str, wait: float = 0) -> bool:
+        """
+        Cancels the jobs. With wait > 0, blocks up to `wait` seconds for a running
+        execution to finish; returns False if one was still running.
+        """
+        deadline = time.time() + wait
+        with cls._cond:
+            jobs = [cls._jobs.pop(key) for key in keys if key in cls._jobs]
+            for job in jobs:
+                job.cancelled = True
+            while any(job.running for job in jobs):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                cls._cond.wait(remaining)
+        return True
+
+    @classmethod
+    def _add(cls, job: _Job, due: float) -> None:
+        with cls._cond:
+            previous = cls._jobs.get(job.key)
+            if previous is not None:
+                previous.cancelled = True
+            cls._jobs[job.key] = job
+            heapq.heappush(cls._heap, (due, next(cls._seq), job))
+            cls._ensure_started()
+            cls._cond.notify_all()
+
+    @staticmethod
+    def _next_due(job: _Job, now: float) -> float:
+        if job.interval is not None:
+            return now + job.interval
+        step = timeframe_to_seconds(job.timeframe)
+        # Turno de la vela en curso si aun no ha pasado, si no el de la siguiente
+        due = now // step * step + CANDLE_CLOSE_DELAY + job.jitter
+        return due if due > now else due + step
+
+    # ----------------------------
+    # Ejecucion
+    # ----------------------------
+
+    @classmethod
+    def _ensure_started(cls) -> None:
+        if cls._thread is None or not cls._thread.is_alive():
+            for lane, workers in LANE_WORKERS.items():
+                if lane not in cls._executors:
+                    cls._executors[lane] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"bot-{lane}")
+            cls._thread = Thread(target=cls._loop, name="bot-scheduler", daemon=True)
+            cls._thread.start()
+
+    @classmethod
+    def _loop(cls) -> None:
+        while True:
+            with cls._cond:
+                while not cls._heap or cls._heap[0][0] > time.time():
+                    cls._cond.wait(cls._heap[0][0] - time.time() if cls._heap else None)
+                due, _, job = heapq.heappop(cls._heap)
+                if job.cancelled:
+                    continue
+                job.running = True
+            cls._executors[job.lane].submit(cls._run, job, due)
+
+    @classmethod
+    def _run(cls, job: _Job, due: float) -> None:
+        started = time.time()
+        retry = None
+        try:
+            retry = job.fn()
+        except Exception as e:
+            logger.error("[BotScheduler] Job %s failed: %s", job.key, e, exc_info=True)
+
+        finished = time.time()
+        with cls._cond:
+            job.running = False
+            job.runs += 1
+            lag = max(started - due, 0.0)
+            job.lag_total += lag
+            job.lag_max = max(job.lag_max, lag)
+            if not job.cancelled:
+                if retry is not None:
+                    next_due = finished + max(float(retry), 0.0)
+                else:
+                    next_due = cls._next_due(job, finished)
+                    if job.timeframe is not None:
+                        # Cierres que pasaron mientras la tarea seguia en curso
+                        job.missed += int((finished - started) // timeframe_to_seconds(job.timeframe))
+                heapq.heappush(cls._heap, (next_due, next(cls._seq), job))
+            cls._cond.notify_all()
+
+    # ----------------------------
+    # Estadisticas
+    # ----------------------------
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        """Scheduled jobs, wake-up lag after their slot and candle closes missed by slow runs."""
+        with cls._cond:
+            jobs = list(cls._jobs.values())
+            next_due = cls._heap[0][0] - time.time() if cls._heap else None
+        runs = sum(job.runs for job in jobs)
+        lanes = {
+            lane: {
+                "workers": workers,
+                "jobs": sum(1 for job in jobs if job.lane == lane),
+                "running": sum(1 for job in jobs if job.lane == lane and job.running),
+                "max_lag_seconds": max((job.lag_max for job in jobs if job.lane == lane), default=0.0),
+            }
+            for lane, workers in LANE_WORKERS.items()
+        }
+        return {
+            "jobs": len(jobs),
+            "candle_jobs": sum(1 for job in jobs if job.timeframe is not None),
+            "interval_jobs": sum(1 for job in jobs if job.interval is not None),
+            "running": sum(1 for job in jobs if job.running),
+            "workers": sum(LANE_WORKERS.values()),
+            "lanes": lanes,
+            "runs": runs,
+            "avg_lag_seconds": sum(job.lag_total for job in jobs) / runs if runs else 0.0,
+            "max_lag_seconds": max((job.lag_max for job in jobs), default=0.0),
+            "missed_candles": sum(job.missed for job in jobs),
+            "next_run_in_seconds": next_due,
+        }
@@ -0,0 +1,221 @@
+"""
+Planificador de inferencia para el LLM compartido por los strategy bots.
+
+llama_cpp.Llama no es thread-safe y cada completion ya usa n_threads hilos de CPU,
+asi que un unico hilo trabajador es el dueño del modelo y atiende una cola de
+peticiones ordenada por deadline. Cada bot recibe un Future. Las peticiones cuyo
+deadline vence en la cola se descartan sin gastar CPU, y los prompts identicos
+que esperan a la vez (mismo mercado y estrategia) se resuelven con una sola completion.
+
+PPOInferenceBatcher hace lo mismo para el agente PPO, donde si se puede agrupar: junta
+los estados que llegan de todos los bots en una ventana corta y hace un solo forward.
+"""
+
+import heapq
+import itertools
+import logging
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from threading import Condition, Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEADLINE_SECONDS = 120
+BATCH_WINDOW_SECONDS = 0.005  # Espera maxima para juntar estados de otros bots
+MAX_BATCH_SIZE = 256
+
+
+@dataclass
+class _InferenceRequest:
+    prompt: str
+    params: Dict[str, Any]
+    deadline: float
+    submitted_at: float
+    futures: List[Future] = field(default_factory=list)
+
+    @property
+    def batch_key(self):
+        return self.prompt, repr(sorted(self.params.items()))
+
+
+class LLMInferenceScheduler:
+    def __init__(self, completion_fn: Callable[..., dict], name: str = "llm"):
+        """completion_fn(prompt=..., **params) -> dict con el formato de Llama.create_completion"""
+        self.name = name
+        self._completion_fn = completion_fn
+        self._queue = []  # heap de (deadline, seq, request)
+        self._by_key: Dict[Any, _InferenceRequest] = {}
+        self._sequence = itertools.count()
+        self._condition = Condition()
+        self._thread: Optional[Thread] = None
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "coalesced": 0,
+            "expired": 0,
+            "failed": 0,
+            "completion_tokens": 0,
+            "busy_seconds": 0.0,
+            "queue_wait_seconds": 0.0,
+        }
+        with _schedulers_lock:
+            _schedulers[name] = self
+
+    def submit(self, prompt: str, deadline_seconds: float = DEFAULT_DEADLINE_SECONDS, **params) -> Future:
+        """Queues a completion and returns a Future resolved with the create_completion output."""
+        future = Future()
+        now = time.time()
+        with self._condition:
+            self._stats["submitted"] += 1
+            request = _InferenceRequest(prompt, params, now + deadline_seconds, now)
+            pending = self._by_key.get(request.batch_key)
+            if pending is not None:
+                # Mismo prompt ya en cola: comparte resultado y el deadline mas holgado
+                pending.futures.append(future)
+                pending.deadline = max(pending.deadline, request.deadline)
+                self._stats["coalesced"] += 1
+                return future
+
+            request.futures.append(future)
+            self._by_key[request.batch_key] = request
+            heapq.heappush(self._queue, (request.deadline, next(self._sequence), request))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._worker_loop, name=f"{self.name}-inference", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    def _next_request(self) -> _InferenceRequest:
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+            _, _, request = heapq.heappop(self._queue)
+            self._by_key.pop(request.batch_key, None)
+            return request
+
+    def _worker_loop(self):
+        while True:
+            request = self._next_request()
+            started = time.time()
+
+            if started > request.deadline:
+                with self._condition:
+                    self._stats["expired"] += len(request.futures)
+                for future in request.futures:
+                    future.set_exception(TimeoutError(f"LLM request expired after waiting {started - request.submitted_at:.1f}s"))
+                continue
+
+            try:
+                output = self._completion_fn(prompt=request.prompt, **request.params)
+            except Exception as e:
+                logger.error("[%s] Inference error: %s", self.name, e)
+                with self._condition:
+                    self._stats["failed"] += len(request.futures)
+                for future in request.futures:
+                    future.set_exception(e)
+                continue
+
+            elapsed = time.time() - started
+            tokens = (output.get("usage") or {}).get("completion_tokens", 0) if isinstance(output, dict) else 0
+            with self._condition:
+                self._stats["completed"] += len(request.futures)
+                self._stats["completion_tokens"] += tokens
+                self._stats["busy_seconds"] += elapsed
+                self._stats["queue_wait_seconds"] += started - request.submitted_at
+            for future in request.futures:
+                future.set_result(output)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            stats = dict(self._stats)
+            stats["queue_depth"] = len(self._queue)
+        busy = stats.pop("busy_seconds")
+        stats["tokens_per_second"] = round(stats["completion_tokens"] / busy, 2) if busy else 0.0
+        runs = stats["completed"] - stats["coalesced"]
+        stats["avg_queue_wait_seconds"] = round(stats.pop("queue_wait_seconds") / runs, 3) if runs > 0 else 0.0
+        return stats
+
+
+class PPOInferenceBatcher:
+    def __init__(self, forward_fn: Callable[[List[Any]], List[Any]], name: str = "ppo",
+                 window: float = BATCH_WINDOW_SECONDS, max_batch: int = MAX_BATCH_SIZE):
+        """forward_fn(states) -> una salida por estado, en el mismo orden"""
+        self.name = name
+        self._forward_fn = forward_fn
+        self._window = window
+        self._max_batch = max_batch
+        self._pending: List[Tuple[Any, Future]] = []
+        self._condition = Condition()
+        self._thread: Optional[Thread] = None
+        self._stats = {"requests": 0, "batches": 0, "failed": 0, "max_batch_size": 0, "busy_seconds": 0.0}
+        with _schedulers_lock:
+            _schedulers[name] = self
+
+    def submit(self, state: Any) -> Future:
+        future = Future()
+        with self._condition:
+            self._pending.append((state, future))
+            self._stats["requests"] += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._worker_loop, name=f"{self.name}-batcher", daemon=True)
+                self._thread.start()
+            # Solo hace falta despertar al hilo al llegar el primero o al llenar el lote
+            if len(self._pending) == 1 or len(self._pending) >= self._max_batch:
+                self._condition.notify()
+        return future
+
+    def _next_batch(self) -> List[Tuple[Any, Future]]:
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            window_ends = time.monotonic() + self._window
+            while len(self._pending) < self._max_batch:
+                remaining = window_ends - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = self._pending[:self._max_batch]
+            del self._pending[:self._max_batch]
+            return batch
+
+    def _worker_loop(self):
+        while True:
+            batch = self._next_batch()
+            started = time.time()
+            try:
+                outputs = self._forward_fn([state for state, _ in batch])
+            except Exception as e:
+                logger.error("[%s] Batch inference error: %s", self.name, e)
+                with self._condition:
+                    self._stats["failed"] += len(batch)
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._condition:
+                self._stats["batches"] += 1
+                self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+                self._stats["busy_seconds"] += time.time() - started
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            stats = dict(self._stats)
+            stats["queue_depth"] = len(self._pending)
+        stats["busy_seconds"] = round(stats["busy_seconds"], 3)
+        stats["avg_batch_size"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+
+_schedulers: Dict[str, Any] = {}
+_schedulers_lock = Lock()
+
+
+def get_scheduler_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats of every scheduler created in this process (none until a model is loaded)."""
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    return {scheduler.name: scheduler.get_stats() for scheduler in schedulers}
@@ -0,0 +1,245 @@
+"""
+Hub de datos de mercado compartido por todo el proceso.
+
+Cada bot pedia sus propias velas y su ticker al exchange, de modo que 200 bots en
+BTC/USDT 5m hacian 200 llamadas REST identicas por ciclo. El hub guarda, por
+(exchange, symbol, timeframe), una unica snapshot inmutable que se reutiliza hasta
+que caduca: el primer bot que la pide tras caducar hace la llamada REST y el resto
+espera a ese mismo resultado (single-flight) en lugar de repetirla.
+
+Para valorar wallets hay ademas una snapshot de tickers por exchange: todos los simbolos
+que faltan o han caducado se piden en una sola llamada (fetch_tickers; en Kraken es el
+endpoint Ticker con varios pares) en lugar de un get_symbol_price por activo.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from app.lib.utils.candle_store import candle_store
+from app.lib.utils.indicator_state import timeframe_to_seconds
+
+logger = logging.getLogger(__name__)
+
+MIN_CANDLE_TTL = 5  # segundos
+MAX_CANDLE_TTL = 30
+TICKER_TTL = 3
+BULK_TICKER_TTL = 10
+
+
+def candle_ttl(timeframe: str) -> float:
+    """Seconds a candle snapshot stays fresh: a tenth of the candle, within [5, 30]s."""
+    return min(max(timeframe_to_seconds(timeframe) / 10, MIN_CANDLE_TTL), MAX_CANDLE_TTL)
+
+
+def parse_symbol_price(result: Any) -> float:
+    """Normalizes the different get_symbol_price return shapes to a float price."""
+    if isinstance(result, tuple):
+        price_data = result[0]
+        if isinstance(price_data, dict):
+            if "error" in price_data and price_data["error"]:
+                raise Exception(f"Error getting price: {price_data['error']}")
+            price = price_data.get("price", price_data)
+        else:
+            price = price_data
+    else:
+        price = result
+
+    if not isinstance(price, (int, float)) or isinstance(price, bool):
+        raise Exception(f"Invalid price received: {price}")
+    return float(price)
+
+
+@dataclass(frozen=True)
+class CandleSnapshot:
+    symbol: str
+    timeframe: str
+    fetched_at: float
+    candles: Tuple[Mapping[str, Any], ...]
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Plain dict copies of the candles, in the fetch_ohlcv_optimized format."""
+        return [dict(candle) for candle in self.candles]
+
+
+@dataclass(frozen=True)
+class TickerSnapshot:
+    symbol: str
+    fetched_at: float
+    price: float
+
+
+@dataclass
+class _Entry:
+    lock: Lock = field(default_factory=Lock)  # single-flight por clave
+    subscribers: Set[str] = field(default_factory=set)
+    exchange: Any = None
+    snapshot: Any = None
+
+
+class MarketDataHub:
+    _candles: Dict[Tuple[str, str, str], _Entry] = {}
+    _tickers: Dict[Tuple[str, str], _Entry] = {}
+    _bulk_tickers: Dict[str, _Entry] = {}
+    _lock = Lock()
+    _stats = {
+        "candle_calls": 0,
+        "candle_calls_saved": 0,
+        "ticker_calls": 0,
+        "ticker_calls_saved": 0,
+        "bulk_ticker_calls": 0,
+        "bulk_ticker_errors": 0,
+        "bulk_tickers_fetched": 0,
+        "bulk_tickers_saved": 0,
+    }
+
+    @classmethod
+    def subscribe(cls, subscriber_id: str, source: str, symbol: str, timeframe: str, exchange) -> None:
+        """Registers a bot as consumer of (source, symbol, timeframe) candles and ticker."""
+        with cls._lock:
+            for registry, key in ((cls._candles, (source, symbol, timeframe)), (cls._tickers, (source, symbol))):
+                entry = registry.setdefault(key, _Entry())
+                entry.subscribers.add(subscriber_id)
+                if entry.exchange is None:
+                    entry.exchange = exchange
+        logger.info("[MarketDataHub] %s subscribed to %s %s %s", subscriber_id, source, symbol, timeframe)
+
+    @classmethod
+    def unsubscribe(cls, subscriber_id: str) -> None:
+        """Removes a bot from every key; keys without subscribers are dropped."""
+        with cls._lock:
+            for registry in (cls._candles, cls._tickers):
+                for key in list(registry.keys()):
+                    entry = registry[key]
+                    entry.subscribers.discard(subscriber_id)
+                    if not entry.subscribers:
+                        del registry[key]
+        logger.info("[MarketDataHub] %s unsubscribed. %s", subscriber_id, cls.get_stats())
+
+    @classmethod
+    def _entry(cls, registry: dict, key: tuple, exchange) -> _Entry:
+        with cls._lock:
+            entry = registry.get(key)
+            if entry is None:
+                # Consumidor sin suscripcion: se sirve igual pero la entrada no se retiene
+                entry = _Entry()
+            if exchange is not None and entry.exchange is None:
+                entry.exchange = exchange
+            return entry
+
+    @classmethod
+    def _count(cls, stat: str) -> None:
+        with cls._lock:
+            cls._stats[stat] += 1
+
+    @classmethod
+    def get_candles(cls, source: str, symbol: str, timeframe: str, exchange=None) -> Optional[CandleSnapshot]:
+        """
+        Returns the shared candle snapshot, fetching it with fetch_ohlcv_optimized
+        only if it is older than candle_ttl(timeframe). None if the fetch failed.
+        """
+        entry = cls._entry(cls._candles, (source, symbol, timeframe), exchange)
+        ttl = candle_ttl(timeframe)
+
+        with entry.lock:
+            snapshot = entry.snapshot
+            if snapshot is not None and time.time() - snapshot.fetched_at < ttl:
+                cls._count("candle_calls_saved")
+                return snapshot
+
+            cls._count("candle_calls")
+            ohlcv = (entry.exchange or exchange).fetch_ohlcv_optimized(symbol, timeframe)
+            if not ohlcv:
+                # Los errores no se cachean: el siguiente bot lo vuelve a intentar
+                return None
+
+            entry.snapshot = CandleSnapshot(
+                symbol=symbol,
+                timeframe=timeframe,
+                fetched_at=time.time(),
+                candles=tuple(MappingProxyType(dict(candle)) for candle in ohlcv),
+            )
+            snapshot = entry.snapshot
+
+        # El historial se acumula en disco con la misma clave (source, symbol, timeframe) para
+        # calentar los indicadores del TradingBot y las features PPO. Fuera del lock: los bots
+        # que esperan esta snapshot no esperan tambien a SQLite
+        candle_store.save_records(source, symbol, timeframe, ohlcv)
+        return snapshot
+
+    @classmethod
+    def get_ticker(cls, source: str, symbol: str, exchange=None) -> TickerSnapshot:
+        """Returns the shared ticker snapshot (TICKER_TTL seconds). Raises if the price is invalid."""
+        entry = cls._entry(cls._tickers, (source, symbol), exchange)
+
+        with entry.lock:
+            snapshot = entry.snapshot
+            if snapshot is not None and time.time() - snapshot.fetched_at < TICKER_TTL:
+                cls._count("ticker_calls_saved")
+                return snapshot
+
+            cls._count("ticker_calls")
+            price = parse_symbol_price((entry.exchange or exchange).get_symbol_price(symbol))
+            entry.snapshot = TickerSnapshot(symbol=symbol, fetched_at=time.time(), price=price)
+            return entry.snapshot
+
+    @classmethod
+    def get_tickers(cls, source: str, symbols: Iterable[str], exchange) -> Dict[str, TickerSnapshot]:
+        """
+        Prices for several symbols of one exchange. Those missing or older than
+        BULK_TICKER_TTL are fetched together in one fetch_tickers call; symbols the
+        exchange does not list are left out. If the call fails the previous prices
+        are served as they are.
+        """
+        with cls._lock:
+            entry = cls._bulk_tickers.setdefault(source, _Entry(snapshot={}))
+        symbols = set(symbols)
+
+        with entry.lock:
+            now = time.time()
+            prices: Dict[str, TickerSnapshot] = entry.snapshot
+            fresh = {symbol for symbol in symbols
+                     if symbol in prices and now - prices[symbol].fetched_at < BULK_TICKER_TTL}
+            stale = symbols - fresh
+            client = getattr(exchange, "exchange", exchange)  # Cliente ccxt del wrapper
+            markets = getattr(client, "markets", None)
+            if markets:
+                stale &= set(markets)
+
+            with cls._lock:
+                cls._stats["bulk_tickers_saved"] += len(fresh)
+            if stale:
+                cls._count("bulk_ticker_calls")
+                try:
+                    tickers = client.fetch_tickers(sorted(stale))
+                except Exception as e:
+                    cls._count("bulk_ticker_errors")
+                    logger.warning("[MarketDataHub] Bulk ticker fetch failed for %s: %s", source, e)
+                    tickers = {}
+                fetched_at = time.time()
+                # Copia nueva: quien ya tiene la snapshot anterior no la ve cambiar
+                prices = dict(prices)
+                for symbol, ticker in tickers.items():
+                    price = ticker.get("last") or ticker.get("close")
+                    if price:
+                        prices[symbol] = TickerSnapshot(symbol=symbol, fetched_at=fetched_at, price=float(price))
+                entry.snapshot = prices
+                with cls._lock:
+                    cls._stats["bulk_tickers_fetched"] += len(tickers)
+
+        return {symbol: prices[symbol] for symbol in symbols if symbol in prices}
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        """REST calls made and saved since the process started."""
+        with cls._lock:
+            stats = dict(cls._stats)
+            stats["rest_calls_saved"] = stats["candle_calls_saved"] + stats["ticker_calls_saved"]
+            stats["bulk_ticker_symbols"] = {source: len(entry.snapshot) for source, entry in cls._bulk_tickers.items()}
+            stats["subscriptions"] = {
+                "/".join(key): len(entry.subscribers) for key, entry in cls._candles.items()
+            }
+        return stats
@@ -0,0 +1,395 @@
+"""
+Feed de mercado por WebSocket para Kraken y BingX.
+
+Todos los precios y velas salian de REST: get_symbol_price pedia el ticker y
+fetch_ohlcv_optimized las velas en cada llamada. Este modulo mantiene una conexion
+WebSocket persistente por feed ("kraken", "bingx", "bingx_swap") en un unico hilo con
+un event loop de asyncio, y guarda en memoria el ultimo precio y las ultimas velas de
+cada suscripcion. Los exchanges leen de ese libro sin coste de red y solo vuelven a REST
+si el stream esta caido o desactualizado (sin mensajes en STALE_SECONDS, precio anterior
+a la ultima reconexion, o velas incompletas / con huecos).
+
+Las velas del libro se siembran con la respuesta REST (seed_candles) y despues el stream
+actualiza la vela en formacion y añade las nuevas. Las suscripciones se rehacen al
+reconectar. Las URLs se pueden apuntar a un servidor local para pruebas.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from threading import Lock, Thread
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import aiohttp
+
+from app.config import Config
+from app.lib.utils.indicator_state import timeframe_to_seconds
+
+logger = logging.getLogger(__name__)
+
+FEED_URLS = {
+    "kraken": Config.KRAKEN_WS_URL,
+    "bingx": Config.BINGX_WS_URL,
+    "bingx_swap": Config.BINGX_SWAP_WS_URL,
+}
+STALE_SECONDS = Config.MARKET_STREAM_STALE_SECONDS
+MAX_BOOK_CANDLES = 500  # Velas guardadas por (feed, symbol, timeframe)
+MAX_BACKOFF = 30
+HEARTBEAT = 20  # Ping del cliente (segundos)
+
+QUOTES = ("USDT", "USDC", "USD", "EUR", "GBP", "BTC", "ETH")
+KRAKEN_ASSETS = {"XBT": "BTC", "XDG": "DOGE"}
+
+# Una candle del libro: [ts apertura ms, open, high, low, close, volume] (formato ccxt)
+Candle = List[float]
+
+
+def _split_symbol(symbol: str) -> Optional[Tuple[str, str]]:
+    """BTC/USDT, BTC/USDT:USDT, BTC-USDT, XBTUSD o XXBTZUSD -> (base, quote)."""
+    symbol = (symbol or "").upper().split(":")[0]
+    for sep in ("/", "-"):
+        if sep in symbol:
+            base, quote = symbol.split(sep, 1)
+            return (base, quote) if base and quote else None
+    for quote in QUOTES:
+        for prefix in ("Z", ""):
+            if symbol.endswith(prefix + quote) and len(symbol) > len(prefix + quote):
+                base = symbol[: -len(prefix + quote)]
+                if len(base) == 4 and base[0] == "X":  # Nombres legacy de Kraken (XXBT, XETH)
+                    base = base[1:]
+                return base, quote
+    return None
+
+
+def _iso_to_ms(value: str) -> int:
+    return int(datetime.strptime(value[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+# ----------------------------
+# Protocolos
+# ----------------------------
+
+class KrakenProtocol:
+    """Kraken WebSocket v2: canales ticker y ohlc."""
+
+    INTERVALS = {"1m": 1, "5m": 5, "15m": 15, "30m": 30, "1h": 60, "4h": 240, "1d": 1440, "1w": 10080}
+    TIMEFRAMES = {minutes: tf for tf, minutes in INTERVALS.items()}
+
+    @staticmethod
+    def ws_symbol(symbol: str) -> Optional[str]:
+        parts = _split_symbol(symbol)
+        if not parts:
+            return None
+        base, quote = (KRAKEN_ASSETS.get(p, p) for p in parts)
+        return f"{base}/{quote}"
+
+    def ticker_subscription(self, ws_symbol: str) -> Dict[str, Any]:
+        return {"method": "subscribe", "params": {"channel": "ticker", "symbol": [ws_symbol]}}
+
+    def candle_subscription(self, ws_symbol: str, timeframe: str) -> Optional[Dict[str, Any]]:
+        interval = self.INTERVALS.get(timeframe)
+        if interval is None:
+            return None
+        return {"method": "subscribe", "params": {"channel": "ohlc", "symbol": [ws_symbol], "interval": interval}}
+
+    def decode(self, data: Any) -> Tuple[Optional[Any], Optional[str]]:
+        """(mensaje JSON, respuesta a enviar) a partir del frame recibido."""
+        return json.loads(data), None
+
+    def events(self, message: Any) -> Iterable[Tuple]:
+        if not isinstance(message, dict):
+            return
+        channel = message.get("channel")
+        if channel == "ticker":
+            for item in message.get("data") or []:
+                if item.get("last") is not None:
+                    yield "price", item["symbol"], float(item["last"])
+        elif channel == "ohlc":
+            for item in message.get("data") or []:
+                timeframe = self.TIMEFRAMES.get(item.get("interval"))
+                if timeframe:
+                    yield "candle", item["symbol"], timeframe, [
+                        _iso_to_ms(item["interval_begin"]), float(item["open"]), float(item["high"]),
+                        float(item["low"]), float(item["close"]), float(item["volume"]),
+                    ]
+        elif message.get("method") == "subscribe" and not message.get("success", True):
+            logger.warning("[MarketStream] Kraken subscription rejected: %s", message.get("error"))
+
+
+class BingxProtocol:
+    """BingX spot / swap: frames gzip, Ping/Pong de aplicacion, dataTypes @ticker y @kline_X."""
+
+    INTERVALS = {"1m": "1min", "3m": "3min", "5m": "5min", "15m": "15min", "30m": "30min",
+                 "1h": "60min", "2h": "2hour", "4h": "4hour", "1d": "1day", "1w": "1week", "1M": "1mon"}
+    TIMEFRAMES = {interval: tf for tf, interval in INTERVALS.items()}
+
+    @staticmethod
+    def ws_symbol(symbol: str) -> Optional[str]:
+        parts = _split_symbol(symbol)
+        return f"{parts[0]}-{parts[1]}" if parts else None
+
+    def ticker_subscription(self, ws_symbol: str) -> Dict[str, Any]:
+        return {"id": str(uuid.uuid4()), "reqType": "sub", "dataType": f"{ws_symbol}@ticker"}
+
+    def candle_subscription(self, ws_symbol: str, timeframe: str) -> Optional[Dict[str, Any]]:
+        interval = self.INTERVALS.get(timeframe)
+        if interval is None:
+            return None
+        return {"id": str(uuid.uuid4()), "reqType": "sub", "dataType": f"{ws_symbol}@kline_{interval}"}
+
+    def decode(self, data: Any) -> Tuple[Optional[Any], Optional[str]]:
+        text = gzip.decompress(data).decode() if isinstance(data, bytes) else data
+        if text == "Ping":
+            return None, "Pong"
+        message = json.loads(text)
+        if isinstance(message, dict) and "ping" in message:
+            return None, json.dumps({"pong": message["ping"], "time": message.get("time")})
+        return message, None
+
+    def events(self, message: Any) -> Iterable[Tuple]:
+        if not isinstance(message, dict) or not message.get("dataType") or message.get("data") is None:
+            return
+        ws_symbol, _, channel = message["dataType"].partition("@")
+        data = message["data"]
+        if channel == "ticker":
+            if isinstance(data, dict) and data.get("c") is not None:
+                yield "price", ws_symbol, float(data["c"])
+        elif channel.startswith("kline_"):
+            timeframe = self.TIMEFRAMES.get(channel[len("kline_"):])
+            # Spot: {"K": {...}}; swap: [{"T": ..., "o": ...}]
+            items = [data["K"]] if isinstance(data, dict) and "K" in data else data if isinstance(data, list) else []
+            for item in items:
+                if timeframe:
+                    yield "candle", ws_symbol, timeframe, [
+                        int(item.get("t", item.get("T"))), float(item["o"]), float(item["h"]),
+                        float(item["l"]), float(item["c"]), float(item["v"]),
+                    ]
+
+
+PROTOCOLS = {"kraken": KrakenProtocol, "bingx": BingxProtocol, "bingx_swap": BingxProtocol}
+
+
+# ----------------------------
+# Stream
+# ----------------------------
+
+@dataclass
+class _Feed:
+    name: str
+    url: str
+    protocol: Any
+    tickers: Set[str] = field(default_factory=set)
+    candles: Set[Tuple[str, str]] = field(default_factory=set)
+    ws: Any = None
+    connected_at: float = 0.0
+    last_message_at: float = 0.0
+    started: bool = False
+
+
+class MarketStream:
+    def __init__(self, urls: Optional[Dict[str, str]] = None, stale_seconds: float = STALE_SECONDS,
+                 enabled: bool = Config.MARKET_STREAM_ENABLED):
+        self.urls = dict(FEED_URLS, **(urls or {}))
+        self.stale_seconds = stale_seconds
+        self.enabled = enabled
+        self._lock = Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[Thread] = None
+        self._feeds: Dict[str, _Feed] = {}
+        self._prices: Dict[Tuple[str, str], Tuple[float, float]] = {}  # -> (precio, recibido)
+        self._candles: Dict[Tuple[str, str, str], "OrderedDict[int, Candle]"] = {}
+        self._stats = {"messages": 0, "reconnects": 0, "price_hits": 0, "price_misses": 0,
+                       "candle_hits": 0, "candle_misses": 0}
+
+    # ----------------------------
+    # Suscripciones
+    # ----------------------------
+
+    def _feed(self, name: str) -> Optional[_Feed]:
+        if not self.enabled or name not in PROTOCOLS or not self.urls.get(name):
+            return None
+        feed = self._feeds.get(name)
+        if feed is None:
+            feed = _Feed(name=name, url=self.urls[name], protocol=PROTOCOLS[name]())
+            self._feeds[name] = feed
+        return feed
+
+    def subscribe_ticker(self, feed_name: str, symbol: str) -> bool:
+        with self._lock:
+            feed = self._feed(feed_name)
+            ws_symbol = feed.protocol.ws_symbol(symbol) if feed else None
+            if ws_symbol is None:
+                return False
+            if ws_symbol not in feed.tickers:
+                feed.tickers.add(ws_symbol)
+                self._send(feed, [feed.protocol.ticker_subscription(ws_symbol)])
+            return True
+
+    def subscribe_candles(self, feed_name: str, symbol: str, timeframe: str) -> bool:
+        with self._lock:
+            feed = self._feed(feed_name)
+            ws_symbol = feed.protocol.ws_symbol(symbol) if feed else None
+            subscription = feed.protocol.candle_subscription(ws_symbol, timeframe) if ws_symbol else None
+            if subscription is None:
+                return False
+            if (ws_symbol, timeframe) not in feed.candles:
+                feed.candles.add((ws_symbol, timeframe))
+                self._send(feed, [subscription])
+            return True
+
+    def _send(self, feed: _Feed, messages: List[Dict[str, Any]]) -> None:
+        """Envia las suscripciones si hay conexion; si no, se enviaran al conectar."""
+        self._ensure_loop()
+        if not feed.started:
+            feed.started = True
+            asyncio.run_coroutine_threadsafe(self._run_feed(feed), self._loop)
+        elif feed.ws is not None:
+            for message in messages:
+                asyncio.run_coroutine_threadsafe(feed.ws.send_str(json.dumps(message)), self._loop)
+
+    def _ensure_loop(self) -> None:
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._thread = Thread(target=self._loop.run_forever, name="market-stream", daemon=True)
+            self._thread.start()
+
+    # ----------------------------
+    # Conexion
+    # ----------------------------
+
+    async def _run_feed(self, feed: _Feed) -> None:
+        backoff = 1
+        async with aiohttp.ClientSession() as session:
+            while True:
+                try:
+                    async with session.ws_connect(feed.url, heartbeat=HEARTBEAT) as ws:
+                        with self._lock:
+                            feed.ws = ws
+                            feed.connected_at = feed.last_message_at = time.time()
+                            subscriptions = [feed.protocol.ticker_subscription(s) for s in feed.tickers]
+                            subscriptions += [feed.protocol.candle_subscription(s, tf) for s, tf in feed.candles]
+                        logger.info("[MarketStream] Connected to %s (%s subscriptions)", feed.name, len(subscriptions))
+                        for message in subscriptions:
+                            await ws.send_str(json.dumps(message))
+                        backoff = 1
+                        async for frame in ws:
+                            if frame.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                                reply = self._on_frame(feed, frame.data)
+                                if reply is not None:
+                                    await ws.send_str(reply)
+                            elif frame.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                                break
+                except Exception as e:
+                    logger.warning("[MarketStream] %s connection error: %s", feed.name, e)
+                finally:
+                    with self._lock:
+                        feed.ws = None
+                        feed.connected_at = 0.0
+                self._count("reconnects")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+
+    def _on_frame(self, feed: _Feed, data: Any) -> Optional[str]:
+        now = time.time()
+        try:
+            message, reply = feed.protocol.decode(data)
+            events = list(feed.protocol.events(message)) if message is not None else []
+        except Exception as e:
+            logger.debug("[MarketStream] Unparseable %s frame: %s", feed.name, e)
+            return None
+        with self._lock:
+            feed.last_message_at = now
+            self._stats["messages"] += 1
+            for event in events:
+                if event[0] == "price":
+                    self._prices[(feed.name, event[1])] = (event[2], now)
+                else:
+                    self._store_candles(feed.name, event[1], event[2], [event[3]])
+        return reply
+
+    def _store_candles(self, feed_name: str, ws_symbol: str, timeframe: str, candles: Iterable[Candle]) -> None:
+        book = self._candles.setdefault((feed_name, ws_symbol, timeframe), OrderedDict())
+        for candle in candles:
+            ts = int(candle[0])
+            book[ts] = [ts] + [float(v) for v in candle[1:6]]
+        if len(book) > MAX_BOOK_CANDLES or (book and next(reversed(book)) < next(iter(book))):
+            ordered = OrderedDict(sorted(book.items())[-MAX_BOOK_CANDLES:])
+            book.clear()
+            book.update(ordered)
+
+    # ----------------------------
+    # Lectura del libro
+    # ----------------------------
+
+    def _fresh(self, feed: Optional[_Feed], now: float) -> bool:
+        return feed is not None and feed.ws is not None and now - feed.last_message_at < self.stale_seconds
+
+    def get_price(self, feed_name: str, symbol: str) -> Optional[float]:
+        """Last streamed price, or None if the stream is down/stale and REST should be used."""
+        now = time.time()
+        with self._lock:
+            feed = self._feeds.get(feed_name)
+            ws_symbol = feed.protocol.ws_symbol(symbol) if feed else None
+            entry = self._prices.get((feed_name, ws_symbol))
+            if entry is not None and self._fresh(feed, now) and entry[1] >= feed.connected_at:
+                self._stats["price_hits"] += 1
+                return entry[0]
+            self._stats["price_misses"] += 1
+            return None
+
+    def get_candles(self, feed_name: str, symbol: str, timeframe: str, limit: int) -> Optional[List[Candle]]:
+        """
+        Last `limit` candles (ccxt format, the last one forming) if the book has them
+        contiguous up to the current candle and the stream is fresh; None otherwise.
+        """
+        now = time.time()
+        step_ms = timeframe_to_seconds(timeframe) * 1000
+        current = int(now * 1000) // step_ms * step_ms
+        with self._lock:
+            feed = self._feeds.get(feed_name)
+            ws_symbol = feed.protocol.ws_symbol(symbol) if feed else None
+            book = self._candles.get((feed_name, ws_symbol, timeframe))
+            if book and self._fresh(feed, now) and (ws_symbol, timeframe) in feed.candles:
+                candles = [book.get(current - i * step_ms) for i in range(limit - 1, -1, -1)]
+                if all(c is not None for c in candles):
+                    self._stats["candle_hits"] += 1
+                    return [list(c) for c in candles]
+            self._stats["candle_misses"] += 1
+            return None
+
+    def seed_candles(self, feed_name: str, symbol: str, timeframe: str, candles: Iterable[Candle]) -> None:
+        """Loads REST candles into the book; the stream keeps them up to date from then on."""
+        with self._lock:
+            feed = self._feed(feed_name)
+            ws_symbol = feed.protocol.ws_symbol(symbol) if feed else None
+            if ws_symbol is not None:
+                self._store_candles(feed_name, ws_symbol, timeframe, candles)
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            stats = dict(self._stats)
+            stats["feeds"] = {
+                name: {
+                    "connected": feed.ws is not None,
+                    "fresh": self._fresh(feed, now),
+                    "tickers": len(feed.tickers),
+                    "candles": len(feed.candles),
+                    "last_message_seconds_ago": now - feed.last_message_at if feed.last_message_at else None,
+                }
+                for name, feed in self._feeds.items()
+            }
+        return stats
+
+
+market_stream = MarketStream()
@@ -2,7 +2,10 @@
 # Q-Learning Table (Kept as a class, but its use is within a strategy function)
 # ----------------------------
 
+import csv
 import os
+from threading import Lock
+from typing import Dict, Iterable
 
 import pandas as pd
 
@@ -11,67 +14,116 @@ import logging
 logger = logging.getLogger(__name__)
 import traceback
 
+ACTIONS = ["buy", "sell", "hold"]
+INITIAL_Q_VALUE = 0.5
+COMPACT_EVERY = 500  # Filas en el log antes de reescribir el CSV completo
+
 
 class SimpleQTable:
-    """Q-learning table for trading decisions with incremental updates"""
+    """
+    Q-learning table for trading decisions with incremental updates.
+
+    Los valores viven en un dict state -> {buy, sell, hold} (lookup y update O(1)).
+    save() solo agrega al log "<csv>.log" los estados modificados desde el ultimo
+    guardado; cuando el log crece se compacta reescribiendo el CSV de siempre
+    (state,buy,sell,hold) y vaciando el log.
+    """
 
     def __init__(self, q_table_path="q_table.csv"):
         self.q_table_path = q_table_path
-        self.new_entries = []
+        self.log_path = f"{q_table_path}.log"
+        self.q_values: Dict[str, Dict[str, float]] = {}
+        self._dirty = set()
+        self._log_rows = 0
+        self._lock = Lock()
+
         try:
             # Use converters to ensure 'buy', 'sell', 'hold' are treated as numbers upon load
-            self.q_table = pd.read_csv(
-                q_table_path, converters={"buy": float, "sell": float, "hold": float}
+            df = pd.read_csv(
+                q_table_path,
+                dtype={"state": str},
+                converters={"buy": float, "sell": float, "hold": float},
             )
+            self._load_rows(df.to_dict("records"))
             logger.info(f"Loaded Q-table from {q_table_path}")
         except (FileNotFoundError, pd.errors.EmptyDataError):
             logger.warning(
                 f"Could not load Q-table from {q_table_path} or it was empty. Initializing empty table."
             )
-            self.q_table = pd.DataFrame(columns=["state", "buy", "sell", "hold"])
-            # Ensure the directory exists before writing
-            os.makedirs(os.path.dirname(self.q_table_path) or ".", exist_ok=True)
-            self.q_table.to_csv(q_table_path, index=False)  # Create empty file
+            self._write_csv(q_table_path)  # Create empty file
             logger.info(f"Created new Q-table at {q_table_path}")
         except Exception as e:
             logger.error(
                 f"Error loading Q-table from {q_table_path}: {str(e)}. Initializing empty table."
             )
-            self.q_table = pd.DataFrame(columns=["state", "buy", "sell", "hold"])
-            os.makedirs(os.path.dirname(self.q_table_path) or ".", exist_ok=True)
-            self.q_table.to_csv(q_table_path, index=False)  # Create empty file
+            self._write_csv(q_table_path)  # Create empty file
+
+        self._replay_log()
+
+    # ----------------------------
+    # Persistence helpers
+    # ----------------------------
+
+    def _load_rows(self, rows: Iterable[dict]):
+        for row in rows:
+            state = row.get("state")
+            if not isinstance(state, str) or not state:
+                continue
+            values = {}
+            for action in ACTIONS:
+                try:
+                    value = float(row.get(action, INITIAL_Q_VALUE))
+                except (TypeError, ValueError):
+                    value = INITIAL_Q_VALUE
+                values[action] = INITIAL_Q_VALUE if value != value else value  # NaN -> valor inicial
+            self.q_values[state] = values  # Last row wins, like drop_duplicates(keep="last")
+
+    def _replay_log(self):
+        """Applies the updates left in the log by a previous run (last write wins)."""
+        if not os.path.exists(self.log_path):
+            return
+        try:
+            with open(self.log_path, newline="") as f:
+                rows = [
+                    dict(zip(["state"] + ACTIONS, line))
+                    for line in csv.reader(f)
+                    if len(line) == len(ACTIONS) + 1
+                ]
+            self._load_rows(rows)
+            self._log_rows = len(rows)
+            if rows:
+                logger.info(f"Replayed {len(rows)} Q-table updates from {self.log_path}")
+        except Exception as e:
+            logger.error(f"Error replaying Q-table log {self.log_path}: {e}")
+
+    def _write_csv(self, path: str):
+        """Writes the full table atomically in the original CSV format."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["state"] + ACTIONS)
+            for state, values in self.q_values.items():
+                writer.writerow([state] + [float(values[action]) for action in ACTIONS])
+        os.replace(tmp_path, path)
+
+    # ----------------------------
+    # Q-learning API
+    # ----------------------------
 
     def get_action(self, state: str) -> str:
         """Get best action for given state"""
         try:
-            # Check in-memory new entries first
-            for entry in self.new_entries:
-                if entry["state"] == state:
-                    # Ensure keys exist before using them
-                    return max(["buy", "sell", "hold"], key=lambda x: entry.get(x, 0.5))
-
-            # Check existing table
-            row = self.q_table[self.q_table["state"] == state]
-            if not row.empty:
-                # Ensure keys exist before using them
-                return max(
-                    ["buy", "sell", "hold"], key=lambda x: row.iloc[0].get(x, 0.5)
-                )
-            else:
+            with self._lock:
+                values = self.q_values.get(state)
+                if values is not None:
+                    return max(ACTIONS, key=lambda x: values.get(x, INITIAL_Q_VALUE))
+
                 # Track new states encountered
-                if (
-                    state not in [e["state"] for e in self.new_entries]
-                    and state != "state_indicators_missing"
-                ):  # Don't add placeholder states
+                if state != "state_indicators_missing":  # Don't add placeholder states
                     logger.debug(f"New state encountered: {state}")
-                    self.new_entries.append(
-                        {
-                            "state": state,
-                            "buy": 0.5,  # Initial Q-values
-                            "sell": 0.5,
-                            "hold": 0.5,
-                        }
-                    )
+                    self.q_values[state] = {action: INITIAL_Q_VALUE for action in ACTIONS}
+                    self._dirty.add(state)
                 return "hold"  # Default action if state not found or new
 
         except Exception as e:
@@ -81,114 +133,56 @@ class SimpleQTable:
     def update_q_value(self, state: str, action: str, reward: float, learning_rate=0.1):
         """Update Q-value for state-action pair"""
         # Ensure state and action are valid
-        if state in ["unknown", "state_indicators_missing"] or action not in [
-            "buy",
-            "sell",
-            "hold",
-        ]:
+        if state in ["unknown", "state_indicators_missing"] or action not in ACTIONS:
             logger.debug(
                 f"Skipping Q-value update for invalid state '{state}' or action '{action}'."
             )
             return
 
-        # Update new entries first
-        for entry in self.new_entries:
-            if entry["state"] == state:
-                # Ensure the action column exists in the entry
-                if action in entry:
-                    entry[action] = (1 - learning_rate) * entry[
-                        action
-                    ] + learning_rate * reward
-                    logger.debug(
-                        f"Updated Q-value for state {state}, action {action} (new entry)"
-                    )
-                else:
-                    logger.warning(
-                        f"Action '{action}' not found in new entry for state '{state}'. Cannot update."
-                    )
-                return
-
-        # Then check existing table
-        if state in self.q_table["state"].values:
-            idx = self.q_table[self.q_table["state"] == state].index[0]
-            # Ensure the action column exists in the DataFrame
-            if action in self.q_table.columns:
-                self.q_table.at[idx, action] = (1 - learning_rate) * self.q_table.at[
-                    idx, action
-                ] + learning_rate * reward
-                logger.debug(
-                    f"Updated Q-value for state {state}, action {action} (existing entry)"
-                )
-            else:
+        with self._lock:
+            values = self.q_values.get(state)
+            if values is None:
                 logger.warning(
-                    f"Action column '{action}' not found in Q-table DataFrame. Cannot update."
+                    f"Attempted to update Q-value for state '{state}' not found in the Q-table."
                 )
-        else:
-            logger.warning(
-                f"Attempted to update Q-value for state '{state}' not found in new_entries or table."
-            )
+                return
 
-    def save(self, path=None):
-        """Save Q-table to file, merging new entries"""
+            values[action] = (1 - learning_rate) * values[action] + learning_rate * reward
+            self._dirty.add(state)
+            logger.debug(f"Updated Q-value for state {state}, action {action}")
+
+    def save(self, path=None, compact=False):
+        """
+        Persists pending changes: appends the updated states to the log and
+        compacts into the CSV when the log reaches COMPACT_EVERY rows (or compact=True).
+        A path other than q_table_path gets a full CSV export.
+        """
         path = path or self.q_table_path
         try:
-            # Load existing table before merging, in case it was updated by another process (less likely with singleton)
-            try:
-                # Use converters to ensure 'buy', 'sell', 'hold' are treated as numbers
-                existing_df = pd.read_csv(
-                    path, converters={"buy": float, "sell": float, "hold": float}
-                )
-            except (FileNotFoundError, pd.errors.EmptyDataError):
-                existing_df = pd.DataFrame(columns=["state", "buy", "sell", "hold"])
-            except Exception as e:
-                logger.error(f"Error loading Q-table before saving: {e}")
-                existing_df = pd.DataFrame(
-                    columns=["state", "buy", "sell", "hold"]
-                )  # Fallback
-
-            # Ensure all necessary columns exist in both DFs before merging
-            cols_to_check = ["state", "buy", "sell", "hold"]
-            for col in cols_to_check:
-                if col not in existing_df.columns:
-                    existing_df[col] = (
-                        0.5 if col != "state" else None
-                    )  # Add missing columns
-                if (
-                    col != "state" and existing_df[col].dtype != "float64"
-                ):  # Ensure numeric type
-                    existing_df[col] = pd.to_numeric(
-                        existing_df[col], errors="coerce"
-                    ).fillna(0.5)
-
-            # Merge new entries with existing table
-            if self.new_entries:
-                new_df = pd.DataFrame(self.new_entries)
-                # Ensure columns match and types are float for merging
-                for col in ["buy", "sell", "hold"]:
-                    if col in new_df.columns:
-                        new_df[col] = new_df[col].astype(float)
-                    if (
-                        col not in existing_df.columns
-                    ):  # Should already be handled above, but double check
-                        existing_df[col] = 0.5  # Add missing columns with default value
-
-                # Concatenate and drop duplicates, keeping the latest (from new_df)
-                # Use ignore_index=True and reset_index after drop_duplicates
-                combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-                self.q_table = combined_df.drop_duplicates(
-                    "state", keep="last"
-                ).reset_index(drop=True)
-
-                logger.info(f"Merged {len(self.new_entries)} new Q-table entries.")
-                self.new_entries = []  # Clear new entries after merging
-
-            # Save the updated table
-            # Ensure float columns are saved correctly
-            self.q_table[["buy", "sell", "hold"]] = self.q_table[
-                ["buy", "sell", "hold"]
-            ].astype(float)
-            self.q_table.to_csv(path, index=False)
-            logger.info(f"Q-table saved to {path}")
+            with self._lock:
+                if path != self.q_table_path:
+                    self._write_csv(path)
+                    logger.info(f"Q-table exported to {path}")
+                    return
+
+                if self._dirty:
+                    os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                    with open(self.log_path, "a", newline="") as f:
+                        writer = csv.writer(f)
+                        for state in self._dirty:
+                            values = self.q_values[state]
+                            writer.writerow([state] + [float(values[action]) for action in ACTIONS])
+                    self._log_rows += len(self._dirty)
+                    logger.info(f"Appended {len(self._dirty)} Q-table updates to {self.log_path}")
+                    self._dirty.clear()
+
+                if compact or self._log_rows >= COMPACT_EVERY:
+                    self._write_csv(path)
+                    # El CSV ya contiene todo lo del log
+                    if os.path.exists(self.log_path):
+                        os.remove(self.log_path)
+                    self._log_rows = 0
+                    logger.info(f"Q-table saved to {path}")
         except Exception as e:
             logger.error(f"Failed to save Q-table to {path}: {str(e)}")
             traceback.print_exc()
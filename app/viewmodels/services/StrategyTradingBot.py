@@ -1,25 +1,25 @@
 import logging
 import random
-import threading
 import random
-import time
+from threading import Lock
+from app.config import Config
 from app.lib.utils.tx import emit
+from app.models.blocked_balance import get_latest_blocked_id
+from app.lib.utils.decision_cache import candle_snapshot_hash, decision_cache
+from app.lib.utils.ppo_features import FEATURE_DIM, build_ppo_state
 from app.viewmodels.services.TradingBot import TradingConfig
 from app.models.strategies import get_strategy_by_id
-from app.viewmodels.services.llm import DeepSeekPPOAgent, QwenTradingAssistant, MODEL_PATHS
+from app.viewmodels.services.llm import get_ppo_agent, get_qwen_assistant
 from app.viewmodels.api.exchange.Exchange import ExchangeFactory
 from app.viewmodels.api.exchange.FatherExchange import Exchange
+from app.viewmodels.services.BotScheduler import SLOW, BotScheduler
+from app.viewmodels.services.MarketDataHub import MarketDataHub
 from app.viewmodels.wallet.found import Wallet, WalletAdmin
 
-input_dim = 30
+input_dim = FEATURE_DIM
 output_dim = 3
 
-qwen_assistant = QwenTradingAssistant(model_path=MODEL_PATHS["qwen"]["model_path"])
-ppo_agent = DeepSeekPPOAgent(
-    model_path=MODEL_PATHS["ppo_agent"]["model_path"],
-    input_dim=input_dim,
-    output_dim=output_dim
-)
+# Los modelos se cargan en el primer uso (get_qwen_assistant / get_ppo_agent), no al importar
 logger = logging.getLogger(__name__)
 
 class StrategyTradingBot:
@@ -33,37 +33,52 @@ class StrategyTradingBot:
         self.wallet = Wallet(self.user_id)
         self.type_wallet = type_wallet
         self.email = email
+        self.hub_subscriber_id = None  # Lo asigna TradingBotManager al suscribir el bot
+        self._trade_lock = Lock()  # La iteracion y el cierre de stop() no operan a la vez
+
+    def _job_key(self):
+        return f"{self.user_id}:strategy-bot:candle"
 
     def start(self):
         self.running = True
         print("Simulated trading bot started.")
-        self.thread = threading.Thread(target=self.run_loop)
-        self.thread.start()
+        # Una decision al arrancar y otra tras cada cierre de vela (BotScheduler). Espera al LLM
+        # y al PPO: va en el carril SLOW para no ocupar los workers de los demas bots
+        BotScheduler.schedule_candle(self._job_key(), self.config.timeframe, self.run_iteration, lane=SLOW)
         return True
 
     def stop(self):
         self.running = False
+        # La iteracion en curso puede estar esperando al LLM; si no termina a tiempo, no
+        # llega a operar porque comprueba running bajo _trade_lock
+        if not BotScheduler.cancel(self._job_key(), wait=Config.BOT_STOP_WAIT_SECONDS):
+            logger.warning(f"Strategy bot iteration for user {self.user_id} still running after stop")
+        if self.hub_subscriber_id is not None:
+            MarketDataHub.unsubscribe(self.hub_subscriber_id)
+            self.hub_subscriber_id = None
         print("Simulated trading bot stopped.")
-        logger.info("-> SLEEP 60s")
-        time.sleep(60)
 
-        _blocked_balance_ = self.wallet.get_blocked_balance(currency="BTC/USDT", by_bot="strategy-bot")
-        if _blocked_balance_["start_with"] != None:
-            operation_contrary = "buy" if _blocked_balance_["start_with"] == "sell" else "sell"
-            user_cryptos = self.wallet.get_blocked_balance(currency="BTC/USDT", by_bot="strategy-bot")["amount_crypto"]
-            self.execute_action(operation_contrary)
-            emit(email=self.email, event="bot", data={"id": "strategy-bot", "msg": f"All BTC ({abs(user_cryptos)}) has been sold."})
-            emit(email=self.email, event="bot", data={"id": "refresh-balance"})
+        with self._trade_lock:
+            _blocked_balance_ = self.wallet.get_blocked_balance(currency="BTC/USDT", by_bot="strategy-bot")
+            if _blocked_balance_["start_with"] != None:
+                operation_contrary = "buy" if _blocked_balance_["start_with"] == "sell" else "sell"
+                user_cryptos = _blocked_balance_["amount_crypto"]
+                self.execute_action(operation_contrary)
+                emit(email=self.email, event="bot", data={"id": "strategy-bot", "msg": f"All BTC ({abs(user_cryptos)}) has been sold."})
+                emit(email=self.email, event="bot", data={"id": "refresh-balance"})
 
         self.generate_report()
 
-    def run_loop(self):
-        while self.running:
-            time.sleep(5)
-            strategy = self.get_strategy()
-            emit(email=self.email, event="bot", data={"id": "strategy-bot", "msg": "Our AI assistant is analyzing the market and preparing your next trading move"})
-            decision = self.interact_with_llm(strategy)
-            emit(email=self.email, event="bot", data={"id": "strategy-bot", "msg": f"Our AI assistant suggests to '{decision.upper()}'"})
+    def run_iteration(self):
+        if not self.running:
+            return
+        strategy = self.get_strategy()
+        emit(email=self.email, event="bot", data={"id": "strategy-bot", "msg": "Our AI assistant is analyzing the market and preparing your next trading move"})
+        decision = self.interact_with_llm(strategy)
+        emit(email=self.email, event="bot", data={"id": "strategy-bot", "msg": f"Our AI assistant suggests to '{decision.upper()}'"})
+        with self._trade_lock:
+            if not self.running:
+                return  # stop() cierra la posicion
             self.execute_action(decision)
 
     def get_strategy(self):
@@ -74,7 +89,13 @@ class StrategyTradingBot:
         timeframe = self.config.timeframe
         # since 10 days ago
         # since = int(time.time() - (10 * 24 * 60 * 60))
-        market_data = self.exchange.fetch_ohlcv_optimized(self.config.trading_pair, timeframe)
+        snapshot = MarketDataHub.get_candles(
+            self.config.basic_bot_trading_mode_full,
+            self.config.trading_pair,
+            timeframe,
+            self.exchange,
+        )
+        market_data = snapshot.records() if snapshot else []
         strategy_id = self.config.strategy_id
         if not strategy_id:
             strategy_prompt = "Should I buy or sell?"
@@ -85,11 +106,30 @@ class StrategyTradingBot:
         else:
             strategy_prompt = strategy.text
 
+        # Misma vela, misma estrategia y misma posicion: la respuesta no cambia.
+        # Cada orden del bot crea o modifica un registro bloqueado, asi que su id la identifica
+        blocked = self.wallet.get_blocked_balance(currency="BTC/USDT", by_bot="strategy-bot")
+        cache_key = (
+            strategy_id,
+            candle_snapshot_hash(self.config.trading_pair, timeframe, market_data),
+            (
+                blocked["start_with"],
+                blocked["amount_crypto"],
+                get_latest_blocked_id(self.user_id, "BTC/USDT", "strategy-bot"),
+            ),
+        )
+        cached_action = decision_cache.get(cache_key) if market_data else None
+        if cached_action is not None:
+            logger.debug(f"Decision cache hit for strategy {strategy_id}: {cached_action}")
+            return cached_action
+
         emit(email=self.email, event="bot", data={"id": "strategy-bot", "msg": "AI is checking your strategy. Please wait a moment."})
+        qwen_assistant = get_qwen_assistant()
         qwen_strategy = qwen_assistant.generate_strategy(
             current_market=market_data,
             strategy_prompt=strategy_prompt,
-            orders_made=self.trades
+            orders_made=self.trades,
+            strategy_id=strategy_id,
         )
 
         emit(email=self.email, event="bot", data={"id": "strategy-bot", "msg": "AI is checking the market for you..."})
@@ -99,18 +139,27 @@ class StrategyTradingBot:
             print("#"*30)
             print("🔴 QWEN NO RESPONDIO UN JSON")
             print("#"*30)
-            return []
+            return "wait"
         else:
             action_map = {0: "buy", 1: "sell", 2: "wait"}
 
-            estado_ambiente = [0.5]*input_dim
-            trading_action = ppo_agent.execute_action(qwen_output, estado_ambiente)
+            estado_ambiente = build_ppo_state(
+                self.config.basic_bot_trading_mode_full,
+                self.config.trading_pair,
+                timeframe,
+                market_data,
+                blocked,
+                self.exchange,
+            )
+            trading_action = get_ppo_agent(input_dim, output_dim).execute_action(qwen_output, estado_ambiente)
             trading_action = action_map.get(int(trading_action), "wait")
 
             print("#"*30)
             print(f"✨ trading_action: {trading_action}")
             print(f"✨ qwen_output: {qwen_output}" )
             print("#"*30)
+            if market_data:
+                decision_cache.put(cache_key, trading_action, timeframe)
 
         return trading_action
 
@@ -137,16 +186,14 @@ class StrategyTradingBot:
         }
         
         if self.config.basic_bot_trading_mode_full in ["kraken_spot", "kraken_futures"]:
-            price_data = self.exchange.get_symbol_price(self.config.trading_pair)
-            if isinstance(price_data, tuple):
-                if isinstance(price_data[0], dict) and 'price' in price_data[0]:
-                    price = price_data[0]['price']
-                else:
-                    price = price_data[0]
-            else:
-                price = price_data
-
-            data["price"] = price * amount
+            price = MarketDataHub.get_ticker(
+                self.config.basic_bot_trading_mode_full,
+                self.config.trading_pair,
+                self.exchange,
+            ).price
+
+            # Kraken spot espera precio unitario (limite y reserva provisional); futures, el nocional
+            data["price"] = price if self.config.basic_bot_trading_mode_full == "kraken_spot" else price * amount
         if self.config.basic_bot_trading_mode_full in ["kraken_futures", "bingx_spot", "bingx_futures"]:
             data["leverage"] = 1.0
             data["stopLoss"] = None
@@ -1,8 +1,7 @@
 import logging
-import time
 import traceback
 from datetime import datetime
-from threading import Lock, Thread
+from threading import Lock
 from typing import Any, Dict, List, Literal, Optional, Tuple
 
 import ccxt
@@ -13,6 +12,7 @@ import pandas as pd
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field, field_validator
 
+from app.config import Config
 from app.lib.utils.tx import emit
 from app.models.trades import (
     get_open_trades_from_user,
@@ -24,8 +24,12 @@ from app.models.users import add_last_error_message
 from app.viewmodels.services.SimpleQTable import SimpleQTable
 from app.viewmodels.api.exchange.Exchange import ExchangeFactory
 from app.viewmodels.api.exchange.FatherExchange import Exchange
+from app.lib.utils.candle_store import candle_store, candle_to_record
+from app.lib.utils.indicator_state import get_indicator_state
+from app.lib.utils.rate_limiter import HIGH, rate_limiter
+from app.viewmodels.services.BotScheduler import BotScheduler
+from app.viewmodels.services.MarketDataHub import MarketDataHub
 from app.lib.utils.trading_strategies import (
-    calculate_indicators,
     strategy_rsi,
     strategy_basic_candlesticks,
     strategy_ema_crossover,
@@ -36,6 +40,8 @@ from app.viewmodels.wallet.found import Wallet
 
 logger = logging.getLogger(__name__)
 
+WARM_UP_CANDLES = 300  # Stored candles fed to the indicator state on the first iteration
+
 
 # ----------------------------
 # Configuration Models
@@ -121,16 +127,26 @@ class TradingBot:
             emit(email=self.email, event="bot", data={"id": "basic-bot", "msg": "Checking your bot settings. Please wait while we validate your configuration..."})
 
             self.config = TradingConfig(**config)
+            # Shared streaming EMA/RSI state for this (exchange, pair, timeframe)
+            self.indicator_state = get_indicator_state(
+                self.config.trading_pair,
+                self.config.timeframe,
+                self.config.basic_bot_trading_mode_full,
+            )
 
             # Si la instancia ya estaba inicializada, no re-crear los estados, solo actualizar config
             if not hasattr(self, "_initialized"):
                 # Trading state
                 self.running = False
+                self._trade_lock = Lock()  # Candle iteration, SL/TP tick and stop() never trade at the same time
+                # Suscripcion al MarketDataHub (la registra TradingBotManager al arrancar el bot)
+                self.hub_subscriber_id: Optional[str] = None
                 self.active_trades: List[Dict[str, Any]] = []  # List of dicts for currently open trades managed by THIS bot instance
                 self.trade_history: List[Dict[str, Any]] = []  # List of dicts for completed trades
                 self._last_update = datetime.now()
                 self.bot_errors: List[str] = []  # List to store recent errors
                 self.signals_history: List[Dict[str, Any]] = []  # List to track generated signals and their contributions
+                self._indicators_warmed = False  # Indicator state seeded from the candle store
                 self.q_table = SimpleQTable(q_table_path=f"q_tables/q_table_{user_id}.csv")  # User-specific Q-table path
                 self._initialized = True
 
@@ -144,8 +160,16 @@ class TradingBot:
 
     def _force_stop(self):
         self.running = False
+        BotScheduler.cancel(*self._job_keys())
+        self._unsubscribe_market_data()
         print("🛑 Forced stop for bot %s", self.user_id)
 
+    def _unsubscribe_market_data(self):
+        """Releases the shared candle/ticker entries however the bot stops (idempotent)."""
+        if self.hub_subscriber_id is not None:
+            MarketDataHub.unsubscribe(self.hub_subscriber_id)
+            self.hub_subscriber_id = None
+
     def _add_bot_error(self, error):
         logger.error("Bot Error for %s: %s", self.user_id, error)
         self.bot_errors.append(error)
@@ -206,8 +230,11 @@ class TradingBot:
 
         return False
 
+    def _job_keys(self) -> Tuple[str, str]:
+        return f"{self.user_id}:basic-bot:candle", f"{self.user_id}:basic-bot:risk"
+
     def start(self):
-        """Start the trading bot in a background thread"""
+        """Start the trading bot on the shared BotScheduler"""
         logger.info(f"Attempting to start bot for user {self.user_id}")
 
         if self.running:
@@ -216,9 +243,12 @@ class TradingBot:
 
         try:
             self.running = True
-            logger.debug(f"Creating trading thread for user {self.user_id}")
-            self.thread = Thread(target=self._run_loop, daemon=True)
-            self.thread.start()
+            self._loop_count = 0
+            candle_key, risk_key = self._job_keys()
+            logger.debug(f"Scheduling trading jobs for user {self.user_id}")
+            # Una iteracion al arrancar y despues una tras cada cierre de vela; SL/TP en un tick propio
+            BotScheduler.schedule_candle(candle_key, self.config.timeframe, self._run_iteration)
+            BotScheduler.schedule_interval(risk_key, Config.BOT_RISK_TICK_SECONDS, self._risk_tick)
             logger.info(f"✅ Successfully started bot for user {self.user_id}")
             # Reset bot errors when starting
             self.bot_errors = []
@@ -253,155 +283,157 @@ class TradingBot:
             """
         )
 
-    def _run_loop(self):
-        """Main trading loop"""
-        logger.info("🚀 Starting trading loop for user %s", self.user_id)
-        loop_count = 0
-        # Consider managing an initial state or waiting period
-        # time.sleep(5) # Optional initial delay
-
-        while self.running:
-            loop_count += 1
-            emit(email=self.email, event="bot", data={"id": "basic-bot", "msg": f"We're working on your trading bot, and this is round #{loop_count}"})
-            # logger.debug(f"--- Trading loop iteration {loop_count} for user {self.user_id} ---") # Can be noisy
-
-            if self._should_stop():
-                logger.info("Bot _should_stop condition met for user %s. Exiting loop.", self.user_id)
-                break  # Exit the loop if stop condition is met
-
-            try:
-                start_time = time.time()
-
-                # 1. Fetch market data
-                # logger.debug(f"Fetching market data for {self.config.trading_pair}") # Can be noisy
-                ohlcv_df = self._fetch_market_data()
-                if ohlcv_df is None or ohlcv_df.empty:
-                    logger.warning(
-                        f"No market data available or data insufficient for {self.config.trading_pair}, skipping iteration."
-                    )
-                    # Add a small delay before the next iteration if data fetch failed
-                    time.sleep(5)
-                    continue
-
-                # Calculate indicators *once* for all strategies using manual implementations
-                processed_df = calculate_indicators(ohlcv_df)
-                # After dropping NA, check if there's still enough data (e.g., at least 2 rows for crossover/engulfing)
-                if processed_df.empty or len(processed_df) < 2:
-                    logger.warning(
-                        "DataFrame empty or too short after indicator calculation, skipping iteration."
-                    )
-                    emit(email=self.email, event="bot", data={"id": "basic-bot", "msg": "Not enough market data to analyze right now. Waiting for more data before making trading decisions."})
-                    time.sleep(5)
-                    continue
-
-                # 2. Generate trading signals using the strategy functions
-                # _generate_signals returns aggregated signals, Q-state, and contributing strategies
-                aggregated_signals, q_state, contributing_strategies = (
-                    self._generate_signals(processed_df)
-                )
+    def _run_iteration(self) -> Optional[float]:
+        """
+        One trading iteration, run by BotScheduler just after each candle close.
+        Returns the seconds until a retry when the iteration could not complete.
+        """
+        if not self.running:
+            return None
+        self._loop_count += 1
+        loop_count = self._loop_count
+        if loop_count == 1:
+            logger.info("🚀 Starting trading loop for user %s", self.user_id)
+        emit(email=self.email, event="bot", data={"id": "basic-bot", "msg": f"We're working on your trading bot, and this is round #{loop_count}"})
+        # logger.debug(f"--- Trading loop iteration {loop_count} for user {self.user_id} ---") # Can be noisy
+
+        if self._should_stop():
+            logger.info("Bot _should_stop condition met for user %s. Exiting loop.", self.user_id)
+            logger.info(f"Trading loop stopped for user {self.user_id}.")
+            return None
 
-                # Log the aggregated signal and contributors
-                buy_contrib = (
-                    ", ".join(contributing_strategies["buy"])
-                    if contributing_strategies["buy"]
-                    else "None"
-                )
-                sell_contrib = (
-                    ", ".join(contributing_strategies["sell"])
-                    if contributing_strategies["sell"]
-                    else "None"
-                )
-                logger.info(
-                    f"🧙 Aggregated Signals: BUY={aggregated_signals['buy']} (Contrib: {buy_contrib}), SELL={aggregated_signals['sell']} (Contrib: {sell_contrib}) | Q-state: {q_state}"
+        try:
+            # 1. Fetch market data
+            # logger.debug(f"Fetching market data for {self.config.trading_pair}") # Can be noisy
+            ohlcv_df = self._fetch_market_data()
+            if ohlcv_df is None or ohlcv_df.empty:
+                logger.warning(
+                    f"No market data available or data insufficient for {self.config.trading_pair}, skipping iteration."
                 )
-                if not aggregated_signals["buy"] and not aggregated_signals["sell"]:
-                    user_msg = "There are currently no market signals.\nThe bot is waiting for a good opportunity to trade."
-                elif aggregated_signals["buy"]:
-                    user_msg = f"The market signal suggests a BUY opportunity! 🚀 (Contributors: {buy_contrib})"
-                elif aggregated_signals["sell"]:
-                    user_msg = f"The market signal suggests a SELL opportunity! 📉 (Contributors: {sell_contrib})"
-                else:
-                    user_msg = "No clear trading signal at the moment. The bot is monitoring the market."
-
-                emit(
-                    email=self.email,
-                    event="bot",
-                    data={
-                        "id": "basic-bot",
-                        "msg": user_msg
-                    }
+                # Retry shortly instead of waiting for the next candle close
+                return 5
+
+            if not self._indicators_warmed:
+                self._warm_up_indicators(ohlcv_df)
+            # Update the incremental indicator state (O(1) per new closed candle) for all strategies
+            processed_df = self.indicator_state.update(ohlcv_df)
+            # After dropping NA, check if there's still enough data (e.g., at least 2 rows for crossover/engulfing)
+            if processed_df.empty or len(processed_df) < 2:
+                logger.warning(
+                    "DataFrame empty or too short after indicator calculation, skipping iteration."
                 )
+                emit(email=self.email, event="bot", data={"id": "basic-bot", "msg": "Not enough market data to analyze right now. Waiting for more data before making trading decisions."})
+                return 5
 
-                # Track generated signals details for reporting
-                self.signals_history.append(
-                    {
-                        "time": datetime.now(),
-                        "buy_triggered": aggregated_signals["buy"],
-                        "sell_triggered": aggregated_signals["sell"],
-                        "buy_contributors": contributing_strategies["buy"],
-                        "sell_contributors": contributing_strategies["sell"],
-                        "q_state": q_state,
-                    }
-                )
+            # 2. Generate trading signals using the strategy functions
+            # _generate_signals returns aggregated signals, Q-state, and contributing strategies
+            aggregated_signals, q_state, contributing_strategies = (
+                self._generate_signals(processed_df)
+            )
+
+            # Log the aggregated signal and contributors
+            buy_contrib = (
+                ", ".join(contributing_strategies["buy"])
+                if contributing_strategies["buy"]
+                else "None"
+            )
+            sell_contrib = (
+                ", ".join(contributing_strategies["sell"])
+                if contributing_strategies["sell"]
+                else "None"
+            )
+            logger.info(
+                f"🧙 Aggregated Signals: BUY={aggregated_signals['buy']} (Contrib: {buy_contrib}), SELL={aggregated_signals['sell']} (Contrib: {sell_contrib}) | Q-state: {q_state}"
+            )
+            if not aggregated_signals["buy"] and not aggregated_signals["sell"]:
+                user_msg = "There are currently no market signals.\nThe bot is waiting for a good opportunity to trade."
+            elif aggregated_signals["buy"]:
+                user_msg = f"The market signal suggests a BUY opportunity! 🚀 (Contributors: {buy_contrib})"
+            elif aggregated_signals["sell"]:
+                user_msg = f"The market signal suggests a SELL opportunity! 📉 (Contributors: {sell_contrib})"
+            else:
+                user_msg = "No clear trading signal at the moment. The bot is monitoring the market."
+
+            emit(
+                email=self.email,
+                event="bot",
+                data={
+                    "id": "basic-bot",
+                    "msg": user_msg
+                }
+            )
+
+            # Track generated signals details for reporting
+            self.signals_history.append(
+                {
+                    "time": datetime.now(),
+                    "buy_triggered": aggregated_signals["buy"],
+                    "sell_triggered": aggregated_signals["sell"],
+                    "buy_contributors": contributing_strategies["buy"],
+                    "sell_contributors": contributing_strategies["sell"],
+                    "q_state": q_state,
+                }
+            )
 
+            # Orders and SL/TP exits go ahead of other calls on the shared rate limiter
+            with self._trade_lock, rate_limiter.priority(HIGH):
+                if not self.running:
+                    return None  # stop() ya cerro (o esta cerrando) la posicion
                 # 3. Execute trades based on aggregated signals
                 # Pass the Q-state to execute strategy so it can be stored with the trade
                 self._execute_strategy(aggregated_signals, q_state)
                 # emit(email=self.email, event="bot", data={"id": "refresh-balance"})
 
                 # 4. Manage risk (check stop loss/take profit for active trades)
+                # Between candle closes this runs on its own faster tick (_risk_tick)
                 self._check_risk_management()
 
-                # 5. Respect rate limits and control loop speed
-                elapsed = time.time() - start_time
+            # Periodically save Q-table
+            if loop_count % 50 == 0:  # Save frequently enough
+                self.q_table.save()
 
-                # Ensure we sleep for at least self.exchange.rateLimit / 1000 seconds
-                # Add a minimum sleep time to avoid excessive polling and stay below timeframe frequency
-                min_api_sleep = self.exchange.rateLimit / 1000
-                # Calculate a reasonable sleep based on timeframe (e.g., run 4 times per timeframe duration)
-                timeframe_seconds = self._timeframe_to_seconds(self.config.timeframe)
-                ideal_loop_interval = max(
-                    min_api_sleep * 2, timeframe_seconds / 4, 10
-                )  # At least 2x API limit, 1/4 timeframe, min 10s
-
-                sleep_time = max(
-                    ideal_loop_interval - elapsed, 1
-                )  # Ensure at least 1 second sleep
-
-                # logger.debug(f"Iteration took {elapsed:.2f}s, sleeping for {sleep_time:.2f}s (Min API sleep: {min_api_sleep:.2f}s, Ideal interval: {ideal_loop_interval:.2f}s)") # Can be noisy
-
-                # Periodically save Q-table
-                if loop_count % 50 == 0:  # Save frequently enough
-                    self.q_table.save()
-
-                time.sleep(sleep_time)
+            # 5. The next iteration runs after the next candle close (BotScheduler)
+            return None
 
-            except ccxt.RateLimitExceeded as e:
-                logger.warning(
-                    f"Rate limit exceeded for user {self.user_id}. Waiting longer..."
-                )
-                self._add_bot_error(f"Rate limit exceeded: {e}")
-                time.sleep(
-                    self.exchange.rateLimit / 1000 * 3
-                )  # Wait triple the rate limit time
-            except (ccxt.ExchangeError, ccxt.NetworkError) as e:
-                logger.error(
-                    f"Exchange or Network error for user {self.user_id}: {type(e).__name__} - {e}"
-                )
-                self._add_bot_error(f"Exchange/Network error: {e}")
-                time.sleep(60)  # Pause on exchange/network errors
-            except Exception as e:
-                logger.error(
-                    f"⚠️ Unhandled trading loop error for user {self.user_id}: {str(e)}"
-                )
-                logger.info(
-                    "Pausing trading loop for 60 seconds after unhandled error."
-                )
-                traceback.print_exc()
-                self._add_bot_error(f"Unhandled loop error: {e}")
-                time.sleep(60)  # Pause longer on unhandled errors
+        except ccxt.RateLimitExceeded as e:
+            logger.warning(
+                f"Rate limit exceeded for user {self.user_id}. Waiting longer..."
+            )
+            self._add_bot_error(f"Rate limit exceeded: {e}")
+            # The shared bucket is already paused for every caller of this key; retry after it
+            return Config.RATE_LIMIT_PENALTY_SECONDS
+        except (ccxt.ExchangeError, ccxt.NetworkError) as e:
+            logger.error(
+                f"Exchange or Network error for user {self.user_id}: {type(e).__name__} - {e}"
+            )
+            self._add_bot_error(f"Exchange/Network error: {e}")
+            return 60  # Pause on exchange/network errors
+        except Exception as e:
+            logger.error(
+                f"⚠️ Unhandled trading loop error for user {self.user_id}: {str(e)}"
+            )
+            logger.info(
+                "Pausing trading loop for 60 seconds after unhandled error."
+            )
+            traceback.print_exc()
+            self._add_bot_error(f"Unhandled loop error: {e}")
+            return 60  # Pause longer on unhandled errors
 
-        logger.info(f"Trading loop stopped for user {self.user_id}.")
+    def _risk_tick(self) -> None:
+        """Fast stop loss / take profit check between candle closes (BotScheduler interval job)"""
+        if not self.running or not self.active_trades:
+            return
+        # If the candle iteration is trading right now it already checks SL/TP
+        if not self._trade_lock.acquire(blocking=False):
+            return
+        try:
+            with rate_limiter.priority(HIGH):
+                self._check_risk_management()
+        except Exception as e:
+            logger.error(f"⚠️ Risk management tick failed for user {self.user_id}: {e}")
+            self._add_bot_error(f"Risk tick error: {e}")
+        finally:
+            self._trade_lock.release()
 
     def _timeframe_to_seconds(self, timeframe: str) -> int:
         """Converts timeframe string to seconds."""
@@ -427,13 +459,42 @@ class TradingBot:
             )
             return 60  # Fallback
 
+    def _warm_up_indicators(self, ohlcv_df: pd.DataFrame):
+        """Seeds the shared indicator state with stored candles so EMA/RSI start from real history"""
+        self._indicators_warmed = True
+        try:
+            # Timestamps naive en hora local, igual que candle_store.record_to_candle
+            first_live = int(ohlcv_df["timestamp"].iloc[0].to_pydatetime().timestamp())
+            history = candle_store.get_recent(
+                self.config.basic_bot_trading_mode_full,
+                self.config.trading_pair,
+                self.config.timeframe,
+                WARM_UP_CANDLES,
+                before=first_live,
+            )
+            if history and self.indicator_state.warm_up(
+                pd.DataFrame([candle_to_record(c) for c in history]).assign(
+                    timestamp=lambda d: pd.to_datetime(d["timestamp"])
+                )
+            ):
+                logger.info("Indicator state warmed up with %s stored candles", len(history))
+        except Exception as e:
+            logger.warning(f"Could not warm up indicators from the candle store: {e}")
+
     def _fetch_market_data(self) -> Optional[pd.DataFrame]:
         """Fetch OHLCV data from Kraken"""
         try:
             # logger.debug(f"Fetching OHLCV data for {self.config.trading_pair} with timeframe {self.config.timeframe}") # Can be noisy
             # Fetch enough data for indicators (e.g., 26 for EMA26/RSI + buffer + 1 for engulfing)
             # 100 candles should be sufficient for most common indicators
-            ohlcv = self.exchange.fetch_ohlcv_optimized(self.config.trading_pair, self.config.timeframe)
+            # Snapshot compartida con el resto de bots del mismo par/timeframe
+            snapshot = MarketDataHub.get_candles(
+                self.config.basic_bot_trading_mode_full,
+                self.config.trading_pair,
+                self.config.timeframe,
+                self.exchange,
+            )
+            ohlcv = snapshot.records() if snapshot else None
             if not ohlcv or len(ohlcv) == 0:
                 logger.warning(
                     f"No OHLCV data returned for {self.config.trading_pair}."
@@ -845,28 +906,14 @@ class TradingBot:
         return success, None
 
     def _get_current_price(self) -> Optional[float]:
-        """Get current market price using ccxt ticker."""
+        """Get current market price from the shared MarketDataHub ticker."""
         try:
-            current_price = self.exchange.get_symbol_price(self.config.trading_pair)
-            if isinstance(current_price, tuple):
-                price_data = current_price[0]
-                if isinstance(price_data, dict):
-                    if "error" in price_data and price_data["error"]:
-                        raise Exception(f"Error getting price: {price_data['error']}")
-                    if "price" in price_data:
-                        price = price_data["price"]
-                    else:
-                        price = price_data
-                else:
-                    price = price_data
-            else:
-                price = current_price
-
-            # Ensure price is a valid number
-            if not isinstance(price, (int, float)) or price is None:
-                raise Exception(f"Invalid price received: {price}")
-
-            return price
+            ticker = MarketDataHub.get_ticker(
+                self.config.basic_bot_trading_mode_full,
+                self.config.trading_pair,
+                self.exchange,
+            )
+            return ticker.price
         except Exception as e:
             logger.error(f"❌ Error al obtener el precio actual para {self.config.trading_pair}: {str(e)}")
             self._add_bot_error(f"Failed to get price: {e}")
@@ -1102,27 +1149,35 @@ class TradingBot:
     def stop(self):
         """Stop the trading bot"""
         self.running = False
-        
-        logger.info("-> SLEEP 60s")
-        time.sleep(60)
+        logger.info(f"Waiting for running jobs of user {self.user_id}...")
+        # Give a running iteration (rate limiter, network...) time to finish before closing
+        if not BotScheduler.cancel(*self._job_keys(), wait=Config.BOT_STOP_WAIT_SECONDS):
+            logger.warning(
+                f"Bot iteration for user {self.user_id} did not finish gracefully within timeout."
+            )
+        else:
+            logger.info(f"Bot jobs for user {self.user_id} finished successfully.")
+        self._unsubscribe_market_data()
 
         logger.info(f"Attempting to stop bot for user {self.user_id}")
 
-        _blocked_balances_ = self.wallet.get_blocked_balance(currency="BTC/USDT", by_bot="basic-bot")
-        user_cryptos = abs(_blocked_balances_["amount_crypto"])
-        type_order = "buy" if _blocked_balances_["start_with"] == "sell" else "sell"
-        current_price = self._get_current_price()
+        # Una iteracion que siga en curso ve running=False bajo el mismo lock y no opera
+        with self._trade_lock, rate_limiter.priority(HIGH):
+            _blocked_balances_ = self.wallet.get_blocked_balance(currency="BTC/USDT", by_bot="basic-bot")
+            user_cryptos = abs(_blocked_balances_["amount_crypto"])
+            type_order = "buy" if _blocked_balances_["start_with"] == "sell" else "sell"
+            current_price = self._get_current_price()
 
-        success, _ = self._create_order(
-            order_direction=type_order,
-            current_price=current_price,
-            order_type="market",
-            leverage=1.0,
-            stop_loss=None,
-            take_profit=None,
-            volume=user_cryptos,
-            symbol=self.config.trading_pair
-        )
+            success, _ = self._create_order(
+                order_direction=type_order,
+                current_price=current_price,
+                order_type="market",
+                leverage=1.0,
+                stop_loss=None,
+                take_profit=None,
+                volume=user_cryptos,
+                symbol=self.config.trading_pair
+            )
         
         if not success:
             emit(email=self.email, event="bot", data={"id": "basic-bot", "msg": f"An error occurred when selling {user_cryptos} BTC from your account. To withdraw it, you can go to the trading section and exchange it for USDT"})
@@ -1132,18 +1187,9 @@ class TradingBot:
         emit(email=self.email, event="bot", data={"id": "refresh-history-basic-bot"})
         emit(email=self.email, event="bot", data={"id": "refresh-balance"})
 
-        if hasattr(self, "thread") and self.thread.is_alive():
-            logger.info(f"Joining bot thread for user {self.user_id}...")
-            self.thread.join(timeout=10)  # Give thread up to 10 seconds to finish loop
-            if self.thread.is_alive():
-                logger.warning(
-                    f"Bot thread for user {self.user_id} did not join gracefully within timeout."
-                )
-            else:
-                logger.info(f"Bot thread for user {self.user_id} joined successfully.")
         print(f"🛑 Stopped bot for {self.user_id}")
         self._print_report()
-        self.q_table.save()  # Save Q-table on shutdown
+        self.q_table.save(compact=True)  # Save Q-table on shutdown
         logger.info(f"Bot stopped and Q-table saved for user {self.user_id}.")
 
     @classmethod
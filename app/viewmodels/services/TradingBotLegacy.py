@@ -6,6 +6,8 @@ from datetime import datetime
 from dotenv import load_dotenv
 import logging
 
+from app.lib.utils.http_client import http_client
+
 class TradingBotLegacy:
     def __init__(self, pair='XXBTZUSD', interval=5, use_heikin_ashi=False):
         # Configure logging
@@ -41,7 +43,7 @@ class TradingBotLegacy:
         self.logger.debug(f"Fetching OHLC data for {self.PAIR} with interval {self.INTERVAL}")
         url = f'{self.API_URL}/0/public/OHLC'
         params = {'pair': self.PAIR, 'interval': self.INTERVAL}
-        response = requests.get(url, params=params)
+        response = http_client.get(url, params=params, rate_limit=("kraken", None, "public"))
         data = response.json()
         ohlc = data['result'][list(data['result'].keys())[0]]
         df = pd.DataFrame(ohlc, columns=['time', 'open', 'high', 'low', 'close', 'vwap', 'volume', 'count'])
@@ -6,6 +6,7 @@ import traceback
 from app.models.users import User
 from app.viewmodels.services.TradingBot import TradingBot
 from app.viewmodels.services.StrategyTradingBot import StrategyTradingBot
+from app.viewmodels.services.MarketDataHub import MarketDataHub
 from app.viewmodels.api.exchange.Exchange import ExchangeFactory
 
 # Configure logging if not already configured
@@ -79,8 +80,33 @@ class TradingBotManager:
                         email
                     )
 
+                if getattr(bot, "running", False):
+                    # TradingBot es un singleton por usuario: no tocar la suscripcion del que ya corre
+                    logger.warning("Bot for user %s is already running", user_id)
+                    return False
+
+                # Las velas y el ticker del par se piden una sola vez para todos los bots suscritos.
+                # Se suscribe antes de arrancar: la primera iteracion (run_now) ya lee la entrada
+                # compartida. El bot guarda su id de suscripcion para liberarla tambien si se para solo
+                subscriber_id = f"{user_id}:{bot_id}"
+                bot.hub_subscriber_id = subscriber_id
+                MarketDataHub.subscribe(
+                    subscriber_id,
+                    bot.config.basic_bot_trading_mode_full,
+                    bot.config.trading_pair,
+                    bot.config.timeframe,
+                    cls.exchange,
+                )
+
                 logger.debug("Starting TradingBot for user %s", user_id)
-                if not bot.start():
+                started = False
+                try:
+                    started = bot.start()
+                finally:
+                    if not started:
+                        MarketDataHub.unsubscribe(subscriber_id)
+                        bot.hub_subscriber_id = None
+                if not started:
                     logger.error("Failed to start bot for user %s", user_id)
                     return False
 
@@ -134,6 +160,7 @@ class TradingBotManager:
 
                 # Remove the bot from the active bots
                 del cls._bots[user_id][bot_id]
+                MarketDataHub.unsubscribe(f"{user_id}:{bot_id}")
                 return True
 
             except Exception as e:
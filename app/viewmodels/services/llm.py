@@ -1,12 +1,13 @@
-import torch
 import json
-from transformers import AutoTokenizer
 import re
-import json
-from huggingface_hub import hf_hub_download
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from pathlib import Path
-import torch.nn as nn
+
+# torch, transformers, huggingface_hub y llama_cpp se importan al usarse: importar este
+# modulo (TradingBotManager -> StrategyTradingBot) no debe cargar librerias ni pesos
 
 BASE_DIR = Path(__file__).parent.parent.parent
 MODELS_DIR = os.path.join(BASE_DIR, "..", "llm", "models")
@@ -38,6 +39,8 @@ def download_model(REPO_ID, FILENAME, SAVE_PATH):
     Returns:
         str: The full local path to the model file.
     """
+    from huggingface_hub import hf_hub_download
+
     # Construct the full path where the model is expected to be
     full_model_path = os.path.join(SAVE_PATH, FILENAME)
     os.makedirs(SAVE_PATH, exist_ok=True)
@@ -63,75 +66,164 @@ def download_model(REPO_ID, FILENAME, SAVE_PATH):
         return model_path
 
 from app.config import Config
+from app.viewmodels.services.LLMInferenceScheduler import LLMInferenceScheduler, PPOInferenceBatcher
 
-class PPOAgent(nn.Module):
-    def __init__(self, input_dim, output_dim):
-        super().__init__()
-        # Definir la estructura para coincidir con el state_dict
-        # Capas para la política (pi)
-        self.pi_mu_net = nn.Sequential(
-            nn.Linear(input_dim, 256),
-            nn.ReLU(),
-            nn.Linear(256, 256),
-            nn.ReLU(),
-            nn.Linear(256, output_dim)
-        )
-        # Capas para el valor (v)
-        self.v_v_net = nn.Sequential(
-            nn.Linear(input_dim, 256),
-            nn.ReLU(),
-            nn.Linear(256, 256),
-            nn.ReLU(),
-            nn.Linear(256, 1)
-        )
-        # Parámetro de desviación estándar para la política
-        self.log_std = nn.Parameter(torch.zeros(output_dim))
+PPO_TIMEOUT_SECONDS = 30
+PREFIX_CACHE_SIZE = 8  # Estados KV de prefijo en memoria (cada uno ocupa decenas de MB)
 
-    def forward(self, x):
-        # Solo necesitamos la parte de la política para la inferencia
-        return self.pi_mu_net(x)
+_ppo_agent_class = None
 
-if Config().ENVIRONMENT == "production-ia":
-    from llama_cpp import Llama
+def _get_ppo_agent_class():
+    """Define PPOAgent (nn.Module) la primera vez que se necesita, importando torch"""
+    global _ppo_agent_class
+    if _ppo_agent_class is not None:
+        return _ppo_agent_class
+
+    import torch
+    import torch.nn as nn
+
+    class PPOAgent(nn.Module):
+        def __init__(self, input_dim, output_dim):
+            super().__init__()
+            # Definir la estructura para coincidir con el state_dict
+            # Capas para la política (pi)
+            self.pi_mu_net = nn.Sequential(
+                nn.Linear(input_dim, 256),
+                nn.ReLU(),
+                nn.Linear(256, 256),
+                nn.ReLU(),
+                nn.Linear(256, output_dim)
+            )
+            # Capas para el valor (v)
+            self.v_v_net = nn.Sequential(
+                nn.Linear(input_dim, 256),
+                nn.ReLU(),
+                nn.Linear(256, 256),
+                nn.ReLU(),
+                nn.Linear(256, 1)
+            )
+            # Parámetro de desviación estándar para la política
+            self.log_std = nn.Parameter(torch.zeros(output_dim))
 
+        def forward(self, x):
+            # Solo necesitamos la parte de la política para la inferencia
+            return self.pi_mu_net(x)
+
+    _ppo_agent_class = PPOAgent
+    return _ppo_agent_class
+
+def __getattr__(name):
+    # Compatibilidad: `from app.viewmodels.services.llm import PPOAgent` sigue funcionando
+    if name == "PPOAgent":
+        return _get_ppo_agent_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+if Config().ENVIRONMENT == "production-ia":
     class QwenTradingAssistant:
         def __init__(self, model_path, tokenizer_name="Qwen/Qwen1.5-1.8B-Chat"):
+            from llama_cpp import Llama
+            from transformers import AutoTokenizer
+
             self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
             self.llm = Llama(model_path=model_path, n_ctx=4096, n_threads=6)
-        
-        def generate_strategy(self, current_market, strategy_prompt, orders_made=[]):
-            prompt = self.tokenizer.apply_chat_template(
-                [
-                    # Rol principal: Muy directo.
-                    {"role": "system", "content": "You are a concise trading decision assistant."},
+            # Todas las completions pasan por un unico hilo: Llama no es thread-safe
+            self.scheduler = LLMInferenceScheduler(self._complete, name="qwen")
+
+            # KV cache del prefijo estatico (system prompts + estrategia) por strategy id
+            self.prefix_cache_enabled = Config.LLM_PREFIX_CACHE
+            self._prefix_states = OrderedDict()  # strategy id -> (prefix tokens, LlamaState)
+            self.prefix_cache_stats = {"hits": 0, "misses": 0, "tokens_reused": 0}
 
-                    # Formato de respuesta: Ahora solo con 'action'. Súper claro.
-                    {"role": "system", "content": "Your response MUST be a JSON object with a single key: 'action' (values: 'buy', 'sell', 'wait'). Example: {\"action\": \"buy\"}."},
+        def build_messages(self, current_market, strategy_prompt, orders_made=[]):
+            """Devuelve (prefijo, sufijo): el prefijo solo depende de la estrategia"""
+            prefix = [
+                # Rol principal: Muy directo.
+                {"role": "system", "content": "You are a concise trading decision assistant."},
 
-                    # La estrategia: Sigue siendo la instrucción central y estricta.
-                    {"role": "system", "content": f"Strictly apply this trading strategy: {strategy_prompt}"},
+                # Formato de respuesta: Ahora solo con 'action'. Súper claro.
+                {"role": "system", "content": "Your response MUST be a JSON object with a single key: 'action' (values: 'buy', 'sell', 'wait'). Example: {\"action\": \"buy\"}."},
 
-                    # Datos del mercado: Directo al grano.
-                    {"role": "system", "content": f"Current market data: {current_market}"},
+                # La estrategia: Sigue siendo la instrucción central y estricta.
+                {"role": "system", "content": f"Strictly apply this trading strategy: {strategy_prompt}"},
+            ]
+            suffix = [
+                # Datos del mercado: Directo al grano.
+                {"role": "system", "content": f"Current market data: {current_market}"},
 
-                    # Órdenes previas: Da contexto sin pedirle que "razone" sobre ellas.
-                    {"role": "system", "content": f"Just for your context here are the Previously made orders: {str(orders_made)}"},
+                # Órdenes previas: Da contexto sin pedirle que "razone" sobre ellas.
+                {"role": "system", "content": f"Just for your context here are the Previously made orders: {str(orders_made)}"},
 
-                    # La instrucción final para el usuario:
-                    # Pídele que aplique la estrategia y determine la acción, enfatizando solo el JSON.
-                    {"role": "user", "content": "Taking into consideration the current market data, the previously made orders and the trading strategy. What is the best trading action ('buy', 'sell', or 'wait')? Provide ONLY the JSON output as specified."},
-                ],
+                # La instrucción final para el usuario:
+                # Pídele que aplique la estrategia y determine la acción, enfatizando solo el JSON.
+                {"role": "user", "content": "Taking into consideration the current market data, the previously made orders and the trading strategy. What is the best trading action ('buy', 'sell', or 'wait')? Provide ONLY the JSON output as specified."},
+            ]
+            return prefix, suffix
+
+        def build_prompt(self, current_market, strategy_prompt, orders_made=[]):
+            """Prompt completo y su prefijo estatico (texto)"""
+            prefix_messages, suffix_messages = self.build_messages(current_market, strategy_prompt, orders_made)
+            prompt = self.tokenizer.apply_chat_template(
+                prefix_messages + suffix_messages,
                 tokenize=False,
                 add_generation_prompt=True
             )
-            
+            prefix = self.tokenizer.apply_chat_template(prefix_messages, tokenize=False)
+            if not prompt.startswith(prefix):
+                prefix = ""  # La plantilla no separa limpio: sin cache para este prompt
+            return prompt, prefix
+
+        def _prefix_state(self, prefix_key, prefix_tokens):
+            """LlamaState tras evaluar prefix_tokens, reutilizado mientras la estrategia no cambie"""
+            cached = self._prefix_states.get(prefix_key)
+            if cached is not None and cached[0] == prefix_tokens:
+                self._prefix_states.move_to_end(prefix_key)
+                self.prefix_cache_stats["hits"] += 1
+                self.prefix_cache_stats["tokens_reused"] += len(prefix_tokens)
+                return cached[1]
+
+            self.prefix_cache_stats["misses"] += 1
+            self.llm.reset()
+            self.llm.eval(prefix_tokens)
+            state = self.llm.save_state()
+            self._prefix_states[prefix_key] = (prefix_tokens, state)
+            self._prefix_states.move_to_end(prefix_key)
+            while len(self._prefix_states) > PREFIX_CACHE_SIZE:
+                self._prefix_states.popitem(last=False)
+            return state
+
+        def _complete(self, prompt, prefix="", prefix_key=None, **params):
+            """Se ejecuta en el hilo del scheduler: restaura el KV del prefijo y solo evalua el sufijo"""
+            if not (self.prefix_cache_enabled and prefix and prefix_key is not None):
+                return self.llm.create_completion(prompt=prompt, **params)
+
+            prefix_tokens = self.llm.tokenize(prefix.encode("utf-8"), add_bos=True, special=True)
+            suffix_tokens = self.llm.tokenize(prompt[len(prefix):].encode("utf-8"), add_bos=False, special=True)
+            state = self._prefix_state(prefix_key, prefix_tokens)
+            if list(self.llm._input_ids[:len(prefix_tokens)]) != prefix_tokens:
+                self.llm.load_state(state)
+            # create_completion reutiliza el prefijo comun con los tokens ya evaluados
+            return self.llm.create_completion(prompt=prefix_tokens + suffix_tokens, **params)
+
+        def generate_strategy(self, current_market, strategy_prompt, orders_made=[], strategy_id=None):
+            prompt, prefix = self.build_prompt(current_market, strategy_prompt, orders_made)
+
             print(f"LLM thinking...")
-            output = self.llm.create_completion(
-                prompt=prompt,
+            deadline = Config.LLM_DEADLINE_SECONDS
+            future = self.scheduler.submit(
+                prompt,
+                deadline_seconds=deadline,
+                prefix=prefix,
+                prefix_key=strategy_id if strategy_id else "default",
                 max_tokens=300,
                 temperature=0.5,
                 stop=["<|im_end|>"]
             )
+            try:
+                # Margen para la completion que ya este en curso cuando vence el deadline
+                output = future.result(timeout=deadline * 2)
+            except (TimeoutError, FutureTimeoutError) as e:
+                print(f"LLM sin respuesta dentro del deadline: {e}")
+                return ""
             
             texto_estrategia = output["choices"][0]["text"].strip()
             print(f"LLM Respuesta: {texto_estrategia}")
@@ -182,7 +274,7 @@ else:
         def __init__(self, model_path, tokenizer_name="Qwen/Qwen1.5-1.8B-Chat"):
             pass
         
-        def generate_strategy(self, current_market, strategy_prompt, orders_made=[]):
+        def generate_strategy(self, current_market, strategy_prompt, orders_made=[], strategy_id=None):
             return "{\"action\": \"buy\"}"
         
         def parse_strategy(self, strategy_text):
@@ -229,21 +321,82 @@ else:
 
 class DeepSeekPPOAgent:
     def __init__(self, model_path, input_dim, output_dim):
+        import torch
+
         self.action_map = {0: "buy", 1: "sell", 2: "wait"}
 
+        # Presupuesto fijo de hilos para no competir con llama.cpp por los nucleos
+        torch.set_num_threads(Config.PPO_NUM_THREADS)
+
         agent_state_dict = torch.load(model_path, map_location=torch.device('cpu'))  # o 'cuda' si GPU
 
-        self.agent = PPOAgent(input_dim, output_dim)
+        self.agent = _get_ppo_agent_class()(input_dim, output_dim)
         self.agent.load_state_dict(agent_state_dict, strict=False)
         self.agent.eval()
 
+        # Los estados de todos los strategy bots se agrupan en un solo forward
+        self.batcher = PPOInferenceBatcher(self.predict_batch, name="ppo")
+
+    def predict_batch(self, estados):
+        """Acciones (argmax de la politica) para una lista de estados, en un solo forward"""
+        import torch
+
+        with torch.inference_mode():
+            estado_tensor = torch.tensor(estados, dtype=torch.float32)
+            logits = self.agent(estado_tensor)
+            return torch.argmax(logits, dim=1).tolist()
+
     def execute_action(self, qwen_output, estado_ambiente):
         """Ejecuta la acción de trading basada en el estado actual"""
-        estado_tensor = torch.tensor(estado_ambiente, dtype=torch.float32).unsqueeze(0)  # batch=1
-        logits = self.agent(estado_tensor)
-        action = torch.argmax(logits, dim=1).item()
+        action = self.batcher.submit(list(estado_ambiente)).result(timeout=PPO_TIMEOUT_SECONDS)
 
         print(f"Acción DeepSeek tomada: {self.action_map.get(action, 'Desconocida')}")
         print(f"🚀 Acción ejecutada por FinRL_Models: {action} | Señal que dio Qwen: {qwen_output['action']}")
 
         return action
+
+
+# ----------------------------
+# Singletons perezosos
+# ----------------------------
+
+_models = {}
+_models_lock = threading.Lock()
+
+def _get_or_load(key, factory):
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            model = _models.get(key)
+            if model is None:
+                print(f"Cargando modelo '{key[0]}'...")
+                model = factory()
+                _models[key] = model
+    return model
+
+def get_qwen_assistant() -> "QwenTradingAssistant":
+    """QwenTradingAssistant compartido, creado en el primer uso"""
+    return _get_or_load(
+        ("qwen",),
+        lambda: QwenTradingAssistant(model_path=MODEL_PATHS["qwen"]["model_path"]),
+    )
+
+def get_ppo_agent(input_dim: int, output_dim: int) -> DeepSeekPPOAgent:
+    """DeepSeekPPOAgent compartido por dimensiones, creado (torch.load) en el primer uso"""
+    return _get_or_load(
+        ("ppo_agent", input_dim, output_dim),
+        lambda: DeepSeekPPOAgent(
+            model_path=MODEL_PATHS["ppo_agent"]["model_path"],
+            input_dim=input_dim,
+            output_dim=output_dim,
+        ),
+    )
+
+def warmup_models(input_dim: int = 30, output_dim: int = 3):
+    """Hook opcional (WARMUP_MODELS=true) para cargar los modelos antes del primer bot"""
+    try:
+        get_qwen_assistant()
+        get_ppo_agent(input_dim, output_dim)
+        print("Modelos cargados (warmup)")
+    except Exception as e:
+        print(f"Error en el warmup de modelos: {e}")
@@ -10,9 +10,76 @@ from app.models.users import User
 from app.models.performance_aegis import PerformanceAegis
 from app.viewmodels.api.exchange.Exchange import ExchangeFactory
 from app.config import config
+from app.lib.utils.rate_limiter import LOW, rate_limiter
+from app.viewmodels.services.MarketDataHub import MarketDataHub
 from datetime import datetime, timedelta
 import threading
 
+def _clean_currency(currency: str, exchange_name: str):
+    """Wallet currency code as a ticker base ("XXBT" -> "BTC"); None for fiat we cannot price."""
+    # Handle Kraken's special prefixes
+    if "kraken" in exchange_name:
+        # Kraken uses special prefixes: Z for fiat, X for crypto
+        if currency.startswith("Z"):
+            # Fiat currency (ZUSD, ZEUR, etc.)
+            clean_currency = currency[1:]  # Remove Z prefix
+            if clean_currency in ["USD", "USDT"]:
+                return "USD"
+            # For other fiat currencies, we might need conversion rates
+            return None
+        elif currency.startswith("X"):
+            # Crypto currency (XXBT, XETH, etc.)
+            clean_currency = currency[1:]  # Remove X prefix
+            if clean_currency == "XBT":
+                return "BTC"  # Kraken uses XBT for Bitcoin
+            return clean_currency
+    return currency
+
+
+def _price_source(exchange_name: str):
+    """(MarketDataHub source, ExchangeFactory name) used to price a wallet's assets."""
+    # Los precios en USDT se toman del mercado spot del mismo exchange (futures no lista X/USDT)
+    if "bingx" in exchange_name:
+        return "bingx", "bingx"
+    # Kraken and any other exchange default to Kraken spot
+    return "kraken_spot", "kraken_spot"
+
+
+def get_prices_in_usdt(currencies, exchange_name: str) -> dict:
+    """
+    Prices in USDT for several currencies of one exchange with a single bulk ticker call
+    (shared MarketDataHub snapshot). Currencies without a price are left out.
+    """
+    prices, symbols = {}, {}
+    for currency in set(currencies):
+        clean_currency = _clean_currency(currency, exchange_name)
+        if clean_currency is None:
+            continue
+        # Skip if currency is already USDT or USD
+        if clean_currency.upper() in ["USDT", "USD"]:
+            prices[currency] = 1.0
+        else:
+            symbols[currency] = f"{clean_currency}/USDT"
+    if not symbols:
+        return prices
+
+    try:
+        source, factory_name = _price_source(exchange_name)
+        exchange = ExchangeFactory().create_exchange(name=factory_name, user_id="master")
+        # Wallet valuation: lowest lane of the shared rate limiter
+        with rate_limiter.priority(LOW):
+            tickers = MarketDataHub.get_tickers(source, symbols.values(), exchange)
+    except Exception as e:
+        print(f"Error getting prices on {exchange_name}: {e}")
+        return prices
+
+    for currency, symbol in symbols.items():
+        ticker = tickers.get(symbol)
+        if ticker is not None and ticker.price > 0:
+            prices[currency] = ticker.price
+    return prices
+
+
 def get_crypto_price_in_usdt(currency: str, exchange_name: str) -> float:
     """
     Get the current price of a cryptocurrency in USDT
@@ -22,64 +89,7 @@ def get_crypto_price_in_usdt(currency: str, exchange_name: str) -> float:
     Returns:
         float: The price in USDT, or None if not available
     """
-    try:
-        # Handle Kraken's special prefixes
-        if "kraken" in exchange_name:
-            # Kraken uses special prefixes: Z for fiat, X for crypto
-            if currency.startswith("Z"):
-                # Fiat currency (ZUSD, ZEUR, etc.)
-                clean_currency = currency[1:]  # Remove Z prefix
-                if clean_currency in ["USD", "USDT"]:
-                    return 1.0
-                # For other fiat currencies, we might need conversion rates
-                return None
-            elif currency.startswith("X"):
-                # Crypto currency (XXBT, XETH, etc.)
-                clean_currency = currency[1:]  # Remove X prefix
-                if clean_currency == "XBT":
-                    clean_currency = "BTC"  # Kraken uses XBT for Bitcoin
-            else:
-                clean_currency = currency
-        else:
-            clean_currency = currency
-        
-        # Skip if currency is already USDT or USD
-        if clean_currency.upper() in ["USDT", "USD"]:
-            return 1.0
-        
-        # Determine which exchange to use for price fetching
-        if "kraken" in exchange_name:
-            if "futures" in exchange_name:
-                exchange = ExchangeFactory().create_exchange(name="kraken_future", user_id="master")
-            else:
-                exchange = ExchangeFactory().create_exchange(name="kraken_spot", user_id="master")
-        elif "bingx" in exchange_name:
-            exchange = ExchangeFactory().create_exchange(name="bingx", user_id="master")
-        else:
-            # Default to Kraken spot for other exchanges
-            exchange = ExchangeFactory().create_exchange(name="kraken_spot", user_id="master")
-        
-        # Create trading pair symbol
-        symbol = f"{clean_currency}/USDT"
-        
-        # Get current price
-        price_data = exchange.get_symbol_price(symbol)
-        
-        if isinstance(price_data, tuple):
-            price = price_data[0]
-        elif isinstance(price_data, dict) and "price" in price_data:
-            price = price_data["price"]
-        else:
-            price = price_data
-            
-        if price and price > 0:
-            return float(price)
-        else:
-            return None
-            
-    except Exception as e:
-        print(f"Error getting price for {currency} on {exchange_name}: {e}")
-        return None
+    return get_prices_in_usdt([currency], exchange_name).get(currency)
 
 class Wallet:
     def __init__(self, user_id: str):
@@ -359,24 +369,26 @@ class Wallet:
         for exchange in exchanges:
             try:
                 # Obtener todos los balances para este exchange
-                balance_wallets = get_found_wallets_by_user(self.user_id, exchange)
-                
+                balance_wallets = [
+                    wallet for wallet in get_found_wallets_by_user(self.user_id, exchange)
+                    if wallet.get("currency") and wallet.get("amount", 0) > 0
+                ]
+                # Todos los precios del exchange en una sola llamada (snapshot compartida)
+                prices = get_prices_in_usdt([wallet["currency"] for wallet in balance_wallets], exchange)
+
                 for wallet in balance_wallets:
-                    currency = wallet.get("currency")
+                    currency = wallet["currency"]
                     amount = wallet.get("amount", 0)
-                    
-                    if currency and amount > 0:
-                        # Obtener precio específico para el exchange
-                        price_usdt = get_crypto_price_in_usdt(currency, exchange)
-                        
-                        if price_usdt and price_usdt > 0:
-                            usdt_equivalent = amount * price_usdt
-                            amount_total_now += usdt_equivalent
-                        elif currency.upper() in ["USDT", "USD"]:
-                            # Manejar monedas estables directamente
-                            amount_total_now += amount
-                        else:
-                            print(f"Warning: Could not get USDT price for {currency} on {exchange}")
+                    price_usdt = prices.get(currency)
+
+                    if price_usdt and price_usdt > 0:
+                        usdt_equivalent = amount * price_usdt
+                        amount_total_now += usdt_equivalent
+                    elif currency.upper() in ["USDT", "USD"]:
+                        # Manejar monedas estables directamente
+                        amount_total_now += amount
+                    else:
+                        print(f"Warning: Could not get USDT price for {currency} on {exchange}")
                             
             except Exception as e:
                 print(f"Error getting balance for exchange {exchange}: {e}")
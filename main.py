@@ -1,8 +1,9 @@
 import logging
 import sys
+import threading
 from app.Aplicacion import Application
 from app.config import Config
-from app.viewmodels.services.llm import download_model, MODEL_PATHS
+from app.viewmodels.services.llm import download_model, warmup_models, MODEL_PATHS
 from app.iu.routes import register_blueprints
 from waitress import serve
 
@@ -40,6 +41,10 @@ if __name__ == "__main__":
         MODEL_PATHS["ppo_agent"]["file_name"],
         MODEL_PATHS["ppo_agent"]["dest_dir"]
     )
+
+    # Opcional: cargar los modelos en segundo plano para que el primer strategy-bot no espere
+    if Config().WARMUP_MODELS:
+        threading.Thread(target=warmup_models, daemon=True).start()
     
     try:
         ip = Config().IP
@@ -0,0 +1,106 @@
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from app.lib.utils.backtester import (
+    BacktestConfig,
+    compute_signals,
+    load_candles,
+    prepare_indicators,
+    run_backtest,
+    simulate,
+    verify_signals,
+)
+from app.viewmodels.services.SimpleQTable import SimpleQTable
+
+MINUTES_PER_YEAR = 365 * 24 * 60
+
+
+def build_candles(n, seed=11):
+    """Paseo aleatorio de 1m con velas planas y cuerpos nulos para cubrir los casos borde"""
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.0015, n)))
+    open_ = np.concatenate([[close[0]], close[:-1]]) * (1 + rng.normal(0, 0.0005, n))
+    zero_body = rng.random(n) < 0.03
+    open_[zero_body] = close[zero_body]
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.001, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.001, n)))
+    timestamps = 1_600_000_000_000 + np.arange(n, dtype=np.int64) * 60_000
+    return pd.DataFrame({
+        "timestamp": timestamps, "open": open_, "high": high, "low": low,
+        "close": close, "volume": rng.gamma(2.0, 5.0, n),
+    })
+
+
+def build_q_table():
+    path = os.path.join(tempfile.mkdtemp(), "q_table.csv")
+    q_table = SimpleQTable(path)
+    q_table.q_values.update({
+        "ema_up_rsi_low": {"buy": 0.9, "sell": 0.1, "hold": 0.5},
+        "ema_down_rsi_high": {"buy": 0.1, "sell": 0.9, "hold": 0.5},
+        "ema_up_rsi_mid": {"buy": 0.2, "sell": 0.7, "hold": 0.5},
+    })
+    return q_table
+
+
+def test_signals_match_production_strategies():
+    candles = build_candles(20_000)
+    q_table = build_q_table()
+    ind = prepare_indicators(candles)
+    signals = compute_signals(ind, q_table)
+    mismatches = verify_signals(ind, signals, q_table, sample=2000)
+    assert not mismatches, f"Rows where vectorized signals differ: {mismatches[:10]}"
+    assert signals.to_numpy().any(axis=0).sum() >= 6, "Synthetic data should trigger most strategies"
+    print("✅ Vectorized signals match the strategy functions on 2000 windows")
+
+
+def test_stop_loss_and_take_profit():
+    # Compra en la fila 1 (martillo), despues una vela que toca el TP y otra compra que toca el SL
+    rows = [
+        (100, 101, 99, 100.5),
+        (100, 100.15, 97, 100.1),  # martillo -> compra a 100.1
+        (100.1, 104.5, 100, 104),  # high >= 104.104 -> take profit
+        (104, 104.07, 101, 104.05),  # martillo -> compra a 104.05
+        (104, 104.1, 101.9, 102),  # low <= 101.969 -> stop loss
+    ]
+    candles = pd.DataFrame(rows, columns=["open", "high", "low", "close"])
+    candles["volume"] = 1.0
+    candles["timestamp"] = pd.date_range("2024-01-01", periods=len(rows), freq="min")
+    config = BacktestConfig(trade_amount=1.0, stop_loss_pct=0.02, take_profit_pct=0.04,
+                            strategies=("Basic_Candlesticks",))
+    ind = prepare_indicators(candles)
+    trades = simulate(ind, compute_signals(ind), config)
+
+    assert list(trades["reason"]) == ["take_profit", "stop_loss"], trades
+    assert np.isclose(trades["exit_price"].iloc[0], 100.1 * 1.04)
+    assert np.isclose(trades["exit_price"].iloc[1], 104.05 * 0.98)
+    print("✅ SL/TP follow _check_risk_management")
+
+
+def test_year_of_1m_data_runs_in_seconds():
+    candles = build_candles(MINUTES_PER_YEAR)
+    path = os.path.join(tempfile.mkdtemp(), "candles.csv")
+    candles.to_csv(path, index=False)
+
+    start = time.perf_counter()
+    loaded = load_candles(path)
+    load_seconds = time.perf_counter() - start
+    result = run_backtest(loaded, BacktestConfig(timeframe="1m", fee_rate=0.001), build_q_table())
+    total = load_seconds + sum(result.timings.values())
+
+    print(f"1 year of 1m candles ({len(loaded)}): load {load_seconds:.2f}s, "
+          + ", ".join(f"{k} {v:.2f}s" for k, v in result.timings.items()))
+    print(f"Summary: {result.summary}")
+    assert total < 30, f"Backtest took {total:.1f}s"
+    print("✅ One year of 1m data backtested in seconds")
+
+
+if __name__ == "__main__":
+    test_signals_match_production_strategies()
+    test_stop_loss_and_take_profit()
+    test_year_of_1m_data_runs_in_seconds()
@@ -0,0 +1,71 @@
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.viewmodels.services.BotScheduler import CANDLE, LANE_WORKERS, SLOW, BotScheduler
+
+RISK_INTERVAL = 0.2
+BLOCK_SECONDS = 2.0
+
+
+def slow_job(release):
+    def run():
+        release.wait(BLOCK_SECONDS)
+    return run
+
+
+def test_interval_cadence_with_busy_candle_workers():
+    print("\n=== Testing risk ticks while every candle and slow worker is busy ===")
+    release = threading.Event()
+    keys = []
+    # Mas tareas bloqueantes que workers en los carriles CANDLE y SLOW
+    for i in range(LANE_WORKERS[CANDLE] + 4):
+        keys.append(f"test:candle:{i}")
+        BotScheduler.schedule_candle(keys[-1], "1h", slow_job(release))
+    for i in range(LANE_WORKERS[SLOW] + 2):
+        keys.append(f"test:slow:{i}")
+        BotScheduler.schedule_candle(keys[-1], "1h", slow_job(release), lane=SLOW)
+
+    ticks = []
+    keys.append("test:risk")
+    BotScheduler.schedule_interval("test:risk", RISK_INTERVAL, lambda: ticks.append(time.monotonic()), run_now=True)
+    time.sleep(1.5)
+
+    # running cuenta tambien las tareas en cola de su pool
+    stats = BotScheduler.get_stats()["lanes"]
+    assert stats[CANDLE]["running"] > LANE_WORKERS[CANDLE], stats
+    assert stats[SLOW]["running"] > LANE_WORKERS[SLOW], stats
+    gaps = [b - a for a, b in zip(ticks, ticks[1:])]
+    assert len(ticks) >= 6, ticks
+    assert max(gaps) < RISK_INTERVAL + 0.1, gaps
+    print(f"✅ {len(ticks)} risk ticks, max gap {max(gaps):.3f}s with {stats[CANDLE]['running']} candle "
+          f"and {stats[SLOW]['running']} slow jobs pending")
+
+    release.set()
+    assert BotScheduler.cancel(*keys, wait=5)
+
+
+def test_candle_jobs_not_blocked_by_slow_lane():
+    print("\n=== Testing candle jobs while the slow lane is saturated ===")
+    release = threading.Event()
+    keys = [f"test:llm:{i}" for i in range(LANE_WORKERS[SLOW] * 2)]
+    for key in keys:
+        BotScheduler.schedule_candle(key, "1h", slow_job(release), lane=SLOW)
+
+    ran = threading.Event()
+    started = time.monotonic()
+    keys.append("test:fast")
+    BotScheduler.schedule_candle("test:fast", "1h", ran.set)
+    assert ran.wait(1.0)
+    print(f"✅ Candle job ran after {time.monotonic() - started:.3f}s")
+
+    release.set()
+    assert BotScheduler.cancel(*keys, wait=5)
+
+
+if __name__ == "__main__":
+    test_interval_cadence_with_busy_candle_workers()
+    test_candle_jobs_not_blocked_by_slow_lane()
+    print("\n✅ All scheduler tests passed")
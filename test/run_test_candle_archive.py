@@ -0,0 +1,88 @@
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from app.lib.utils.backtester import load_candles
+from app.lib.utils.candle_archive import CandleArchive
+
+MINUTES_PER_YEAR = 365 * 24 * 60
+
+
+def build_candles(n, start_ms=1_600_000_000_000, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.0015, n)))
+    return pd.DataFrame({
+        "timestamp": start_ms + np.arange(n, dtype=np.int64) * 60_000,
+        "open": close * (1 + rng.normal(0, 0.0005, n)),
+        "high": close * 1.001,
+        "low": close * 0.999,
+        "close": close,
+        "volume": rng.gamma(2.0, 5.0, n),
+    })
+
+
+def is_memmap_view(array):
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+
+def test_append_revision_and_compaction():
+    archive = CandleArchive(os.path.join(tempfile.mkdtemp(), "btc_1m"), timeframe="1m", create=True)
+    candles = build_candles(1000)
+    assert archive.append(candles.iloc[:600]) == 600
+
+    # La ultima vela llega revisada junto con las nuevas: se sobrescribe en su sitio
+    revised = candles.iloc[599:800].copy()
+    revised.loc[599, "close"] = 1.0
+    assert archive.append(revised) == 200
+    assert len(archive) == 800 and archive.column("close")[599] == 1.0 and archive.is_sorted
+
+    # Velas antiguas repetidas y desordenadas: solo se leen tras compact()
+    late = candles.iloc[[900, 100, 850]].copy()
+    late.loc[100, "close"] = 2.0
+    archive.append(candles.iloc[800:1000])
+    archive.append(late)
+    assert not archive.is_sorted
+    try:
+        archive.slice()
+        raise AssertionError("Unsorted archive should not be sliced")
+    except ValueError:
+        pass
+
+    assert archive.compact() == {"rows": 1000, "removed": 3}
+    reopened = CandleArchive(archive.path)
+    assert np.array_equal(reopened.column("timestamp"), candles["timestamp"].to_numpy())
+    assert reopened.column("close")[100] == 2.0 and reopened.column("close")[599] == 1.0
+    assert reopened.get_info()["gaps"] == 0
+    print("✅ Append, in-place revision and compaction")
+
+
+def test_year_slice_is_zero_copy():
+    path = os.path.join(tempfile.mkdtemp(), "btc_1m")
+    archive = CandleArchive(path, timeframe="1m", create=True)
+    candles = build_candles(MINUTES_PER_YEAR)
+    for chunk in np.array_split(np.arange(len(candles)), 12):
+        archive.append(candles.iloc[chunk])
+
+    start = time.perf_counter()
+    df = load_candles(path, "2020-12-01", "2021-03-01")
+    seconds = time.perf_counter() - start
+    first = pd.Timestamp("2020-12-01")
+    assert df["timestamp"].iloc[0] >= first and df["timestamp"].iloc[-1] < pd.Timestamp("2021-03-01")
+    assert is_memmap_view(df["close"].to_numpy()), "close should be a view of the memmap"
+    expected = candles[(candles["timestamp"] >= first.value // 1_000_000)]["close"].iloc[:5].to_numpy()
+    assert np.array_equal(df["close"].iloc[:5].to_numpy(), expected)
+    print(f"✅ {len(df)} candles sliced from a year-long archive in {seconds * 1000:.1f}ms without copying")
+
+
+if __name__ == "__main__":
+    test_append_revision_and_compaction()
+    test_year_slice_is_zero_copy()
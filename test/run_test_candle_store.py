@@ -0,0 +1,112 @@
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.lib.utils.candle_store import CandleStore
+
+STEP = 60  # 1m
+
+
+def store():
+    return CandleStore(os.path.join(tempfile.mkdtemp(), "candles.sqlite3"))
+
+
+def avoid_candle_close():
+    """Las pruebas comparan con la vela en formacion: no empezar justo antes de que cambie"""
+    if time.time() % STEP > STEP - 5:
+        time.sleep(STEP - time.time() % STEP + 0.1)
+
+
+def candle(ts):
+    return (ts, 100.0, 101.0, 99.0, 100.5, None, 1.0, None)
+
+
+class FakeExchange:
+    """fetch(since, until) con velas de 1m hasta la vela en formacion"""
+
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+
+    def fetch(self, since, until):
+        self.calls.append((since, until))
+        if self.fail:
+            raise ConnectionError("exchange down")
+        forming = int(time.time() // STEP * STEP)
+        return [candle(ts) for ts in range(since, min(until, forming) + 1, STEP)]
+
+
+def test_missing_ranges():
+    print("\n=== Testing missing ranges ===")
+    s = store()
+    key = ("kraken", "XBTUSD", "1m")
+    assert s.missing_ranges(*key, 0, 600) == [(0, 600)]
+    s.mark_covered(*key, 120, 240)
+    s.mark_covered(*key, 420, 480)
+    assert s.missing_ranges(*key, 0, 600) == [(0, 60), (300, 360), (540, 600)]
+    # Rangos contiguos se fusionan
+    s.mark_covered(*key, 300, 360)
+    assert s.missing_ranges(*key, 0, 600) == [(0, 60), (540, 600)]
+    assert s.missing_ranges(*key, 120, 480) == []
+    # Otra clave no comparte cobertura
+    assert s.missing_ranges("kraken", "XBTUSD", "5m", 0, 600) == [(0, 600)]
+    print("✅ Gaps computed from the merged coverage")
+
+
+def test_gap_fill():
+    print("\n=== Testing get_candles gap fill ===")
+    s = store()
+    exchange = FakeExchange()
+    avoid_candle_close()
+    forming = int(time.time() // STEP * STEP)
+    start = forming - 30 * STEP
+
+    candles = s.get_candles("kraken", "XBTUSD", "1m", start, exchange.fetch)
+    assert [c[0] for c in candles] == list(range(start, forming + 1, STEP))
+    assert exchange.calls == [(start, forming)]
+
+    # Segunda peticion: solo se vuelve a pedir la vela en formacion
+    exchange.calls.clear()
+    again = s.get_candles("kraken", "XBTUSD", "1m", start, exchange.fetch)
+    assert len(again) == len(candles)
+    assert exchange.calls == [(forming, forming)], exchange.calls
+
+    # Ampliar hacia atras pide solo el hueco nuevo
+    exchange.calls.clear()
+    older = s.get_candles("kraken", "XBTUSD", "1m", start - 10 * STEP, exchange.fetch)
+    assert len(older) == len(candles) + 10
+    assert exchange.calls == [(start - 10 * STEP, start - STEP), (forming, forming)], exchange.calls
+    print(f"✅ {len(older)} candles, later requests only fetch the gaps")
+
+
+def test_exchange_errors():
+    print("\n=== Testing exchange errors ===")
+    s = store()
+    exchange = FakeExchange()
+    avoid_candle_close()
+    forming = int(time.time() // STEP * STEP)
+    start = forming - 10 * STEP
+    s.get_candles("kraken", "XBTUSD", "1m", start, exchange.fetch)
+
+    # Con historial guardado el error no llega al llamador
+    exchange.fail = True
+    assert len(s.get_candles("kraken", "XBTUSD", "1m", start, exchange.fetch)) == 11
+    # Sin nada guardado se propaga
+    try:
+        s.get_candles("kraken", "ETHUSD", "1m", start, exchange.fetch)
+        assert False, "should have raised"
+    except ConnectionError:
+        pass
+    # El rango fallido no queda marcado como cubierto
+    assert s.missing_ranges("kraken", "ETHUSD", "1m", start, forming) == [(start, forming)]
+    assert s.get_stats()["fetch_errors"] == 2
+    print("✅ Stored candles served on errors, failed ranges retried")
+
+
+if __name__ == "__main__":
+    test_missing_ranges()
+    test_gap_fill()
+    test_exchange_errors()
+    print("\n✅ All candle store tests passed")
@@ -0,0 +1,101 @@
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from app.lib.utils.trading_strategies import (
+    CANDLESTICK_PATTERN_COLUMNS,
+    calculate_candlestick_patterns,
+    is_bearish_engulfing_pattern,
+    is_bullish_engulfing_pattern,
+    is_doji,
+    is_estrella_fugaz,
+    is_martillo,
+)
+
+
+def build_candles(n, seed=7):
+    """Velas sinteticas con cuerpos nulos y velas planas para cubrir los casos borde"""
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 50, n))
+    open_ = close + rng.normal(0, 40, n)
+    high = np.maximum(open_, close) + np.abs(rng.normal(0, 60, n))
+    low = np.minimum(open_, close) - np.abs(rng.normal(0, 60, n))
+
+    zero_body = rng.random(n) < 0.05
+    open_[zero_body] = close[zero_body]
+    flat = rng.random(n) < 0.02
+    open_[flat] = high[flat] = low[flat] = close[flat]
+
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2024-01-01", periods=n, freq="min"),
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": rng.random(n) * 10,
+    })
+
+
+def legacy_candlestick_patterns(df):
+    """Implementacion anterior de calculate_indicators (bucle fila por fila)"""
+    df_copy = df.copy()
+    for col in CANDLESTICK_PATTERN_COLUMNS:
+        df_copy[col] = False
+
+    for i in range(len(df_copy)):
+        current_candle = df_copy.iloc[i]
+
+        if is_martillo(current_candle):
+            df_copy.loc[df_copy.index[i], "martillo"] = True
+        if is_estrella_fugaz(current_candle):
+            df_copy.loc[df_copy.index[i], "estrella_fugaz"] = True
+        if is_doji(current_candle):
+            df_copy.loc[df_copy.index[i], "doji"] = True
+
+        if i > 0:
+            prev_candle = df_copy.iloc[i - 1]
+            if is_bullish_engulfing_pattern(prev_candle, current_candle):
+                df_copy.loc[df_copy.index[i], "bullish_engulfing"] = True
+            if is_bearish_engulfing_pattern(prev_candle, current_candle):
+                df_copy.loc[df_copy.index[i], "bearish_engulfing"] = True
+
+    return df_copy[CANDLESTICK_PATTERN_COLUMNS]
+
+
+def test_candlestick_patterns_parity():
+    for n in [1, 2, 100, 5000]:
+        df = build_candles(n, seed=n)
+        expected = legacy_candlestick_patterns(df)
+        result = calculate_candlestick_patterns(df)
+
+        for col in CANDLESTICK_PATTERN_COLUMNS:
+            assert result[col].dtype == bool, f"{col} no es booleana"
+            mismatches = int((result[col].to_numpy() != expected[col].to_numpy()).sum())
+            assert mismatches == 0, f"{col}: {mismatches} diferencias con n={n}"
+
+    print("✅ Paridad OK entre el motor vectorizado y el bucle anterior")
+
+
+def benchmark_candlestick_patterns(sizes=(100, 1_000, 100_000)):
+    print(f"{'velas':>10} | {'bucle (s)':>12} | {'vectorizado (s)':>16} | {'speedup':>10}")
+    for n in sizes:
+        df = build_candles(n)
+
+        start = time.perf_counter()
+        legacy_candlestick_patterns(df)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        calculate_candlestick_patterns(df)
+        vector_time = time.perf_counter() - start
+
+        print(f"{n:>10} | {legacy_time:>12.4f} | {vector_time:>16.6f} | {legacy_time / vector_time:>9.0f}x")
+
+
+if __name__ == "__main__":
+    test_candlestick_patterns_parity()
+    benchmark_candlestick_patterns()
@@ -0,0 +1,131 @@
+import sys
+import os
+import types
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Sustituye BD, exchange y cola en los modulos de ordenes: solo se prueba la conciliacion
+from app.lib.utils.orders import bingx, kraken_spot
+
+jobs = []
+adjustments = []
+fills = []
+
+
+def reset(module):
+    jobs.clear()
+    adjustments.clear()
+    fills.clear()
+    module.enqueue_reconciliation = jobs.append
+    module.adjust_blocked_quantity = lambda blocked_id, **deltas: adjustments.append((blocked_id, deltas))
+    module.set_trade_fill = lambda order_id, **fill: fills.append((order_id, fill))
+
+
+class FakeKrakenSpot:
+    def __init__(self, details):
+        self.details = details
+
+    def get_symbol_price(self, symbol):
+        return 50000.0
+
+    def add_order(self, **kwargs):
+        return {"id": "OKRAKEN"}, None
+
+    def get_kraken_order_details(self, order_id):
+        return self.details
+
+
+class FakeWallet:
+    booked_id = "blocked-1"
+
+    def __init__(self, user_id):
+        pass
+
+    def has_balance_in_currency(self, *args):
+        return True
+
+    def get_blocked_balance(self, currency, by_bot):
+        return {"amount_crypto": 1.0, "amount_usdt": 0.0, "start_with": None}
+
+    def add_blocked_balance(self, **kwargs):
+        return self.booked_id
+
+
+def close(a, b):
+    return abs(a - b) < 1e-9
+
+
+def test_kraken_spot_apply():
+    print("\n=== Testing Kraken spot fill reconciliation ===")
+    reset(kraken_spot)
+    details = {"error": None, "status": "closed", "cost": 99.0, "fee": {"USDT": 0.2}, "filled": 0.0019}
+    exchange = FakeKrakenSpot(details)
+    kraken_spot._queue_fill_reconciliation(exchange, "u1", "blocked-1", "O1", "buy", "BTC/USDT", "basic-bot", 100.0, 0.002)
+    job = jobs[0]
+
+    exchange.details = dict(details, status="open")
+    assert job.fetch() is None  # Aun pendiente: la cola reintenta
+    exchange.details = details
+    job.apply(job.fetch())
+
+    blocked_id, deltas = adjustments[0]
+    assert blocked_id == "blocked-1"
+    # Reservado -100 USDT / +0.002 BTC; liquidado -(99 - 0.2) / +0.0019
+    assert close(deltas["amount_usdt"], 100.0 - 98.8) and close(deltas["amount_crypto"], -0.0001), deltas
+    assert fills == [("O1", {"volume": 0.0019, "price": 99.0 / 0.0019})]
+    print("✅ Buy delta applied to the booked record")
+
+    reset(kraken_spot)
+    kraken_spot._queue_fill_reconciliation(exchange, "u1", "blocked-2", "O2", "sell", "BTC/USDT", "basic-bot", 100.0, 0.002)
+    jobs[0].apply(details)
+    blocked_id, deltas = adjustments[0]
+    assert blocked_id == "blocked-2"
+    assert close(deltas["amount_usdt"], 98.8 - 100.0) and close(deltas["amount_crypto"], 0.0001), deltas
+    print("✅ Sell delta applied to the booked record")
+
+
+def test_bingx_apply():
+    print("\n=== Testing BingX fill reconciliation ===")
+    reset(bingx)
+    data = {"orderDirection": "buy", "order_made_by": "basic-bot", "symbol": "BTC/USDT"}
+    bingx._queue_fill_reconciliation(None, "u1", "blocked-3", "O3", data, booked_cost=100.0, booked_fees=0.1)
+    jobs[0].apply({"cost": 100.5, "fee": 0.1, "filled": 0.002, "price": 50250.0})
+    blocked_id, deltas = adjustments[0]
+    assert blocked_id == "blocked-3"
+    assert close(deltas["amount_usdt"], (100.0 - 0.1) - (100.5 - 0.1)) and deltas["amount_crypto"] == 0.0, deltas
+    assert fills[0][0] == "O3" and close(fills[0][1]["volume"], 0.002 - 0.1 / 50250.0)
+
+    # Sin diferencia no se toca el registro
+    reset(bingx)
+    bingx._queue_fill_reconciliation(None, "u1", "blocked-3", "O4", data, booked_cost=100.0, booked_fees=0.1)
+    jobs[0].apply({"cost": 100.0, "fee": 0.1, "filled": 0.002, "price": 50000.0})
+    assert adjustments == [] and len(fills) == 1
+    print("✅ BingX USDT delta applied to the booked record")
+
+
+def test_failed_booking_is_not_reconciled():
+    print("\n=== Testing orders whose booking failed ===")
+    reset(kraken_spot)
+    exchange = FakeKrakenSpot({})
+    kraken_spot.Wallet = FakeWallet
+    kraken_spot.ExchangeFactory = lambda: type("Factory", (), {"create_exchange": lambda self, **kw: exchange})()
+    kraken_spot.validate_master_account_balance = lambda *args: (True, None)
+    kraken_spot.flask = types.SimpleNamespace(has_app_context=lambda: True)
+    data = {"orderType": "market", "orderDirection": "buy", "amount": 0.002, "symbol": "BTC/USDT",
+            "price": 50000.0, "order_made_by": "basic-bot"}
+
+    FakeWallet.booked_id = "blocked-9"
+    assert kraken_spot.process_order("u1", dict(data)) == (True, 0.0)
+    assert len(jobs) == 1
+    jobs.clear()
+
+    FakeWallet.booked_id = None
+    assert kraken_spot.process_order("u1", dict(data)) == (True, 0.0)
+    assert jobs == []
+    print("✅ Reconciliation queued only when the blocked balance was booked")
+
+
+if __name__ == "__main__":
+    test_kraken_spot_apply()
+    test_bingx_apply()
+    test_failed_booking_is_not_reconciled()
+    print("\n✅ All fill reconciliation tests passed")
@@ -0,0 +1,145 @@
+import sys
+import os
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.lib.utils.http_client import HttpClient
+
+# Estado del servidor falso: puertos de cliente vistos (conexiones) y fallos pendientes
+state = {"ports": set(), "fail_next": 0, "posts": 0}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, gzipped=False):
+        data = json.dumps(body).encode()
+        if gzipped:
+            data = gzip.compress(data)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        state["ports"].add(self.client_address[1])
+        if self.path.startswith("/flaky") and state["fail_next"] > 0:
+            state["fail_next"] -= 1
+            return self._send(503, {"error": ["unavailable"]})
+        gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+        self._send(200, {"error": [], "result": {"path": self.path}}, gzipped=gzipped)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        state["posts"] += 1
+        self._send(503, {"error": ["unavailable"]})
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def check_connection_reuse(base):
+    print("\n=== Testing keep-alive connection reuse ===")
+    client = HttpClient(pool_size=2)
+    state["ports"].clear()
+    for _ in range(50):
+        assert client.get(f"{base}/0/public/Ticker", params={"pair": "XBTUSD"}).status_code == 200
+    assert len(state["ports"]) == 1, state["ports"]
+    host = client.get_stats()["hosts"][base.split("//")[1]]
+    assert host["connections_opened"] == 1 and host["requests"] == 50, host
+    print(f"✅ 50 requests over {host['connections_opened']} connection (reuse {host['reuse_ratio']:.2f})")
+
+
+def check_concurrent_pool(base):
+    print("\n=== Testing pool size under concurrency ===")
+    client = HttpClient(pool_sizes={base.split("//")[1]: 4})
+    state["ports"].clear()
+
+    def worker():
+        for _ in range(25):
+            client.get(f"{base}/0/public/OHLC")
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    assert len(state["ports"]) <= 4, len(state["ports"])
+    print(f"✅ 100 concurrent requests over {len(state['ports'])} connections")
+
+
+def check_gzip(base):
+    print("\n=== Testing gzip responses ===")
+    response = HttpClient().get(f"{base}/gz")
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.json()["result"]["path"] == "/gz"
+    print("✅ gzip body decoded")
+
+
+def check_retries(base):
+    print("\n=== Testing retries with jittered backoff ===")
+    client = HttpClient(retries=3, backoff=0.01)
+    state["fail_next"] = 2
+    response = client.get(f"{base}/flaky")
+    assert response.status_code == 200
+    stats = client.get_stats()["endpoints"]["GET " + base.split("//")[1] + "/flaky"]
+    assert stats["retries"] == 2 and stats["requests"] == 3, stats
+
+    state["fail_next"] = 10
+    assert client.get(f"{base}/flaky").status_code == 503  # Se agotan los reintentos
+    state["fail_next"] = 0
+
+    # POST no es idempotente: un solo intento salvo que se pida
+    state["posts"] = 0
+    assert client.post(f"{base}/0/private/TradesHistory", data="{}").status_code == 503
+    assert state["posts"] == 1
+    print("✅ GET retried on 503, POST not retried")
+
+
+def test_connection_errors():
+    print("\n=== Testing connection errors ===")
+    client = HttpClient(retries=1, backoff=0.01, timeout=1)
+    try:
+        client.get("http://127.0.0.1:1/unreachable")
+        assert False, "should have raised"
+    except Exception as e:
+        assert "Connection" in type(e).__name__, e
+    stats = client.get_stats()["endpoints"]["GET 127.0.0.1:1/unreachable"]
+    assert stats["errors"] == 2 and stats["retries"] == 1, stats
+    print("✅ Connection error raised after retrying")
+
+
+def check_latency_percentiles(base):
+    print("\n=== Testing latency percentiles ===")
+    client = HttpClient()
+    for _ in range(20):
+        client.get(f"{base}/0/public/Ticker")
+    stats = client.get_stats()["endpoints"]["GET " + base.split("//")[1] + "/0/public/Ticker"]
+    assert stats["requests"] == 20
+    assert 0 < stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"], stats
+    print(f"✅ p50 {stats['p50_ms']:.2f}ms p95 {stats['p95_ms']:.2f}ms p99 {stats['p99_ms']:.2f}ms")
+
+
+if __name__ == "__main__":
+    server, base = start_server()
+    try:
+        check_connection_reuse(base)
+        check_concurrent_pool(base)
+        check_gzip(base)
+        check_retries(base)
+        test_connection_errors()
+        check_latency_percentiles(base)
+        print("\n✅ All HTTP client tests passed")
+    finally:
+        server.shutdown()
@@ -0,0 +1,95 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from app.lib.utils.indicator_state import OUTPUT_COLUMNS, IncrementalIndicators
+from app.lib.utils.trading_strategies import CANDLESTICK_PATTERN_COLUMNS, calculate_indicators
+
+WINDOW = 30
+INDICATOR_COLUMNS = ["EMA12", "EMA26", "RSI"]
+
+
+def build_candles(n, seed=21):
+    """Paseo aleatorio de 5m con algunas velas planas (delta 0) para el RSI"""
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    close[rng.random(n) < 0.05] = np.nan
+    close = pd.Series(close).ffill().to_numpy()
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2024-01-01", periods=n, freq="5min"),
+        "open": open_,
+        "high": np.maximum(open_, close) * 1.001,
+        "low": np.minimum(open_, close) * 0.999,
+        "close": close,
+        "volume": rng.gamma(2.0, 5.0, n),
+    })
+
+
+def assert_same(result, expected, label):
+    """Mismos valores que calculate_indicators en las filas de la ventana (NaN incluidos)"""
+    expected = expected.tail(len(result)).reset_index(drop=True)
+    result = result.reset_index(drop=True)
+    assert list(result.columns) == OUTPUT_COLUMNS
+    for col in INDICATOR_COLUMNS:
+        got = pd.to_numeric(result[col], errors="coerce").to_numpy(dtype=float)
+        want = pd.to_numeric(expected[col], errors="coerce").to_numpy(dtype=float)
+        assert np.allclose(got, want, rtol=1e-9, atol=1e-9, equal_nan=True), (label, col, got, want)
+    for col in CANDLESTICK_PATTERN_COLUMNS:
+        assert (result[col].astype(bool) == expected[col].astype(bool)).all(), (label, col)
+
+
+def test_sliding_window_matches_full_history():
+    print("\n=== Testing sliding windows against calculate_indicators ===")
+    candles = build_candles(400)
+    state = IncrementalIndicators("5m")
+    # Desde la primera vela: cubre tambien las reglas de minimo de datos (NA al principio)
+    for end in range(1, len(candles) + 1):
+        window = candles.iloc[max(0, end - WINDOW):end]
+        assert_same(state.update(window), calculate_indicators(candles.iloc[:end]), f"window ending at {end}")
+    print(f"✅ {len(candles)} windows match calculate_indicators over the full history")
+
+
+def test_forming_candle_revision():
+    print("\n=== Testing forming candle revisions ===")
+    candles = build_candles(120)
+    state = IncrementalIndicators("5m")
+    state.update(candles.iloc[60:90])  # Sin historial previo: el estado empieza en la vela 60
+    history = candles.iloc[60:100]
+    for close in [30500.0, 29000.0, history["close"].iloc[-1]]:
+        # La misma vela en formacion con distintos cierres en cada tick
+        window = history.iloc[-WINDOW:].copy()
+        window.loc[window.index[-1], "close"] = close
+        revised = pd.concat([history.iloc[:-1], window.iloc[-1:]])
+        assert_same(state.update(window), calculate_indicators(revised), f"forming close {close}")
+    # Las revisiones no alteran el estado: al cerrar la vela se usa su valor final
+    assert_same(state.update(candles.iloc[71:101]), calculate_indicators(candles.iloc[60:101]), "after revisions")
+    print("✅ Forming candle re-evaluated on every tick without touching the state")
+
+
+def test_gap_rebuild_and_warm_up():
+    print("\n=== Testing gap rebuild and warm up ===")
+    candles = build_candles(300)
+    state = IncrementalIndicators("5m")
+    state.update(candles.iloc[0:WINDOW])
+    # El bot estuvo parado 100 velas: el estado se reconstruye solo con la ventana nueva
+    window = candles.iloc[150:150 + WINDOW]
+    assert_same(state.update(window), calculate_indicators(window), "gap rebuild")
+    assert_same(state.update(candles.iloc[151:151 + WINDOW]), calculate_indicators(candles.iloc[150:151 + WINDOW]), "after gap")
+
+    # Historial guardado + ventana en vivo = calculate_indicators sobre todo el tramo
+    warmed = IncrementalIndicators("5m")
+    assert warmed.warm_up(candles.iloc[:200])
+    assert not warmed.warm_up(candles.iloc[:200])  # Solo sobre un estado vacio
+    assert_same(warmed.update(candles.iloc[190:220]), calculate_indicators(candles.iloc[:220]), "warm up")
+    print("✅ Gaps rebuild from the window; warm up continues the stored history")
+
+
+if __name__ == "__main__":
+    test_sliding_window_matches_full_history()
+    test_forming_candle_revision()
+    test_gap_rebuild_and_warm_up()
+    print("\n✅ All indicator state tests passed")
@@ -0,0 +1,164 @@
+import sys
+import os
+import asyncio
+import gzip
+import json
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import WSMsgType, web
+
+from app.viewmodels.services.MarketStream import MarketStream
+
+# Estado del servidor falso: precio actual, si esta mudo y conexiones abiertas
+state = {"price": 65000.0, "silent": False, "pongs": 0, "connections": []}
+
+
+def candle_start(step_ms=60_000):
+    return int(time.time() * 1000) // step_ms * step_ms
+
+
+async def kraken_handler(request):
+    """Subset of the Kraken v2 protocol: ticker and ohlc channels plus heartbeats."""
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    state["connections"].append(ws)
+    channels = set()
+
+    async def push():
+        while not ws.closed:
+            await asyncio.sleep(0.1)
+            if state["silent"]:
+                continue
+            await ws.send_str(json.dumps({"channel": "heartbeat"}))
+            if "ticker" in channels:
+                await ws.send_str(json.dumps({"channel": "ticker", "type": "update",
+                                              "data": [{"symbol": "BTC/USD", "last": state["price"]}]}))
+            if "ohlc" in channels:
+                begin = time.strftime("%Y-%m-%dT%H:%M:%S.000000000Z", time.gmtime(candle_start() / 1000))
+                await ws.send_str(json.dumps({"channel": "ohlc", "type": "update", "data": [{
+                    "symbol": "BTC/USD", "open": 1.0, "high": 2.0, "low": 0.5, "close": state["price"],
+                    "volume": 3.0, "interval_begin": begin, "interval": 1,
+                }]}))
+
+    pusher = asyncio.ensure_future(push())
+    async for msg in ws:
+        if msg.type == WSMsgType.TEXT:
+            request_ = json.loads(msg.data)
+            channels.add(request_["params"]["channel"])
+            await ws.send_str(json.dumps({"method": "subscribe", "success": True}))
+    pusher.cancel()
+    return ws
+
+
+async def bingx_handler(request):
+    """BingX style: gzip frames, application Ping/Pong and @ticker data."""
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    data_types = set()
+
+    async def push():
+        while not ws.closed:
+            await asyncio.sleep(0.1)
+            await ws.send_bytes(gzip.compress(b"Ping"))
+            for data_type in list(data_types):
+                await ws.send_bytes(gzip.compress(json.dumps({
+                    "code": 0, "dataType": data_type,
+                    "data": {"e": "24hTicker", "s": "BTC-USDT", "c": str(state["price"] + 1)},
+                }).encode()))
+
+    pusher = asyncio.ensure_future(push())
+    async for msg in ws:
+        if msg.type == WSMsgType.TEXT:
+            if msg.data == "Pong":
+                state["pongs"] += 1
+            else:
+                data_types.add(json.loads(msg.data)["dataType"])
+    pusher.cancel()
+    return ws
+
+
+def start_server(port=8765):
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    app.router.add_get("/kraken", kraken_handler)
+    app.router.add_get("/bingx", bingx_handler)
+    runner = web.AppRunner(app)
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    time.sleep(0.5)
+    return loop
+
+
+def wait_for(fn, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        value = fn()
+        if value is not None:
+            return value
+        time.sleep(0.05)
+    return None
+
+
+def wait_for_price(stream, feed, symbol, expected):
+    return wait_for(lambda: True if stream.get_price(feed, symbol) == expected else None)
+
+
+def check_kraken_ticker_candles_and_fallback(stream, server_loop):
+    assert stream.get_price("kraken", "XBTUSD") is None, "Nothing streamed yet: REST fallback"
+    stream.subscribe_ticker("kraken", "XBTUSD")
+    assert wait_for(lambda: stream.get_price("kraken", "XBTUSD")) == 65000.0
+    state["price"] = 65100.0
+    assert wait_for_price(stream, "kraken", "XXBTZUSD", 65100.0)
+    print("✅ Kraken ticker served from the stream")
+
+    # Las velas anteriores vienen de REST; el stream mantiene la vela en formacion
+    now = candle_start()
+    stream.seed_candles("kraken", "BTC/USD", "1m", [[now - i * 60_000, 1, 2, 0.5, 1.5, 1] for i in range(4, 0, -1)])
+    assert stream.get_candles("kraken", "BTC/USD", "1m", 5) is None
+    stream.subscribe_candles("kraken", "BTC/USD", "1m")
+    candles = wait_for(lambda: stream.get_candles("kraken", "BTC/USD", "1m", 5))
+    assert candles and candles[-1][0] == candle_start() and candles[-1][4] == 65100.0, candles
+    print("✅ Kraken candles: REST seed + streamed forming candle")
+
+    state["silent"] = True
+    time.sleep(stream.stale_seconds + 0.3)
+    assert stream.get_price("kraken", "XBTUSD") is None, "Silent stream must fall back to REST"
+    state["silent"] = False
+    assert wait_for(lambda: stream.get_price("kraken", "XBTUSD")) == 65100.0
+    print("✅ Stale stream falls back to REST and recovers")
+
+    # El servidor corta la conexion: reconexion y re-suscripcion automaticas
+    for ws in list(state["connections"]):
+        asyncio.run_coroutine_threadsafe(ws.close(), server_loop).result()
+    time.sleep(0.2)
+    state["price"] = 65200.0
+    assert wait_for_price(stream, "kraken", "XBTUSD", 65200.0)
+    assert stream.get_stats()["reconnects"] >= 1
+    print("✅ Reconnects and resubscribes after a dropped connection")
+
+
+def check_bingx_gzip_ping_pong(stream):
+    stream.subscribe_ticker("bingx", "BTC/USDT")
+    assert wait_for(lambda: stream.get_price("bingx", "BTC/USDT")) == state["price"] + 1
+    assert wait_for(lambda: state["pongs"] or None), "Client must answer BingX Ping"
+    print(f"✅ BingX gzip ticker, {state['pongs']} Ping/Pong exchanges")
+
+
+if __name__ == "__main__":
+    server_loop = start_server()
+    stream = MarketStream(
+        urls={"kraken": "ws://127.0.0.1:8765/kraken", "bingx": "ws://127.0.0.1:8765/bingx"},
+        stale_seconds=1.0,
+        enabled=True,
+    )
+    check_kraken_ticker_candles_and_fallback(stream, server_loop)
+    check_bingx_gzip_ping_pong(stream)
+    print(stream.get_stats())
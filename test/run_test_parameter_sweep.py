@@ -0,0 +1,77 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from app.lib.utils.backtester import BacktestConfig, run_backtest
+from app.lib.utils.parameter_sweep import build_grid, rank_results, run_sweep
+
+
+def build_candles(n, seed=5):
+    """Paseo aleatorio de 1m"""
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.0015, n)))
+    open_ = np.concatenate([[close[0]], close[:-1]]) * (1 + rng.normal(0, 0.0005, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.001, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.001, n)))
+    timestamps = 1_600_000_000_000 + np.arange(n, dtype=np.int64) * 60_000
+    return pd.DataFrame({
+        "timestamp": pd.to_datetime(timestamps, unit="ms"), "open": open_, "high": high, "low": low,
+        "close": close, "volume": rng.gamma(2.0, 5.0, n),
+    })
+
+
+def test_rank_order():
+    results = pd.DataFrame({
+        "total_pnl": [10.0, 8.0, 9.0, 7.0],
+        "max_drawdown": [40.0, 2.0, 1.0, 30.0],
+        "error": [None, None, None, None],
+    })
+    ranked = rank_results(results)
+    # Mayor PnL pero el peor drawdown: no queda primero; los empates se deciden por PnL
+    assert list(ranked["total_pnl"]) == [9.0, 10.0, 8.0, 7.0], ranked
+    assert ranked["rank"].is_monotonic_increasing
+    print("✅ Results ordered by the combined rank")
+
+
+def test_small_grid_sweep():
+    candles = build_candles(20_000)
+    grid = {
+        "timeframe": ["5m", "15m"],
+        "stop_loss_pct": [0.01, 0.02],
+        "ema_fast": [12],
+        "ema_slow": [26],
+        "rsi_buy": [30, 35],
+    }
+    base = BacktestConfig(fee_rate=0.001)
+    results = run_sweep(candles, grid, base, processes=2)
+
+    assert len(results) == len(build_grid(base, grid)) == 8
+    assert results["error"].isna().all(), results["error"].dropna()
+    assert results["rank"].is_monotonic_increasing
+    # Cada fila coincide con un backtest directo de la misma configuracion
+    best = results.iloc[0]
+    config = BacktestConfig(fee_rate=0.001, timeframe=best["timeframe"], stop_loss_pct=best["stop_loss_pct"],
+                            rsi_buy=best["rsi_buy"])
+    direct = run_backtest(candles, config).summary
+    assert np.isclose(direct["total_pnl"], best["total_pnl"]) and direct["trades"] == best["trades"], (direct, best)
+    print(f"✅ Sweep of {len(results)} configs matches run_backtest (best pnl {best['total_pnl']:.2f})")
+
+
+def test_all_configs_failing():
+    # Una estrategia desconocida hace fallar cada config: se informa del error real, no de un KeyError
+    try:
+        run_sweep(build_candles(2_000), {"rsi_buy": [25, 30]}, BacktestConfig(strategies=("Unknown",)), processes=1)
+        assert False, "should have raised"
+    except RuntimeError as e:
+        assert "All 2 sweep configs failed" in str(e), e
+        print(f"✅ Failing sweep raises the first error: {e}")
+    assert rank_results(pd.DataFrame({"error": ["boom"]})).empty
+
+
+if __name__ == "__main__":
+    test_rank_order()
+    test_small_grid_sweep()
+    test_all_configs_failing()
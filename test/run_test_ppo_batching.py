@@ -0,0 +1,74 @@
+import sys
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Requiere torch. Usa pesos aleatorios: mide latencia y throughput, no la calidad del agente
+import numpy as np
+import torch
+
+from app.viewmodels.services.llm import DeepSeekPPOAgent, _get_ppo_agent_class
+
+INPUT_DIM = 30
+OUTPUT_DIM = 3
+CALLS_PER_BOT = 20
+QWEN_OUTPUT = {"action": "buy"}
+
+
+def build_agent():
+    path = os.path.join(tempfile.mkdtemp(), "ppo_random.pth")
+    torch.save(_get_ppo_agent_class()(INPUT_DIM, OUTPUT_DIM).state_dict(), path)
+    return DeepSeekPPOAgent(model_path=path, input_dim=INPUT_DIM, output_dim=OUTPUT_DIM)
+
+
+def unbatched_action(agent, estado):
+    """Camino anterior: batch=1 por bot y con autograd"""
+    logits = agent.agent(torch.tensor(estado, dtype=torch.float32).unsqueeze(0))
+    return torch.argmax(logits, dim=1).item()
+
+
+def run_bots(n_bots, action_fn):
+    rng = np.random.default_rng(n_bots)
+    estados = rng.random((n_bots, INPUT_DIM)).tolist()
+    latencies = []
+
+    def bot(i):
+        for _ in range(CALLS_PER_BOT):
+            start = time.perf_counter()
+            action_fn(estados[i])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_bots) as pool:
+        list(pool.map(bot, range(n_bots)))
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies)
+    return n_bots * CALLS_PER_BOT / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    agent = build_agent()
+
+    # Mismas acciones por ambos caminos
+    estados = np.random.default_rng(0).random((64, INPUT_DIM)).tolist()
+    assert agent.predict_batch(estados) == [unbatched_action(agent, e) for e in estados]
+
+    import builtins
+    _print = builtins.print
+    for n_bots in (1, 32, 256):
+        builtins.print = lambda *args, **kwargs: None  # execute_action imprime en cada llamada
+        try:
+            before = run_bots(n_bots, lambda e: unbatched_action(agent, e))
+            after = run_bots(n_bots, lambda e: agent.execute_action(QWEN_OUTPUT, e))
+        finally:
+            builtins.print = _print
+        print(f"{n_bots:>4} bots | sin batch: {before[0]:8.0f} acciones/s p50 {before[1] * 1000:6.2f}ms p95 {before[2] * 1000:6.2f}ms"
+              f" | batch: {after[0]:8.0f} acciones/s p50 {after[1] * 1000:6.2f}ms p95 {after[2] * 1000:6.2f}ms")
+
+    print(f"Stats: {agent.batcher.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import sys
+import os
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Almacen de velas temporal: se lee al importar candle_store
+os.environ["CANDLE_STORE_PATH"] = os.path.join(tempfile.mkdtemp(), "candles.sqlite3")
+
+import numpy as np
+
+from app.lib.utils import ppo_features
+from app.lib.utils.candle_store import candle_store
+from app.lib.utils.ppo_features import (
+    MARKET_FEATURE_NAMES,
+    MIN_FEATURE_CANDLES,
+    build_ppo_state,
+    feature_window,
+    get_market_features,
+)
+
+NON_ZERO = ["return_0", "return_9", "ema_spread", "close_ema12", "close_ema26", "rsi", "return_5", "volatility_20"]
+
+
+def build_records(n, start=1_700_000_000, seed=7):
+    """Random walk de velas de 1m en el formato de fetch_ohlcv_optimized"""
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    return [
+        {
+            "timestamp": datetime.fromtimestamp(start + i * 60).strftime("%Y-%m-%d %H:%M:%S"),
+            "open": float(open_[i]),
+            "high": float(max(open_[i], close[i]) * 1.001),
+            "low": float(min(open_[i], close[i]) * 0.999),
+            "close": float(close[i]),
+            "volume": float(rng.gamma(2.0, 5.0)),
+        }
+        for i in range(n)
+    ]
+
+
+class FakeExchange:
+    def __init__(self, records):
+        self.records = records
+        self.calls = 0
+
+    def fetch_ohlcv_optimized(self, symbol, timeframe, limit=5):
+        self.calls += 1
+        return self.records[-limit:]
+
+
+def assert_non_zero(features, label):
+    values = dict(zip(MARKET_FEATURE_NAMES, features))
+    zeros = [name for name in NON_ZERO if values[name] == 0]
+    assert not zeros, f"{label}: zero features {zeros}"
+    print(f"✅ {label}: " + ", ".join(f"{name}={values[name]:.2f}" for name in NON_ZERO))
+
+
+def test_live_window_with_stored_history():
+    print("\n=== Testing features from stored history + 5 live candles ===")
+    records = build_records(150)
+    # El hub ya guardo el historial; la ventana en vivo son 4 velas cerradas + la que se forma
+    candle_store.save_records("kraken_spot", "BTC/USDT", "1m", records[:-5])
+    live = records[-5:]
+    window = feature_window("kraken_spot", "BTC/USDT", "1m", live[:-1])
+    assert len(window) >= MIN_FEATURE_CANDLES, len(window)
+    assert window[-1] == live[-2]
+    features = get_market_features("kraken_spot", "BTC/USDT", "1m", live)
+    assert_non_zero(features, "stored history")
+
+
+def test_backfill_from_exchange():
+    print("\n=== Testing backfill when the store is empty ===")
+    records = build_records(200, start=1_710_000_000, seed=11)
+    exchange = FakeExchange(records)
+    live = records[-5:]
+    features = get_market_features("bingx", "ETH/USDT", "1m", live, exchange)
+    assert exchange.calls == 1
+    assert_non_zero(features, "backfilled")
+
+    # La siguiente vela sale del almacen, sin volver a llamar al exchange
+    exchange.records = records + build_records(1, start=1_710_000_000 + 200 * 60, seed=12)
+    state = build_ppo_state("bingx", "ETH/USDT", "1m", exchange.records[-5:], {"start_with": None}, exchange)
+    assert exchange.calls == 1 and len(state) == ppo_features.FEATURE_DIM
+    print("✅ Backfilled candles reused from the store")
+
+
+def test_short_window_without_history():
+    print("\n=== Testing short window without history ===")
+    records = build_records(5, start=1_720_000_000)
+    features = get_market_features("kraken_spot", "XRP/USDT", "1m", records)
+    values = dict(zip(MARKET_FEATURE_NAMES, features))
+    # Sin historial EMA26 no esta definida y queda neutra
+    assert values["close_ema26"] == 0 and np.all(np.isfinite(features))
+    print("✅ Neutral features when there is not enough data")
+
+
+if __name__ == "__main__":
+    test_live_window_with_stored_history()
+    test_backfill_from_exchange()
+    test_short_window_without_history()
+    print("\n✅ All PPO feature tests passed")
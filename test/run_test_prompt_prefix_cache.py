@@ -0,0 +1,72 @@
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Requiere ENVIRONMENT=production-ia y el modelo GGUF descargado en llm/models
+os.environ.setdefault("ENVIRONMENT", "production-ia")
+
+import numpy as np
+
+from app.viewmodels.services.llm import get_qwen_assistant
+
+STRATEGIES = {
+    "sma": "Buy when the 20 period SMA crosses above the 50 period SMA, sell when it crosses below. "
+           "Never open a new position if the last order was opened less than 3 candles ago.",
+    "rsi": "Buy when RSI(14) is below 30 and the last candle is bullish, sell when RSI(14) is above 70. "
+           "Wait when volume is lower than the average of the last 20 candles.",
+    "breakout": "Buy on a close above the highest high of the last 20 candles with volume above average, "
+                "sell on a close below the lowest low of the last 10 candles.",
+}
+ROUNDS = 3
+
+
+def market_snapshot(i):
+    """Cinco velas que cambian en cada llamada, como las que recibe el bot"""
+    base = 30000 + i * 25
+    return [
+        {"timestamp": 1700000000000 + (i * 5 + j) * 60000, "open": base + j, "high": base + j + 40,
+         "low": base + j - 35, "close": base + j + 10, "volume": 12.5 + j}
+        for j in range(5)
+    ]
+
+
+def time_to_first_token(assistant, strategy_id, strategy_text, i):
+    prompt, prefix = assistant.build_prompt(market_snapshot(i), strategy_text, [])
+    start = time.perf_counter()
+    # max_tokens=1: el tiempo es practicamente la evaluacion del prompt
+    assistant._complete(prompt, prefix=prefix, prefix_key=strategy_id, max_tokens=1, temperature=0.0)
+    return time.perf_counter() - start
+
+
+def run(assistant, enabled):
+    assistant.prefix_cache_enabled = enabled
+    assistant._prefix_states.clear()
+    latencies = []
+    i = 0
+    # Estrategias intercaladas, como varios bots compartiendo el modelo
+    for _ in range(ROUNDS):
+        for strategy_id, text in STRATEGIES.items():
+            latencies.append(time_to_first_token(assistant, strategy_id, text, i))
+            i += 1
+    return np.array(latencies)
+
+
+def main():
+    assistant = get_qwen_assistant()
+    time_to_first_token(assistant, "warmup", "warmup", 0)
+
+    without_cache = run(assistant, enabled=False)
+    with_cache = run(assistant, enabled=True)
+    # La primera ronda con cache llena los estados de prefijo
+    warm = with_cache[len(STRATEGIES):]
+
+    print(f"Sin cache:        media {without_cache.mean():.3f}s  p95 {np.percentile(without_cache, 95):.3f}s")
+    print(f"Con cache (todo): media {with_cache.mean():.3f}s  p95 {np.percentile(with_cache, 95):.3f}s")
+    print(f"Con cache (hits): media {warm.mean():.3f}s  p95 {np.percentile(warm, 95):.3f}s")
+    print(f"Mejora TTFT: {without_cache.mean() / warm.mean():.2f}x")
+    print(f"Stats: {assistant.prefix_cache_stats}")
+
+
+if __name__ == "__main__":
+    main()
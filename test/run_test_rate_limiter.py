@@ -0,0 +1,133 @@
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.lib.utils.rate_limiter import HIGH, LOW, NORMAL, RateLimiter, TokenBucket, endpoint_class, parse_limits
+
+
+def test_endpoint_classes():
+    print("\n=== Testing endpoint classification ===")
+    assert endpoint_class("public", "GET", "Ticker") == "public"
+    assert endpoint_class("private", "POST", "Balance") == "private"
+    assert endpoint_class("private", "POST", "AddOrder") == "orders"
+    assert endpoint_class("private", "POST", "CancelAll") == "orders"
+    assert endpoint_class("private", "POST", "OpenOrders") == "private"
+    assert endpoint_class(["spot", "v1", "private"], "POST", "trade/order") == "orders"
+    assert endpoint_class(["spot", "v1", "private"], "GET", "trade/order") == "private"
+    assert endpoint_class(["spot", "v1", "public"], "GET", "market/kline") == "public"
+    print("✅ public / private / orders")
+
+
+def test_bucket_pacing():
+    print("\n=== Testing token bucket pacing ===")
+    bucket = TokenBucket(capacity=5, rate=50)
+    started = time.monotonic()
+    for _ in range(15):
+        bucket.acquire()
+    elapsed = time.monotonic() - started
+    # 5 de rafaga y 10 a 50/s: ~0.2s
+    assert 0.15 < elapsed < 0.5, elapsed
+    print(f"✅ 15 requests with burst 5 at 50/s took {elapsed:.2f}s")
+
+
+def test_weighted_costs():
+    print("\n=== Testing weighted costs ===")
+    limiter = RateLimiter({("kraken", "private"): (4, 20)})
+    assert limiter.weight("kraken", "TradesHistory") == 2
+    assert limiter.weight("kraken", "Balance") == 1
+    started = time.monotonic()
+    for _ in range(4):
+        limiter.acquire("kraken", "key", "private", limiter.weight("kraken", "TradesHistory"))
+    elapsed = time.monotonic() - started
+    # 8 tokens con capacidad 4 a 20/s: ~0.2s
+    assert 0.15 < elapsed < 0.5, elapsed
+    print(f"✅ 4 double-cost calls took {elapsed:.2f}s")
+
+
+def test_shared_per_key():
+    print("\n=== Testing buckets shared per exchange key ===")
+    limiter = RateLimiter()
+    assert limiter.bucket("kraken", "a", "private") is limiter.bucket("kraken", "a", "private")
+    assert limiter.bucket("kraken", "a", "private") is not limiter.bucket("kraken", "b", "private")
+    assert limiter.bucket("kraken", "a", "public") is limiter.bucket("kraken", "b", "public")
+    assert limiter.bucket("kraken", "a", "orders") is not limiter.bucket("kraken", "a", "private")
+    print("✅ private buckets per key, public bucket per exchange")
+
+
+def test_priority_lanes():
+    print("\n=== Testing priority lanes ===")
+    limiter = RateLimiter({("kraken", "public"): (1, 10)})
+    bucket = limiter.bucket("kraken", None, "public")
+    bucket.acquire(1, HIGH)  # Bucket vacio
+    order = []
+
+    def call(lane, name):
+        with limiter.priority(lane):
+            limiter.acquire("kraken", None, "public")
+        order.append(name)
+
+    threads = [threading.Thread(target=call, args=(LOW, f"low{i}")) for i in range(3)]
+    threads += [threading.Thread(target=call, args=(NORMAL, "normal"))]
+    for t in threads:
+        t.start()
+    time.sleep(0.02)
+    high = threading.Thread(target=call, args=(HIGH, "high"))
+    high.start()
+    for t in threads + [high]:
+        t.join()
+    assert order[0] == "high" and order[1] == "normal", order
+    print(f"✅ Served in order {order}")
+
+    # Las ordenes siempre van por el carril HIGH
+    limiter.acquire("kraken", "key", "orders")
+    assert limiter.bucket("kraken", "key", "orders").get_stats()["high"]["acquired"] == 1
+    print("✅ Order endpoints use the HIGH lane")
+
+
+def test_low_lane_reserve():
+    print("\n=== Testing LOW lane reserve ===")
+    bucket = TokenBucket(capacity=4, rate=0.001)
+    for _ in range(3):
+        bucket.acquire(1, LOW)
+    waiter = threading.Thread(target=bucket.acquire, args=(1, LOW), daemon=True)
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()  # El ultimo token queda reservado
+    assert bucket.acquire(1, HIGH) < 0.05
+    print("✅ LOW leaves 25% of the bucket to higher lanes")
+
+
+def test_penalty():
+    print("\n=== Testing 429 penalty ===")
+    limiter = RateLimiter({("bingx", "private"): (10, 100)}, penalty=0.3)
+    limiter.penalize("bingx", "key", "private")
+    started = time.monotonic()
+    limiter.acquire("bingx", "key", "private")
+    waited = time.monotonic() - started
+    assert 0.25 < waited < 0.6, waited
+    assert limiter.bucket("bingx", "key", "private").get_stats()["penalties"] == 1
+    print(f"✅ Bucket paused {waited:.2f}s for every caller")
+
+
+def test_parse_limits():
+    print("\n=== Testing RATE_LIMITS parsing ===")
+    assert parse_limits("kraken.private=20/0.5, bingx.public=30/15") == {
+        ("kraken", "private"): (20.0, 0.5),
+        ("bingx", "public"): (30.0, 15.0),
+    }
+    assert parse_limits("") == {}
+    print("✅ Overrides parsed")
+
+
+if __name__ == "__main__":
+    test_endpoint_classes()
+    test_bucket_pacing()
+    test_weighted_costs()
+    test_shared_per_key()
+    test_priority_lanes()
+    test_low_lane_reserve()
+    test_penalty()
+    test_parse_limits()
+    print("\n✅ All rate limiter tests passed")
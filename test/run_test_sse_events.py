@@ -0,0 +1,66 @@
+import sys
+import os
+import json
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.lib.utils import tx
+from app.lib.utils.tx import RATE_LIMIT_BURST, emit, subscribe, unsubscribe
+
+
+def drain(queue, timeout=0.0):
+    return [json.loads(m.split("data: ")[1]) for m in queue.wait(timeout)]
+
+
+def test_keyed_events_survive_the_rate_limit():
+    print("\n=== Testing keyed events over the per-user cap ===")
+    email = "limit@test"
+    queue = subscribe(email)
+    try:
+        # Agota el cupo con eventos sin clave; los que sobran se descartan
+        for i in range(RATE_LIMIT_BURST + 5):
+            emit(email, "log", {"n": i}, coalesce_key="")
+        assert len(drain(queue)) == RATE_LIMIT_BURST
+
+        # Por encima del cupo: estados con clave, varias versiones de cada uno
+        for status in ["analyzing", "buying", "done"]:
+            emit(email, "bot", {"id": "basic-bot", "msg": status})
+        emit(email, "bot", {"id": "refresh-balance"})
+        emit(email, "log", {"n": "lost"}, coalesce_key="")
+        assert drain(queue) == []
+
+        received = []
+        deadline = time.monotonic() + 2
+        while len(received) < 2 and time.monotonic() < deadline:
+            received += drain(queue, 0.5)
+        assert received == [{"id": "basic-bot", "msg": "done"}, {"id": "refresh-balance"}], received
+        assert not tx.rate_limiters[email].deferred
+        print(f"✅ Last state of each key delivered after the refill: {received}")
+    finally:
+        unsubscribe(email, queue)
+
+
+def test_newer_event_replaces_deferred_one():
+    print("\n=== Testing a deferred event replaced by a newer one ===")
+    email = "replace@test"
+    queue = subscribe(email)
+    try:
+        for i in range(RATE_LIMIT_BURST):
+            emit(email, "log", {"n": i}, coalesce_key="")
+        queue.wait(0)
+        emit(email, "bot", {"id": "strategy-bot", "msg": "old"})
+        emit(email, "bot", {"id": "strategy-bot", "msg": "new"})
+        deferred = tx.rate_limiters[email].deferred
+        assert list(deferred) == ["bot:strategy-bot"] and '"new"' in deferred["bot:strategy-bot"]
+        time.sleep(0.5)  # Hay cupo otra vez
+        assert drain(queue) == [{"id": "strategy-bot", "msg": "new"}]
+        print("✅ Only the newest event of the key is sent")
+    finally:
+        unsubscribe(email, queue)
+    assert email not in tx.rate_limiters
+
+
+if __name__ == "__main__":
+    test_keyed_events_survive_the_rate_limit()
+    test_newer_event_replaces_deferred_one()
+    print("\n✅ All SSE event tests passed")